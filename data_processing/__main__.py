@@ -0,0 +1,12 @@
+import os
+import sys
+
+# "python -m data_processing run" a partir da raiz do repositório: os scripts usam imports
+# e caminhos (data/...) relativos à pasta data_processing
+PASTA = os.path.dirname(os.path.abspath(__file__))
+os.chdir(PASTA)
+sys.path.insert(0, PASTA)
+
+from pipeline import main
+
+main()
@@ -0,0 +1,175 @@
+import os
+import json
+import argparse
+import pandas as pd
+
+from config import SCHEMA_CATALOG_PATH, RAW_DATA_PATH, PROCESSED_DATA_PATH
+import compactados
+
+# Catálogo persistente dos cabeçalhos dos CSVs brutos e processados, em SCHEMA_CATALOG_PATH.
+# Cada arquivo (caminho normalizado) guarda tamanho e mtime, o encoding detectado, as colunas como o
+# pandas as lê (às vezes com aspas, ex.: '"CO_CURSO"'), os nomes normalizados e o número de linhas.
+# A descoberta de colunas (utils.find_required_columns, percepcao_curso...) consulta o catálogo no lugar
+# de abrir cada arquivo com nrows; o arquivo só é lido de novo quando tamanho ou mtime mudam.
+# O número de linhas é calculado só quando pedido (ou registrado por quem já leu o arquivo inteiro).
+# Membros de zip/rar (compactados.py) entram com o caminho "<arquivo>::<membro>".
+# Uso (a partir de data_processing): python catalogo.py [--linhas]
+
+AMOSTRA_ENCODING = 1024 * 1024
+
+# Catálogo carregado neste processo
+_catalogo = None
+
+
+def normalizar(col):
+    return col.strip().strip('"').upper()
+
+def _carregar():
+    if os.path.exists(SCHEMA_CATALOG_PATH):
+        try:
+            with open(SCHEMA_CATALOG_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"   -> Aviso: catálogo de esquemas ilegível ({e}). Os cabeçalhos serão lidos de novo.")
+    return {}
+
+def _catalogo_atual():
+    global _catalogo
+    if _catalogo is None:
+        _catalogo = _carregar()
+    return _catalogo
+
+def _salvar(chave, registro):
+    # Relê o arquivo antes de gravar para não descartar entradas gravadas por outros processos
+    try:
+        dados = _carregar()
+        dados[chave] = registro
+        os.makedirs(os.path.dirname(SCHEMA_CATALOG_PATH), exist_ok=True)
+        tmp_path = f"{SCHEMA_CATALOG_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, SCHEMA_CATALOG_PATH)
+    except Exception as e:
+        print(f"   -> Aviso: não foi possível gravar o catálogo de esquemas: {e}")
+
+def detectar_encoding(path):
+    # Os brutos do INEP vêm em latin1 e os processados (filter_data) em utf-8
+    with compactados.abrir(path) as f:
+        amostra = f.read(AMOSTRA_ENCODING)
+    if len(amostra) == AMOSTRA_ENCODING and b'\n' in amostra:
+        amostra = amostra[:amostra.rindex(b'\n')]
+    try:
+        amostra.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin1'
+
+def esquema(path):
+    # Entrada do catálogo para o arquivo, lendo o cabeçalho só se ele mudou; None se não der para ler
+    if not compactados.existe(path):
+        return None
+    chave = os.path.normpath(path)
+    catalogo = _catalogo_atual()
+    assinatura = compactados.assinatura(path)
+
+    registro = catalogo.get(chave)
+    if registro and registro['assinatura'] == assinatura:
+        return registro
+
+    try:
+        encoding = detectar_encoding(path)
+        with compactados.fonte_csv(path) as fonte:
+            colunas = pd.read_csv(fonte, sep=';', encoding=encoding, nrows=0).columns.tolist()
+    except Exception as e:
+        print(f"   -> ERRO ao ler o cabeçalho de {os.path.basename(path)}: {e}")
+        return None
+
+    registro = {
+        'assinatura': assinatura,
+        'encoding': encoding,
+        'colunas': colunas,
+        'normalizadas': [normalizar(col) for col in colunas],
+        'linhas': None,
+    }
+    catalogo[chave] = registro
+    _salvar(chave, registro)
+    return registro
+
+def colunas(path):
+    registro = esquema(path)
+    return registro['colunas'] if registro else None
+
+def encoding(path):
+    registro = esquema(path)
+    return registro['encoding'] if registro else None
+
+def encontrar_colunas(path, variantes_por_coluna):
+    # {nome padrão: nome real no arquivo} ou None se faltar alguma coluna
+    nomes = colunas(path)
+    if nomes is None:
+        return None
+    encontradas = {}
+    for nome_padrao, variantes in variantes_por_coluna.items():
+        variantes = [variante.upper() for variante in variantes]
+        encontrada = next((col for col in nomes if col.upper() in variantes), None)
+        if not encontrada:
+            return None
+        encontradas[nome_padrao] = encontrada
+    return encontradas
+
+def registrar_linhas(path, linhas):
+    # Para quem já leu o arquivo inteiro (filter_data, cache_parquet) guardar a contagem sem custo extra
+    registro = esquema(path)
+    if registro is None or registro['linhas'] == linhas:
+        return
+    registro['linhas'] = int(linhas)
+    _salvar(os.path.normpath(path), registro)
+
+def linhas(path):
+    # Linhas de dados (sem o cabeçalho), contadas uma vez por versão do arquivo
+    registro = esquema(path)
+    if registro is None:
+        return None
+    if registro['linhas'] is None:
+        total, ultimo = 0, b'\n'
+        with compactados.abrir(path) as f:
+            for bloco in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                total += bloco.count(b'\n')
+                ultimo = bloco[-1:]
+        if ultimo != b'\n':
+            total += 1
+        registrar_linhas(path, max(total - 1, 0))
+    return registro['linhas']
+
+
+def arquivos_conhecidos():
+    # CSVs/TXTs de data/raw e data/processed, e os de dados dentro dos zip/rar baixados
+    for arquivo in compactados.arquivos_baixados():
+        try:
+            for membro in compactados.membros_dados(arquivo):
+                yield compactados.caminho_membro(arquivo, membro)
+        except Exception as e:
+            print(f"   -> Aviso: não foi possível listar {arquivo}: {e}")
+    for base in (RAW_DATA_PATH, PROCESSED_DATA_PATH):
+        for raiz, pastas, arquivos in os.walk(base):
+            pastas.sort()
+            for arquivo in sorted(arquivos):
+                if arquivo.lower().endswith(('.csv', '.txt')):
+                    yield os.path.join(raiz, arquivo)
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza o catálogo de esquemas dos microdados")
+    parser.add_argument('--linhas', action='store_true', help="Conta também as linhas de cada arquivo (lê os arquivos inteiros)")
+    args = parser.parse_args()
+
+    for path in arquivos_conhecidos():
+        registro = esquema(path)
+        if registro is None:
+            continue
+        if args.linhas:
+            linhas(path)
+        total = f", {registro['linhas']} linhas" if registro['linhas'] is not None else ''
+        print(f"{path}: {len(registro['colunas'])} colunas, {registro['encoding']}{total}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import os
+import re
+import shutil
+import zipfile
+import subprocess
+from contextlib import contextmanager
+
+from config import RAW_DATA_PATH
+
+# Leitura dos microdados direto dos arquivos baixados (microdados_enade_<ano>.zip/.rar), sem extrair.
+# Um membro é representado por "<arquivo>::<membro>" (ex.: 'data/raw/microdados_enade_2019.zip::
+# microdados_Enade_2019/2.DADOS/microdados2019_arq1.txt') e passa pelos mesmos leitores dos arquivos
+# extraídos: utils.find_data_files devolve esses caminhos quando a pasta enade_<ano> não existe, e
+# tipos.ler_csv, catalogo, manifesto e o cache Parquet abrem o membro como um stream (descompressão
+# sob demanda, lido em chunks pelo pandas). Para o cache Parquet e os logs, o membro equivale ao
+# arquivo extraído em enade_<ano>/<membro>.
+# RAR usa o pacote rarfile quando instalado; sem ele, o primeiro de unrar, 7z ou bsdtar disponível.
+
+SEPARADOR = '::'
+PASTAS_DADOS = ('2.DADOS', '2. DADOS', 'DADOS')
+EXTENSOES_DADOS = ('.txt', '.csv')
+EXTENSOES = ('.zip', '.rar')
+
+# Membros de cada arquivo já listado neste processo: caminho -> (assinatura, {membro: tamanho})
+_indices = {}
+
+
+def eh_membro(path):
+    return SEPARADOR in str(path)
+
+def dividir(path):
+    arquivo, membro = str(path).split(SEPARADOR, 1)
+    return arquivo, membro
+
+def caminho_membro(arquivo, membro):
+    return f"{arquivo}{SEPARADOR}{membro}"
+
+def arquivo_do_ano(year_path):
+    # data/raw/enade_2019 -> data/raw/microdados_enade_2019.zip (ou .rar), se tiver sido baixado
+    base, pasta = os.path.split(os.path.normpath(year_path))
+    for extensao in EXTENSOES:
+        arquivo = os.path.join(base, f"microdados_{pasta}{extensao}")
+        if os.path.exists(arquivo):
+            return arquivo
+    return None
+
+def _programa_rar():
+    for programa in ('unrar', '7z', 'bsdtar'):
+        if shutil.which(programa):
+            return programa
+    raise RuntimeError("nenhum leitor de RAR encontrado (instale o pacote 'rarfile' ou 'unrar', '7z' ou 'bsdtar')")
+
+def _rarfile():
+    try:
+        import rarfile
+        return rarfile
+    except ImportError:
+        return None
+
+def _listar_rar_cli(arquivo):
+    # Sem o rarfile o tamanho descompactado não é listado (None)
+    programa = _programa_rar()
+    comandos = {
+        'unrar': ['unrar', 'lb', arquivo],
+        '7z': ['7z', 'l', '-ba', '-slt', arquivo],
+        'bsdtar': ['bsdtar', '-tf', arquivo],
+    }
+    saida = subprocess.run(comandos[programa], check=True, capture_output=True, text=True).stdout
+    linhas = saida.splitlines()
+    if programa == '7z':
+        linhas = [linha[len('Path = '):] for linha in linhas if linha.startswith('Path = ')]
+    return {linha.strip().replace('\\', '/'): None for linha in linhas if linha.strip() and not linha.endswith(('/', '\\'))}
+
+def _listar(arquivo):
+    if arquivo.lower().endswith('.rar'):
+        rarfile = _rarfile()
+        if rarfile is None:
+            return _listar_rar_cli(arquivo)
+        with rarfile.RarFile(arquivo) as rar_ref:
+            return {info.filename: info.file_size for info in rar_ref.infolist() if not info.is_dir()}
+    with zipfile.ZipFile(arquivo) as zip_ref:
+        return {info.filename: info.file_size for info in zip_ref.infolist() if not info.is_dir()}
+
+def membros(arquivo):
+    # {membro: tamanho descompactado}, listado de novo só quando tamanho ou mtime do arquivo mudam
+    stat = os.stat(arquivo)
+    assinatura = (stat.st_size, stat.st_mtime_ns)
+    chave = os.path.normpath(arquivo)
+    if chave not in _indices or _indices[chave][0] != assinatura:
+        _indices[chave] = (assinatura, _listar(arquivo))
+    return _indices[chave][1]
+
+def membros_dados(arquivo):
+    # Arquivos de dados (mesmos padrões de utils.find_data_files), em ordem
+    encontrados = []
+    for membro in membros(arquivo):
+        pasta, nome = os.path.split(membro.rstrip('/'))
+        if os.path.basename(pasta) in PASTAS_DADOS and nome.endswith(EXTENSOES_DADOS):
+            encontrados.append(membro)
+    return sorted(encontrados)
+
+def nome_logico(path):
+    # 'microdados2019_arq3.txt' (extraído ou membro) -> 'arq3'
+    encontrado = re.search(r'arq\d+', os.path.basename(str(path)).lower())
+    return encontrado.group(0) if encontrado else None
+
+def indice_membros(arquivo):
+    # Nome lógico -> membro (ex.: {'arq1': 'microdados_Enade_2019/2.DADOS/microdados2019_arq1.txt'})
+    indice = {}
+    for membro in membros_dados(arquivo):
+        nome = nome_logico(membro)
+        if nome:
+            indice.setdefault(nome, membro)
+    return indice
+
+
+def existe(path):
+    if not path:
+        return False
+    if not eh_membro(path):
+        return os.path.exists(path)
+    arquivo, membro = dividir(path)
+    try:
+        return os.path.exists(arquivo) and membro in membros(arquivo)
+    except Exception:
+        return False
+
+def tamanho(path):
+    # Bytes (descompactados, no caso de um membro); None se não der para saber
+    try:
+        if not eh_membro(path):
+            return os.path.getsize(path)
+        arquivo, membro = dividir(path)
+        return membros(arquivo).get(membro)
+    except Exception:
+        return None
+
+def mtime(path):
+    # Um membro muda junto com o arquivo que o contém
+    return os.path.getmtime(dividir(path)[0] if eh_membro(path) else path)
+
+def assinatura(path):
+    if not eh_membro(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    arquivo, membro = dividir(path)
+    return [tamanho(path), os.stat(arquivo).st_mtime_ns, membro]
+
+def caminho_extraido(path):
+    # Onde o membro estaria se o arquivo tivesse sido extraído (download_data.extract_file)
+    if not eh_membro(path):
+        return path
+    arquivo, membro = dividir(path)
+    pasta = os.path.splitext(os.path.basename(arquivo))[0].replace('microdados_', '', 1)
+    return os.path.join(os.path.dirname(arquivo), pasta, *membro.split('/'))
+
+
+@contextmanager
+def _abrir_rar_cli(arquivo, membro):
+    # O membro é descompactado para a saída padrão do extrator e lido à medida que sai
+    programa = _programa_rar()
+    comandos = {
+        'unrar': ['unrar', 'p', '-inul', arquivo, membro],
+        '7z': ['7z', 'e', '-so', arquivo, membro],
+        'bsdtar': ['bsdtar', '-xOf', arquivo, membro],
+    }
+    processo = subprocess.Popen(comandos[programa], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        yield processo.stdout
+    finally:
+        processo.stdout.close()
+        if processo.poll() is None:
+            processo.kill()
+        processo.wait()
+
+@contextmanager
+def abrir(path):
+    # Stream binário do arquivo ou do membro
+    if not eh_membro(path):
+        with open(path, 'rb') as f:
+            yield f
+        return
+
+    arquivo, membro = dividir(path)
+    if arquivo.lower().endswith('.rar'):
+        rarfile = _rarfile()
+        if rarfile is None:
+            with _abrir_rar_cli(arquivo, membro) as f:
+                yield f
+            return
+        with rarfile.RarFile(arquivo) as rar_ref, rar_ref.open(membro) as f:
+            yield f
+        return
+    with zipfile.ZipFile(arquivo) as zip_ref, zip_ref.open(membro) as f:
+        yield f
+
+@contextmanager
+def fonte_csv(path):
+    # O que passar ao pd.read_csv: o próprio caminho para arquivos comuns, o stream para membros
+    if not eh_membro(path):
+        yield path
+        return
+    with abrir(path) as f:
+        yield f
+
+def dados_disponiveis(year_path):
+    # Pasta extraída ou arquivo baixado
+    return os.path.exists(year_path) or arquivo_do_ano(year_path) is not None
+
+def arquivos_baixados():
+    # Arquivos microdados_enade_<ano>.zip/.rar em data/raw
+    if not os.path.isdir(RAW_DATA_PATH):
+        return []
+    return sorted(
+        os.path.join(RAW_DATA_PATH, nome) for nome in os.listdir(RAW_DATA_PATH)
+        if nome.startswith('microdados_enade_') and nome.lower().endswith(EXTENSOES)
+    )
@@ -5,6 +5,65 @@ RAW_DATA_PATH = os.path.join(DATA_BASE_PATH, 'raw')
 PROCESSED_DATA_PATH = os.path.join(DATA_BASE_PATH, 'processed')
 JSON_DATA_PATH = os.path.join(DATA_BASE_PATH, 'json')
 CURSOS_CSV_PATH = os.path.join('data', 'cursos_ufc.csv')
+CACHE_DATA_PATH = os.path.join(DATA_BASE_PATH, 'cache')
+
+# Lê os microdados do cache Parquet (utilities/cache_parquet.py) quando ele existir e estiver atualizado
+USE_PARQUET_CACHE = True
+
+# Store binário por ano (registros.py) com notas, respostas empacotadas e questionário dos alunos dos campi,
+# lido via memory-map pelas análises no lugar dos CSVs processados. Com False, as análises leem os CSVs.
+REGISTROS_PATH = os.path.join(CACHE_DATA_PATH, 'registros')
+USE_REGISTROS = True
+
+# Catálogo de esquemas (catalogo.py): colunas, encoding e número de linhas de cada CSV bruto/processado,
+# válido enquanto tamanho e mtime do arquivo não mudarem. Evita reabrir os arquivos só para ler o cabeçalho.
+SCHEMA_CATALOG_PATH = os.path.join(CACHE_DATA_PATH, 'esquemas.json')
+
+# Estatísticas suficientes por curso (estatisticas_curso.py), uma leitura dos microdados brutos por ano.
+# Com True, as médias agregadas de Visão Geral e de Desempenho por Tópico (BR, NE, UF, UFC) saem de rollups
+# dessas tabelas; com False, cada script lê os microdados de novo.
+ESTATISTICAS_CURSO_PATH = os.path.join(CACHE_DATA_PATH, 'estatisticas')
+USE_ESTATISTICAS_CURSO = True
+
+# Desempenho por perfil (desempenho_perfil.py): médias de NT_GER/NT_FG/NT_CE e das competências por categoria das
+# variáveis de VARIAVEIS_PERFIL, no curso, na UFC e no Brasil, com tabelas por ano em DESEMPENHO_PERFIL_PATH.
+# Categorias com menos de PERFIL_MIN_ALUNOS alunos no escopo saem só com a contagem, sem as médias.
+DESEMPENHO_PERFIL_PATH = os.path.join(CACHE_DATA_PATH, 'desempenho_perfil')
+PERFIL_MIN_ALUNOS = 5
+
+# Manifesto de build (manifesto.py): unidades (ano, escopo, campus) cujas entradas não mudaram são puladas.
+# Use False (ou apague o arquivo) para forçar o recálculo completo.
+BUILD_MANIFEST_PATH = os.path.join(DATA_BASE_PATH, 'build_manifest.json')
+INCREMENTAL_BUILD = True
+
+# Instrumentação (instrumentacao.py): um span JSONL por etapa (tempo, linhas, bytes lidos, pico de memória).
+# Etapas em PROFILE_ETAPAS (ou na variável de ambiente ENADE_PROFILE, separadas por vírgula; "all" para todas)
+# rodam sob o cProfile, ou o pyinstrument com ENADE_PROFILER=pyinstrument, e o perfil vai para PROFILE_PATH.
+TRACE_ENABLED = True
+TRACE_PATH = os.path.join(DATA_BASE_PATH, 'trace', 'trace.jsonl')
+PROFILE_PATH = os.path.join(DATA_BASE_PATH, 'trace', 'perfis')
+PROFILE_ETAPAS = []
+
+# Saída JSON (utils.write_json / save_json_safe): 'pretty' (indentado, bom para revisar diffs) ou 'compact'
+# (sem espaços, para a publicação). No modo compacto, JSON_USE_ORJSON usa o orjson quando instalado.
+# JSON_PRECOMPRESS gera cópias pré-comprimidas ao lado de cada arquivo ('gz' e/ou 'br'; 'br' requer o pacote brotli).
+JSON_OUTPUT_MODE = 'pretty'
+JSON_USE_ORJSON = True
+JSON_PRECOMPRESS = []
+
+# Shards por curso (utils.save_json_shards): além do consolidado de cada campus, um JSON compacto por curso
+# em <campus>/cursos/<CO_CURSO>.json e um cursos/index.json, para o frontend buscar só o curso selecionado.
+JSON_SHARDS = True
+JSON_SHARDS_DIRNAME = 'cursos'
+
+# Runner do pipeline (pipeline.py / python -m data_processing run): saída de cada etapa em um log próprio
+PIPELINE_LOG_PATH = os.path.join(DATA_BASE_PATH, 'logs')
+
+# Download dos microdados (utilities/download_data.py): tamanho, sha256 e ETag de cada arquivo baixado
+DOWNLOAD_MANIFEST_PATH = os.path.join(RAW_DATA_PATH, 'downloads.json')
+# Com False, os zip/rar baixados não são extraídos para enade_<ano>: os microdados são lidos direto dos
+# membros dos arquivos (compactados.py), economizando o espaço e o tempo da extração
+EXTRACT_ARCHIVES = True
 
 # Contagem a partir de 2014 até o ano mais recente disponível
 YEARS_TO_PROCESS = ['2014', '2015', '2016', '2017', '2018', '2019', '2021', '2022', '2023']
@@ -17,6 +76,7 @@ FINAL_MEDIA_JSON_PATH = os.path.join(JSON_DATA_PATH, 'Medias')
 FINAL_ESTRUTURA_JSON_PATH = os.path.join(JSON_DATA_PATH, 'Estruturas_json')
 FINAL_DT_JSON_PATH = os.path.join(JSON_DATA_PATH, 'Desempenho_Topico')
 FINAL_EH_JSON_PATH = os.path.join(JSON_DATA_PATH, 'Evolucao_Historica')
+FINAL_CE_JSON_PATH = os.path.join(JSON_DATA_PATH, 'Competencias')
 
 CAMPUS_MAP = {
     2311801: 'Russas',
@@ -180,4 +240,52 @@ QUESTOES_MAP = {
     "QE_I66": {"texto": "Ações de sustentabilidade", "cat": "oportunidades"},
     "QE_I67": {"texto": "Ações de direitos humanos", "cat": "oportunidades"},
     "QE_I68": {"texto": "Avaliação Geral do Curso", "cat": "geral"}
-}
\ No newline at end of file
+}
+
+# Variáveis do estudante para os recortes de desempenho (desempenho_perfil.py). A coluna é procurada em todos os
+# arquivos do ano; variáveis ausentes em um ano são ignoradas nele.
+VARIAVEIS_PERFIL = {
+    "QE_I08": {
+        "texto": "Renda familiar total",
+        "categorias": {
+            "A": "Até 1,5 salário mínimo",
+            "B": "De 1,5 a 3 salários mínimos",
+            "C": "De 3 a 4,5 salários mínimos",
+            "D": "De 4,5 a 6 salários mínimos",
+            "E": "De 6 a 10 salários mínimos",
+            "F": "De 10 a 30 salários mínimos",
+            "G": "Acima de 30 salários mínimos"
+        }
+    },
+    "QE_I17": {
+        "texto": "Tipo de escola no ensino médio",
+        "categorias": {
+            "A": "Todo em escola pública",
+            "B": "Todo em escola privada",
+            "C": "Todo no exterior",
+            "D": "A maior parte em escola pública",
+            "E": "A maior parte em escola privada",
+            "F": "Parte no Brasil e parte no exterior"
+        }
+    },
+    "QE_I15": {
+        "texto": "Ingresso por ação afirmativa",
+        "categorias": {
+            "A": "Não",
+            "B": "Sim, por critério étnico-racial",
+            "C": "Sim, por critério de renda",
+            "D": "Sim, por ter estudado em escola pública ou com bolsa",
+            "E": "Sim, por dois ou mais critérios",
+            "F": "Sim, por outro critério"
+        }
+    },
+    "CO_TURNO_GRADUACAO": {
+        "texto": "Turno do curso",
+        "categorias": {
+            "1": "Matutino",
+            "2": "Vespertino",
+            "3": "Integral",
+            "4": "Noturno"
+        }
+    }
+}
@@ -0,0 +1,398 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from config import (
+    YEARS_TO_PROCESS, JSON_DATA_PATH, CURSOS_CSV_PATH, UFC_IES_CODE, CAMPUS_MAP,
+    DESEMPENHO_PERFIL_PATH, PERFIL_MIN_ALUNOS, VARIAVEIS_PERFIL
+)
+from utils import (
+    find_required_columns, progress, safe_numeric_convert, get_relevant_grupos, hash_mapas_ano,
+    formatar_medias_competencia, run_parallel, workers_parser, write_json, save_json_shards
+)
+from manifesto import Manifesto, hash_valor
+from pontuacao import MapeamentoCompetencias, empacotar_respostas, pontuar_alunos
+from instrumentacao import instrumentar, anotar
+from estatisticas_curso import carregar_mapas, COLUNAS_NOTAS, PROVAS
+from percepcao_curso import load_course_names
+import juncao
+
+# Desempenho por perfil do estudante: médias de NT_GER/NT_FG/NT_CE e das competências (CE e FG) por categoria
+# de cada variável de VARIAVEIS_PERFIL (renda, tipo de escola, ação afirmativa, turno...), em três escopos:
+#   br     todos os alunos do Brasil no CO_GRUPO
+#   ufc    alunos da UFC no CO_GRUPO
+#   curso  alunos do curso (só cursos da UFC)
+# Os microdados nacionais são lidos uma vez por ano com a junção por linha (juncao.py): cada aluno entra uma
+# vez em cada escopo, com as chaves (escopo, id, categoria) codificadas num inteiro e somadas a cada lote.
+# Em data/cache/desempenho_perfil/<ano>/ (soma e contagem, para novos recortes sem reler os microdados):
+#   notas.parquet         (escopo, id, variavel, categoria) -> alunos e soma/contagem de cada nota
+#   competencias.parquet  (escopo, id, variavel, categoria, prova, competencia) -> acertos/válidas e discursivas
+#   cursos.parquet        CO_CURSO, CO_GRUPO e CO_MUNIC_CURSO dos cursos da UFC
+# Saída: data/json/Desempenho_Perfil/<campus>/desempenho_perfil_consolidado.json (e shards por curso).
+# Uso (a partir de data_processing): python desempenho_perfil.py [--workers N] [--forcar]
+
+VERSAO = 1
+ESCOPOS = ['br', 'ufc', 'curso']
+COLUNAS_DISC = [f'NT_CE_D{i}' for i in range(1, 6)] + [f'NT_FG_D{i}' for i in range(1, 3)]
+COLUNAS_ALUNO = ['CO_CURSO', 'CO_GRUPO', 'CO_IES', 'CO_MUNIC_CURSO'] + COLUNAS_NOTAS + list(PROVAS.values())
+ESTATISTICAS_COMP = ['obj_validas', 'obj_acertos', 'disc_cont', 'disc_soma']
+# Limite de categorias por variável na chave inteira (escopo, id, categoria)
+MAX_CATEGORIAS = 64
+
+OUTPUT_PATH = os.path.join(JSON_DATA_PATH, 'Desempenho_Perfil')
+
+
+def pasta_ano(year):
+    return os.path.join(DESEMPENHO_PERFIL_PATH, str(year))
+
+def saidas_ano(year):
+    return [os.path.join(pasta_ano(year), f'{nome}.parquet') for nome in ('notas', 'competencias', 'cursos')]
+
+def entradas_ano(manifesto, year, maps):
+    arquivos = juncao.arquivos_do_ano(year)
+    return {
+        'versao': VERSAO,
+        'microdados': manifesto.hash_arquivos(list(arquivos.values())),
+        'cursos': manifesto.hash_arquivo(CURSOS_CSV_PATH),
+        'mapas': hash_mapas_ano(maps, year),
+        'constantes': hash_valor([UFC_IES_CODE, VARIAVEIS_PERFIL]),
+    }
+
+
+def _plano_colunas(arquivos, obrigatorias, opcionais):
+    # Cada coluna é lida do primeiro arquivo (arq1, arq2, ...) que a tiver; None se faltar uma obrigatória
+    nomes = sorted(arquivos, key=lambda nome: int(nome[3:]))
+    plano, ausentes = {}, []
+    for col in obrigatorias + opcionais:
+        nome = next((nome for nome in nomes if find_required_columns(arquivos[nome], {col: [col, f'"{col}"']})), None)
+        if nome is None:
+            if col in obrigatorias:
+                print(f"   -> ERRO: Coluna {col} não encontrada nos microdados.")
+                return None, None
+            ausentes.append(col)
+            continue
+        plano.setdefault(nome, []).append(col)
+    return plano, ausentes
+
+def _numeros(serie):
+    # Colunas categóricas (CO_GRUPO, CO_MUNIC_CURSO) são convertidas pelas categorias distintas, não linha a linha
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        categorias = safe_numeric_convert(pd.Series(serie.cat.categories)).to_numpy(dtype=np.float64, na_value=np.nan)
+        return np.append(categorias, np.nan)[serie.cat.codes.to_numpy()]
+    return safe_numeric_convert(serie).to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _codigos_categoria(serie, categorias):
+    # Posição da resposta em `categorias` (-1 para ausente ou fora da lista); códigos numéricos viram texto ('1').
+    # Só as respostas distintas são normalizadas; cada aluno recebe a posição da sua pelo código da categoria
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    distintas = pd.Series(serie.cat.categories)
+    if pd.api.types.is_numeric_dtype(distintas.dtype):
+        distintas = distintas.round().astype('Int64')
+    posicoes = pd.Categorical(distintas.astype('string').str.strip(), categories=list(categorias)).codes.astype(np.int64)
+    return np.append(posicoes, -1)[serie.cat.codes.to_numpy()]
+
+def _expandir(linhas, ufc, grupo, curso):
+    # Cada aluno entra no escopo br do seu grupo e, se for da UFC, também nos escopos ufc e curso.
+    # origem: posição de cada entrada em `linhas`; posicoes: linha do lote
+    da_ufc = np.flatnonzero(ufc[linhas])
+    origem = np.concatenate([np.arange(len(linhas)), da_ufc, da_ufc])
+    posicoes = linhas[origem]
+    escopos = np.repeat(np.arange(len(ESCOPOS), dtype=np.int64), [len(linhas), len(da_ufc), len(da_ufc)])
+    ids = np.concatenate([grupo[linhas], grupo[linhas[da_ufc]], curso[linhas[da_ufc]]])
+    return origem, posicoes, escopos, ids
+
+def _chaves(escopos, ids, categorias):
+    return (ids * len(ESCOPOS) + escopos) * MAX_CATEGORIAS + categorias
+
+def _decodificar(chaves):
+    resto, categorias = np.divmod(chaves, MAX_CATEGORIAS)
+    ids, escopos = np.divmod(resto, len(ESCOPOS))
+    return escopos, ids, categorias
+
+def _agregar(chaves, valores):
+    # Soma as linhas de `valores` por chave: (chaves distintas, somas). O groupby do pandas soma com
+    # compensação (Kahan), como as médias das outras etapas, então empates no arredondamento saem iguais
+    inverso, unicas = pd.factorize(chaves)
+    return unicas, pd.DataFrame(valores).groupby(inverso).sum().to_numpy()
+
+def _acumular(parciais, chave, escopos, ids, categorias, valores):
+    validos = categorias >= 0
+    parciais.setdefault(chave, []).append(
+        _agregar(_chaves(escopos[validos], ids[validos], categorias[validos]), valores[validos])
+    )
+
+def _consolidar(partes):
+    if len(partes) == 1:
+        return partes[0]
+    return _agregar(np.concatenate([chaves for chaves, _ in partes]), np.vstack([somas for _, somas in partes]))
+
+def _tabela(chaves, variavel, rotulos, repeticoes=1):
+    # Colunas de identificação (escopo, id, variavel, categoria), cada linha repetida `repeticoes` vezes
+    escopos, ids, categorias = (np.repeat(valores, repeticoes) for valores in _decodificar(chaves))
+    return {
+        'escopo': np.asarray(ESCOPOS, dtype=object)[escopos],
+        'id': ids,
+        'variavel': variavel,
+        'categoria': np.asarray(rotulos, dtype=object)[categorias],
+    }
+
+def _lotes_prova(prova, grupo, mapeamento, eventos_fg, year):
+    # (eventos, linhas) de cada mapeamento compilado: o FG é um só no ano, o CE é por grupo
+    # (grupos que compartilham o mesmo mapeamento são pontuados juntos)
+    if prova != 'ce':
+        return [(eventos_fg, np.arange(len(grupo)))] if eventos_fg else []
+    lotes = {}
+    for g in np.unique(grupo):
+        eventos = mapeamento.ce(g, year)
+        if eventos:
+            lotes.setdefault(id(eventos), (eventos, []))[1].append(g)
+    return [(eventos, np.flatnonzero(np.isin(grupo, grupos))) for eventos, grupos in lotes.values()]
+
+@instrumentar('construir_desempenho_perfil', 'year')
+def construir_desempenho_perfil(year, maps, relevant_grupos):
+    print(f"\nCalculando desempenho por perfil de {year}...")
+    arquivos = juncao.arquivos_do_ano(year)
+    if not arquivos:
+        return None
+
+    plano, ausentes = _plano_colunas(arquivos, COLUNAS_ALUNO, COLUNAS_DISC + list(VARIAVEIS_PERFIL))
+    if plano is None:
+        return None
+    variaveis = [var for var in VARIAVEIS_PERFIL if var not in ausentes]
+    for var in VARIAVEIS_PERFIL:
+        if var in ausentes:
+            print(f"   -> Aviso: {var} não encontrada nos microdados de {year}. Recorte ignorado.")
+        elif len(VARIAVEIS_PERFIL[var]['categorias']) > MAX_CATEGORIAS:
+            print(f"   -> ERRO: {var} tem mais de {MAX_CATEGORIAS} categorias.")
+            return None
+    if not variaveis:
+        print(f"   -> ERRO: Nenhuma variável de perfil encontrada em {year}.")
+        return None
+    disc_cols = [col for col in COLUNAS_DISC if col not in ausentes]
+
+    mapeamento = MapeamentoCompetencias(maps['ce'], maps['fg'])
+    eventos_fg = mapeamento.fg(year)
+    rotulos_var = {var: list(VARIAVEIS_PERFIL[var]['categorias']) for var in variaveis}
+    colunas_notas = ['alunos'] + [f'{tipo}_{col}' for col in COLUNAS_NOTAS for tipo in ('soma', 'cont')]
+
+    lotes = juncao.ler_alinhado(year, plano, verificar=True, arquivos=arquivos)
+    if lotes is None:
+        return None
+
+    try:
+        # Somas parciais de cada lote: {variável: [(chaves, somas)]} e {(variável, prova, competências): [...]}
+        parciais_notas, parciais_comp, cursos_ufc = {}, {}, {}
+        for lote in progress(lotes, desc=f"Desempenho por perfil {year}"):
+            grupo = _numeros(lote['CO_GRUPO'])
+            curso = _numeros(lote['CO_CURSO'])
+            relevantes = np.isin(grupo, relevant_grupos) & ~np.isnan(curso)
+            if not relevantes.any():
+                continue
+            lote = lote[relevantes]
+            grupo, curso = grupo[relevantes].astype(np.int64), curso[relevantes].astype(np.int64)
+            ufc = _numeros(lote['CO_IES']) == UFC_IES_CODE
+
+            # Cursos da UFC: grupo e município (campus) da primeira aparição
+            munic = _numeros(lote['CO_MUNIC_CURSO'])
+            for posicao in np.flatnonzero(ufc):
+                cursos_ufc.setdefault(int(curso[posicao]), (int(grupo[posicao]), munic[posicao]))
+
+            codigos = {var: _codigos_categoria(lote[var], rotulos_var[var]) for var in variaveis}
+
+            # Notas: alunos, soma e contagem de cada nota por (escopo, id, categoria)
+            notas = np.empty((len(lote), len(colunas_notas)), dtype=np.float64)
+            notas[:, 0] = 1
+            for j, col in enumerate(COLUNAS_NOTAS):
+                valores = _numeros(lote[col])
+                validos = ~np.isnan(valores)
+                notas[:, 1 + 2 * j] = np.where(validos, valores, 0.0)
+                notas[:, 2 + 2 * j] = validos
+            _, posicoes, escopos, ids = _expandir(np.arange(len(lote)), ufc, grupo, curso)
+            valores = notas[posicoes]
+            for var in variaveis:
+                _acumular(parciais_notas, var, escopos, ids, codigos[var][posicoes], valores)
+
+            # Competências: matrizes aluno x competência de cada prova, uma vez por mapeamento compilado
+            notas_disc = lote[disc_cols].apply(safe_numeric_convert)
+            for prova, coluna in PROVAS.items():
+                respostas = empacotar_respostas(lote[coluna])
+                for eventos, linhas in _lotes_prova(prova, grupo, mapeamento, eventos_fg, year):
+                    matriz = np.hstack(pontuar_alunos(eventos, respostas[linhas], notas_disc.iloc[linhas]))
+                    origem, posicoes, escopos, ids = _expandir(linhas, ufc, grupo, curso)
+                    valores = matriz[origem].astype(np.float64)
+                    chave_comp = (prova, tuple(eventos.componentes))
+                    for var in variaveis:
+                        _acumular(parciais_comp, (var,) + chave_comp, escopos, ids, codigos[var][posicoes], valores)
+
+        if not parciais_notas:
+            print(f"   -> Aviso: Nenhum aluno dos grupos relevantes encontrado em {year}.")
+            return None
+
+        tabelas_notas = []
+        for var, partes in parciais_notas.items():
+            chaves, somas = _consolidar(partes)
+            tabela = _tabela(chaves, var, rotulos_var[var])
+            tabela.update({col: somas[:, j] for j, col in enumerate(colunas_notas)})
+            tabelas_notas.append(pd.DataFrame(tabela))
+        df_notas = pd.concat(tabelas_notas, ignore_index=True)
+        contagens = ['alunos'] + [f'cont_{col}' for col in COLUNAS_NOTAS]
+        df_notas[contagens] = df_notas[contagens].astype(np.int64)
+
+        # (escopo, id, categoria) x [4 blocos de competências] -> uma linha por (escopo, id, categoria, competência)
+        tabelas_comp = []
+        for (var, prova, componentes), partes in parciais_comp.items():
+            chaves, somas = _consolidar(partes)
+            n_comp = len(componentes)
+            valores = somas.reshape(len(chaves), len(ESTATISTICAS_COMP), n_comp).transpose(0, 2, 1).reshape(-1, len(ESTATISTICAS_COMP))
+            tabela = _tabela(chaves, var, rotulos_var[var], n_comp)
+            tabela['prova'] = prova
+            tabela['competencia'] = np.tile(np.asarray(componentes, dtype=object), len(chaves))
+            tabela.update({est: valores[:, j] for j, est in enumerate(ESTATISTICAS_COMP)})
+            tabelas_comp.append(pd.DataFrame(tabela))
+        colunas_comp = ['escopo', 'id', 'variavel', 'categoria', 'prova', 'competencia'] + ESTATISTICAS_COMP
+        df_comp = pd.concat(tabelas_comp, ignore_index=True) if tabelas_comp else pd.DataFrame(columns=colunas_comp)
+
+        df_cursos = pd.DataFrame(
+            [(co_curso, g, m) for co_curso, (g, m) in cursos_ufc.items()],
+            columns=['CO_CURSO', 'CO_GRUPO', 'CO_MUNIC_CURSO']
+        )
+        anotar(cursos=len(df_cursos))
+        print(f"   -> {len(df_notas)} recortes de notas e {len(df_comp)} de competências em {year}.")
+        return df_notas, df_comp, df_cursos
+
+    except Exception as e:
+        print(f"   -> ERRO GERAL ao calcular o desempenho por perfil de {year}: {e}")
+        return None
+
+def _salvar(year, *tabelas):
+    os.makedirs(pasta_ano(year), exist_ok=True)
+    for df, path in zip(tabelas, saidas_ano(year)):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+def atualizar_ano(year, forcar=False):
+    # Recalcula as tabelas do ano se os microdados, cursos_ufc.csv, os mapeamentos ou as variáveis mudaram
+    maps = carregar_mapas()
+    manifesto = Manifesto()
+    unidade = f"desempenho_perfil/{year}"
+    entradas = entradas_ano(manifesto, year, maps)
+    if not forcar and manifesto.atualizado(unidade, entradas, saidas_ano(year)):
+        return True
+
+    relevant_grupos = get_relevant_grupos()
+    if relevant_grupos is None:
+        return False
+    tabelas = construir_desempenho_perfil(year, maps, relevant_grupos)
+    if tabelas is None:
+        return False
+    _salvar(year, *tabelas)
+    manifesto.registrar(unidade, entradas, saidas_ano(year))
+    manifesto.salvar()
+    return True
+
+
+def _medias_notas(linha):
+    alunos = int(linha['alunos']) if linha else 0
+    medias = {'alunos': alunos}
+    for col in COLUNAS_NOTAS:
+        cont = linha[f'cont_{col}'] if linha else 0
+        media = linha[f'soma_{col}'] / cont if cont > 0 and alunos >= PERFIL_MIN_ALUNOS else None
+        medias[f"media_{col.split('_')[1].lower()}"] = round(float(media), 2) if media is not None else None
+    return medias
+
+def _medias_competencias(comps, escopo, alunos):
+    medias = formatar_medias_competencia(comps, escopo)
+    if alunos < PERFIL_MIN_ALUNOS:
+        medias = {comp: dict.fromkeys(valores) for comp, valores in medias.items()}
+    return medias
+
+def montar_ano(tabelas):
+    # {campus: {CO_CURSO: {variável: {pergunta, categorias: [...]}}}} do ano
+    df_notas, df_comp, df_cursos = tabelas
+    notas = {
+        (linha['escopo'], linha['id'], linha['variavel'], linha['categoria']): linha
+        for linha in df_notas.to_dict('records')
+    }
+    comps = {}
+    for linha in df_comp.to_dict('records'):
+        chave = (linha['escopo'], linha['id'], linha['variavel'], linha['categoria'], linha['prova'])
+        comps.setdefault(chave, {})[linha['competencia']] = {est: linha[est] for est in ESTATISTICAS_COMP}
+    variaveis_curso = {(escopo, id_, var) for escopo, id_, var, _ in notas if escopo == 'curso'}
+
+    resultado = {}
+    for curso_info in df_cursos.to_dict('records'):
+        co_curso, grupo, munic = int(curso_info['CO_CURSO']), int(curso_info['CO_GRUPO']), curso_info['CO_MUNIC_CURSO']
+        campus = CAMPUS_MAP.get(munic, f'campus_desconhecido_{int(munic)}') if pd.notna(munic) else 'campus_desconhecido'
+        ids = {'curso': co_curso, 'ufc': grupo, 'br': grupo}
+
+        dados_curso = {}
+        for var, info in VARIAVEIS_PERFIL.items():
+            if ('curso', co_curso, var) not in variaveis_curso:
+                continue
+            categorias = []
+            for codigo, rotulo in info['categorias'].items():
+                item = {'codigo': codigo, 'rotulo': rotulo}
+                competencias = {prova: {} for prova in PROVAS}
+                for escopo in ['curso', 'ufc', 'br']:
+                    chave = (escopo, ids[escopo], var, codigo)
+                    item[escopo] = _medias_notas(notas.get(chave))
+                    for prova in PROVAS:
+                        medias = _medias_competencias(comps.get(chave + (prova,), {}), escopo, item[escopo]['alunos'])
+                        for nome_comp, valores in medias.items():
+                            competencias[prova].setdefault(nome_comp, {}).update(valores)
+                item['competencias'] = competencias
+                categorias.append(item)
+            dados_curso[var] = {'pergunta': info['texto'], 'categorias': categorias}
+
+        if dados_curso:
+            resultado.setdefault(campus, {})[str(co_curso)] = dados_curso
+    return resultado
+
+@instrumentar('desempenho_perfil')
+def main(workers=1, forcar=False):
+    print("--- INICIANDO: Desempenho por Perfil do Estudante ---")
+    tasks = [(f"Ano {year}", (year, forcar)) for year in YEARS_TO_PROCESS]
+    atualizados = run_parallel(atualizar_ano, tasks, workers, "Desempenho por perfil")
+
+    nome_cursos_map = load_course_names()
+    consolidado, falhas = {}, []
+    for year, ok in zip(YEARS_TO_PROCESS, atualizados):
+        if not ok:
+            print(f"   -> {year}: sem desempenho por perfil")
+            falhas.append(year)
+            continue
+        try:
+            tabelas = tuple(pd.read_parquet(path) for path in saidas_ano(year))
+            por_campus = montar_ano(tabelas)
+        except Exception as e:
+            print(f"   -> ERRO ao montar o desempenho por perfil de {year}: {e}")
+            falhas.append(year)
+            continue
+        for campus, cursos in por_campus.items():
+            for co_curso, dados_curso in cursos.items():
+                curso = consolidado.setdefault(campus, {}).setdefault(
+                    co_curso, {'nome': nome_cursos_map.get(int(co_curso), co_curso), 'historico': {}}
+                )
+                curso['historico'][str(year)] = dados_curso
+
+    for campus, dados_campus in consolidado.items():
+        output_dir = os.path.join(OUTPUT_PATH, campus)
+        output_path = os.path.join(output_dir, 'desempenho_perfil_consolidado.json')
+        write_json(dados_campus, output_path)
+        print(f"  -> Arquivo consolidado salvo em '{output_path}'")
+        save_json_shards(dados_campus, output_dir, f"Desempenho por perfil {campus}")
+
+    if falhas:
+        print(f"   -> ERRO: Desempenho por perfil incompleto para {', '.join(falhas)}.")
+        return False
+    return True
+
+if __name__ == '__main__':
+    parser = workers_parser("Médias de notas e competências por variáveis do perfil do estudante")
+    parser.add_argument('--forcar', action='store_true', help="Recalcula mesmo sem mudança nas entradas")
+    args = parser.parse_args()
+    if not main(workers=args.workers, forcar=args.forcar):
+        sys.exit(1)
@@ -1,15 +1,19 @@
 import pandas as pd
 import os
+import sys
+import glob
 import json
 from collections import defaultdict
 
 from config import (
     YEARS_TO_PROCESS, FINAL_MEDIA_JSON_PATH, 
     FINAL_DT_JSON_PATH,
-    FINAL_ESTRUTURA_JSON_PATH, CURSOS_CSV_PATH
+    FINAL_ESTRUTURA_JSON_PATH, CURSOS_CSV_PATH, JSON_SHARDS
 )
 
-from utils import load_json, save_json_safe
+from utils import load_json, save_json_safe, save_json_shards
+from manifesto import Manifesto, hash_valor
+from instrumentacao import instrumentar
 
 MAP_CE_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_competencias_final.json')
 MAP_FG_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_fg_final.json')
@@ -17,8 +21,8 @@ MAP_FG_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_fg_final.j
 PATH_DISTRIBUICAO_CE = os.path.join(FINAL_MEDIA_JSON_PATH, 'Estatisticas_Prova', 'distribuicao_questoes_ce.json')
 PATH_DISTRIBUICAO_FG = os.path.join(FINAL_MEDIA_JSON_PATH, 'Estatisticas_Prova', 'distribuicao_questoes_fg.json')
 
-MEDIAS_AG_CE_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'CE', 'Medias_agregadas')
-MEDIAS_AG_FG_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'FG', 'Medias_agregadas')
+MEDIAS_AG_CE_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'CE', 'Medias_Agregadas')
+MEDIAS_AG_FG_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'FG', 'Medias_Agregadas')
 MEDIAS_CURSO_CE_BASE_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'CE', 'Medias_Curso')
 MEDIAS_CURSO_FG_BASE_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'FG', 'Medias_Curso')
 
@@ -106,10 +110,28 @@ def mapear_disciplinas_ce(map_competencias_ce):
     
     return disciplinas_por_grupo
 
+@instrumentar('desempenho_topico')
 def main():
     print("--- INICIANDO: Unificação Final de Resultados (CONSOLIDADO POR CAMPUS) ---")
+
+    # A consolidação depende de todas as médias de Desempenho por Tópico: só refaz se alguma mudou
+    manifesto = Manifesto()
+    entradas = {
+        'medias': manifesto.hash_arquivos(
+            glob.glob(os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', '**', '*.json'), recursive=True)
+        ),
+        'estruturas': manifesto.hash_arquivos([MAP_CE_JSON_PATH, MAP_FG_JSON_PATH, PATH_DISTRIBUICAO_CE, PATH_DISTRIBUICAO_FG]),
+        'cursos': manifesto.hash_arquivo(CURSOS_CSV_PATH),
+        'anos': hash_valor(YEARS_TO_PROCESS),
+        'shards': JSON_SHARDS,
+    }
+    if manifesto.atualizado('desempenho_topico', entradas):
+        print("Consolidados de Desempenho por Tópico já atualizados. Nada a fazer.")
+        return True
     
     curso_info_map = load_course_metadata()
+    if curso_info_map is None:
+        return False
     map_competencias_ce = load_json(MAP_CE_JSON_PATH) or {}
     map_competencias_fg = load_json(MAP_FG_JSON_PATH) or {}
     disciplinas_map_ce = mapear_disciplinas_ce(map_competencias_ce)
@@ -143,6 +165,7 @@ def main():
                         curso_data_cache[y_str][cid]['fg'] = data
 
     consolidated_data = defaultdict(lambda: defaultdict(dict))
+    falhas = []
 
     for year in YEARS_TO_PROCESS:
         print(f"\n=== Processando Ano: {year} ===")
@@ -154,6 +177,10 @@ def main():
             continue
 
         agg_data = load_all_media_data(ano_str)
+        if not any(agg_data[prova][escopo] for prova in agg_data for escopo in agg_data[prova]):
+            print(f"   -> ERRO: Nenhuma média agregada encontrada para {year}.")
+            falhas.append(ano_str)
+            continue
         
         lista_fg_ano = []
 
@@ -245,6 +272,7 @@ def main():
 
     print("\n--- Salvando arquivos consolidados por Campus ---")
     
+    saidas = []
     for municipio, cursos_dict in consolidated_data.items():
         municipio_safe = municipio.replace(" ", "_").replace("/", "_")
         
@@ -253,7 +281,18 @@ def main():
         
         path = os.path.join(output_dir, 'competencias_consolidado.json')
         
-        save_json_safe(cursos_dict, path, f"Consolidado DT {municipio}")
+        if not save_json_safe(cursos_dict, path, f"Consolidado DT {municipio}"):
+            falhas.append(municipio)
+        index_path = save_json_shards(cursos_dict, output_dir, f"Consolidado DT {municipio}")
+        saidas.extend([path] + ([index_path] if index_path else []))
+
+    if falhas or not consolidated_data:
+        print("   -> ERRO: Consolidados de Desempenho por Tópico incompletos.")
+        return False
+    manifesto.registrar('desempenho_topico', entradas, saidas)
+    manifesto.salvar()
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if not main():
+        sys.exit(1)
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import pandas as pd
 from collections import defaultdict
@@ -38,7 +39,9 @@ def analyze_distribution():
     map_ce = load_json(MAP_CE_PATH)
     map_fg = load_json(MAP_FG_PATH)
     
-    if not map_ce: return
+    if not map_ce:
+        print(f"   -> ERRO: Mapeamento de competências do CE não encontrado em '{MAP_CE_PATH}'.")
+        return False
     resultado_distribuicao_ce = {}
 
     print("\nProcessando Componentes Específicos (por Grupo)...")
@@ -83,12 +86,16 @@ def analyze_distribution():
             resultado_distribuicao_fg[ano] = resultado_ordenado
 
     path_ce = os.path.join(OUTPUT_PATH, 'distribuicao_questoes_ce.json')
-    save_json_safe(resultado_distribuicao_ce, path_ce, "Distribuição Detalhada (CE)")
+    ok_ce = save_json_safe(resultado_distribuicao_ce, path_ce, "Distribuição Detalhada (CE)")
     
     path_fg = os.path.join(OUTPUT_PATH, 'distribuicao_questoes_fg.json')
-    save_json_safe(resultado_distribuicao_fg, path_fg, "Distribuição Detalhada (FG)")
+    ok_fg = save_json_safe(resultado_distribuicao_fg, path_fg, "Distribuição Detalhada (FG)")
+    if not (ok_ce and ok_fg):
+        return False
 
     print("\n--- Análise concluída com sucesso! ---")
+    return True
 
 if __name__ == "__main__":
-    analyze_distribution()
\ No newline at end of file
+    if not analyze_distribution():
+        sys.exit(1)
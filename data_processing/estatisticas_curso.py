@@ -0,0 +1,322 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from config import (
+    RAW_DATA_PATH, ESTATISTICAS_CURSO_PATH, YEARS_TO_PROCESS, FINAL_ESTRUTURA_JSON_PATH, CURSOS_CSV_PATH
+)
+from utils import (
+    find_data_files, find_required_columns, read_microdados, progress, safe_numeric_convert, load_json,
+    get_relevant_grupos, hash_mapas_ano, formatar_medias_competencia, run_parallel, workers_parser
+)
+from manifesto import Manifesto
+from pontuacao import AcumuladorCompetencias, MapeamentoCompetencias, acumular_chunk, empacotar_respostas
+from instrumentacao import instrumentar, contar_linhas, anotar
+import catalogo
+
+# Estatísticas suficientes por curso, calculadas com uma única leitura dos microdados brutos por ano.
+# Em data/cache/estatisticas/<ano>/:
+#   cursos.parquet        atributos do curso (arq1) e, para NT_GER/NT_FG/NT_CE, soma, contagem e soma dos quadrados
+#   competencias.parquet  acertos/válidas das objetivas e soma/contagem das discursivas por (curso, prova, competência)
+# Qualquer escopo acima do curso (BR, região, UF, UFC, outro estado, pública x privada...) é um groupby sobre
+# essas tabelas (rollup_notas / rollup_competencias), sem reler os microdados.
+# As competências ficam restritas aos cursos dos grupos de cursos_ufc.csv, os únicos com mapeamento.
+# Uso (a partir de data_processing): python estatisticas_curso.py [--workers N]
+
+VERSAO = 1
+COLUNAS_NOTAS = ['NT_GER', 'NT_FG', 'NT_CE']
+ATRIBUTOS = ['CO_GRUPO', 'CO_IES', 'CO_UF_CURSO', 'CO_REGIAO_CURSO']
+# Atributos guardados quando existem no arq1 do ano, para novos recortes (categoria administrativa etc.)
+ATRIBUTOS_OPCIONAIS = ['CO_CATEGAD', 'CO_ORGACAD', 'CO_MODALIDADE', 'CO_MUNIC_CURSO']
+PROVAS = {'ce': 'DS_VT_ACE_OCE', 'fg': 'DS_VT_ACE_OFG'}
+CHUNK_SIZE = 500000
+
+MAP_CE_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_competencias_final.json')
+MAP_FG_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_fg_final.json')
+
+# ano -> (cursos, competencias) já carregados neste processo
+_tabelas = {}
+
+
+def pasta_ano(year):
+    return os.path.join(ESTATISTICAS_CURSO_PATH, str(year))
+
+def saidas_ano(year):
+    return [os.path.join(pasta_ano(year), 'cursos.parquet'), os.path.join(pasta_ano(year), 'competencias.parquet')]
+
+def carregar_mapas():
+    return {'ce': load_json(MAP_CE_JSON_PATH) or {}, 'fg': load_json(MAP_FG_JSON_PATH) or []}
+
+def entradas_ano(manifesto, year, maps):
+    return {
+        'versao': VERSAO,
+        'microdados': manifesto.hash_arquivos(find_data_files(os.path.join(RAW_DATA_PATH, f'enade_{year}'))),
+        'cursos': manifesto.hash_arquivo(CURSOS_CSV_PATH),
+        'mapas': hash_mapas_ano(maps, year),
+    }
+
+
+def _colunas_opcionais(file_path, nomes):
+    colunas = catalogo.colunas(file_path) or []
+    return {nome: next((col for col in colunas if catalogo.normalizar(col) == nome), None) for nome in nomes}
+
+def _ler_info(all_raw_files):
+    info_cols = {col: [col, f'"{col}"'] for col in ['CO_CURSO'] + ATRIBUTOS}
+    for file in all_raw_files:
+        cols_map = find_required_columns(file, info_cols)
+        if cols_map:
+            break
+    else:
+        return None
+
+    print(f"     -> Arquivo de Info encontrado: {os.path.basename(file)}")
+    cols_map.update({std: real for std, real in _colunas_opcionais(file, ATRIBUTOS_OPCIONAIS).items() if real})
+    df_info = read_microdados(file, usecols=list(cols_map.values()))
+    df_info = df_info.rename(columns={real: std for std, real in cols_map.items()})
+    for col in df_info.columns:
+        df_info[col] = safe_numeric_convert(df_info[col])
+
+    df_info = df_info.dropna(subset=['CO_CURSO', 'CO_GRUPO']).drop_duplicates(subset=['CO_CURSO'], keep='first')
+    df_info['CO_CURSO'] = df_info['CO_CURSO'].astype(np.int64)
+    df_info['CO_GRUPO'] = df_info['CO_GRUPO'].astype(np.int64)
+    return df_info.set_index('CO_CURSO')
+
+def _ler_notas(all_raw_files):
+    notas_cols = {col: [col, f'"{col}"'] for col in ['CO_CURSO'] + COLUNAS_NOTAS + list(PROVAS.values())}
+    for file in all_raw_files:
+        if 'arq3' not in os.path.basename(file).lower():
+            continue
+        cols_map = find_required_columns(file, notas_cols)
+        if cols_map:
+            disc = [f'NT_CE_D{i}' for i in range(1, 6)] + [f'NT_FG_D{i}' for i in range(1, 3)]
+            cols_map.update({std: real for std, real in _colunas_opcionais(file, disc).items() if real})
+            print(f"     -> Arquivo de Notas encontrado: {os.path.basename(file)}")
+            return file, cols_map
+    return None, None
+
+def _tabela_competencias(acumulador, prova):
+    linhas = []
+    for (curso, comp), (linha, ordem) in acumulador.primeira_ocorrencia.items():
+        linhas.append({
+            'CO_CURSO': int(curso), 'prova': prova, 'competencia': comp, **acumulador.dados[curso][comp],
+            'primeira_linha': linha, 'primeira_ordem': ordem,
+        })
+    return linhas
+
+@instrumentar('construir_estatisticas', 'year')
+def construir_estatisticas(year, maps, relevant_grupos):
+    print(f"\nCalculando estatísticas por curso de {year}...")
+    all_raw_files = find_data_files(os.path.join(RAW_DATA_PATH, f'enade_{year}'))
+    if not all_raw_files:
+        return None
+
+    df_info = _ler_info(all_raw_files)
+    notas_file_path, cols_map = _ler_notas(all_raw_files)
+    if df_info is None or not notas_file_path:
+        print(f"   -> ERRO CRÍTICO: Não foi possível encontrar arquivos/colunas essenciais para {year}.")
+        return None
+
+    mapeamento = MapeamentoCompetencias(maps['ce'], maps['fg'])
+    eventos_fg = mapeamento.fg(year)
+    grupo_por_curso = df_info['CO_GRUPO'].astype(str).to_dict()
+    eventos_por_prova = {
+        'ce': lambda curso: mapeamento.ce(grupo_por_curso[curso], year),
+        'fg': lambda curso: eventos_fg,
+    }
+    cursos_info = df_info.index.to_numpy()
+    cursos_competencias = df_info.index[df_info['CO_GRUPO'].isin(relevant_grupos)].to_numpy()
+    acumuladores = {prova: AcumuladorCompetencias() for prova in PROVAS}
+    disc_cols = [col for col in cols_map if col.startswith(('NT_CE_D', 'NT_FG_D'))]
+
+    try:
+        parciais = []
+        linhas_lidas = 0
+        reader = read_microdados(notas_file_path, usecols=list(cols_map.values()), chunksize=CHUNK_SIZE)
+        for chunk in progress(reader, desc=f"Estatísticas por curso {year}"):
+            contar_linhas(len(chunk))
+            chunk = chunk.rename(columns={real: std for std, real in cols_map.items()})
+            linhas = linhas_lidas + np.arange(len(chunk))
+            linhas_lidas += len(chunk)
+
+            co_curso = pd.to_numeric(chunk['CO_CURSO'], errors='coerce')
+            no_info = co_curso.isin(cursos_info).to_numpy()
+            if not no_info.any():
+                continue
+            chunk, linhas = chunk[no_info], linhas[no_info]
+            cursos = co_curso[no_info].astype(np.int64).to_numpy()
+
+            # Notas gerais: soma, contagem e soma dos quadrados por curso
+            bloco = {'linhas': np.ones(len(chunk), dtype=np.int64)}
+            for col in COLUNAS_NOTAS:
+                valores = safe_numeric_convert(chunk[col]).to_numpy(dtype=np.float64)
+                validos = ~np.isnan(valores)
+                bloco[f'soma_{col}'] = np.where(validos, valores, 0.0)
+                bloco[f'cont_{col}'] = validos.astype(np.int64)
+                bloco[f'quad_{col}'] = np.where(validos, valores * valores, 0.0)
+            parciais.append(pd.DataFrame(bloco).groupby(cursos).agg('sum').assign(
+                primeira_linha=pd.Series(linhas).groupby(cursos).min().to_numpy()
+            ))
+
+            # Competências, com a mesma pontuação das médias agregadas e por curso
+            com_mapa = np.isin(cursos, cursos_competencias)
+            if not com_mapa.any():
+                continue
+            posicoes = np.flatnonzero(com_mapa)
+            notas_disc = chunk[disc_cols].iloc[posicoes].apply(safe_numeric_convert)
+            chaves = cursos[posicoes].astype(object)
+            for prova, coluna in PROVAS.items():
+                if prova == 'fg' and not eventos_fg:
+                    continue
+                acumular_chunk(
+                    acumuladores[prova], chaves, eventos_por_prova[prova],
+                    empacotar_respostas(chunk[coluna].iloc[posicoes]), notas_disc, linhas[posicoes]
+                )
+
+        if not parciais:
+            print(f"   -> Aviso: Nenhuma nota encontrada para os cursos de {year}.")
+            return None
+
+        parciais = pd.concat(parciais)
+        primeira_linha = parciais['primeira_linha'].groupby(level=0).min()
+        df_cursos = parciais.drop(columns='primeira_linha').groupby(level=0).sum()
+        df_cursos['primeira_linha'] = primeira_linha
+        df_cursos = df_info.join(df_cursos, how='inner').rename_axis('CO_CURSO').reset_index()
+
+        df_competencias = pd.DataFrame(
+            _tabela_competencias(acumuladores['ce'], 'ce') + _tabela_competencias(acumuladores['fg'], 'fg'),
+            columns=['CO_CURSO', 'prova', 'competencia', 'obj_acertos', 'obj_validas', 'disc_soma', 'disc_cont',
+                     'primeira_linha', 'primeira_ordem']
+        )
+        anotar(cursos=len(df_cursos))
+        print(f"   -> {len(df_cursos)} cursos e {len(df_competencias)} pares (curso, competência) em {year}.")
+        return df_cursos, df_competencias
+
+    except Exception as e:
+        print(f"   -> ERRO GERAL ao calcular as estatísticas por curso de {year}: {e}")
+        return None
+
+def _salvar(year, df_cursos, df_competencias):
+    os.makedirs(pasta_ano(year), exist_ok=True)
+    for df, path in zip((df_cursos, df_competencias), saidas_ano(year)):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+def atualizar_ano(year, forcar=False):
+    # Recalcula as tabelas do ano se os microdados, cursos_ufc.csv ou os mapeamentos mudaram
+    maps = carregar_mapas()
+    manifesto = Manifesto()
+    unidade = f"estatisticas/{year}"
+    entradas = entradas_ano(manifesto, year, maps)
+    if not forcar and manifesto.atualizado(unidade, entradas, saidas_ano(year)):
+        return True
+
+    relevant_grupos = get_relevant_grupos()
+    if relevant_grupos is None:
+        return False
+    tabelas = construir_estatisticas(year, maps, relevant_grupos)
+    if tabelas is None:
+        return False
+    _salvar(year, *tabelas)
+    _tabelas[str(year)] = tabelas
+    manifesto.registrar(unidade, entradas, saidas_ano(year))
+    manifesto.salvar()
+    return True
+
+def carregar(year):
+    # (cursos, competencias) do ano, construindo as tabelas quando faltam ou estão desatualizadas
+    chave = str(year)
+    if chave not in _tabelas:
+        if not atualizar_ano(year):
+            return None
+        if chave not in _tabelas:
+            _tabelas[chave] = tuple(pd.read_parquet(path) for path in saidas_ano(year))
+    return _tabelas[chave]
+
+
+def filtrar_cursos(df_cursos, filtros=None, grupos=None):
+    # filtros: {coluna: valor ou lista de valores}, ex.: {'CO_UF_CURSO': 23} ou {'CO_CATEGAD': [1, 2, 3]}
+    mascara = pd.Series(True, index=df_cursos.index)
+    for coluna, valor in (filtros or {}).items():
+        valores = valor if isinstance(valor, (list, tuple, set)) else [valor]
+        mascara &= df_cursos[coluna].isin(valores)
+    if grupos is not None:
+        mascara &= df_cursos['CO_GRUPO'].isin(grupos)
+    return df_cursos[mascara]
+
+def rollup_notas(df_cursos, por='CO_GRUPO'):
+    # Média, desvio padrão e contagem de NT_GER/NT_FG/NT_CE agregados por `por` (ordenado pela chave)
+    somas = df_cursos.groupby(por).sum(numeric_only=True)
+    resultado = pd.DataFrame(index=somas.index)
+    for col in COLUNAS_NOTAS:
+        n = somas[f'cont_{col}']
+        media = somas[f'soma_{col}'] / n.where(n > 0)
+        variancia = (somas[f'quad_{col}'] - n * media * media) / (n - 1).where(n > 1)
+        resultado[f'media_{col}'] = media
+        resultado[f'desvio_{col}'] = np.sqrt(variancia.clip(lower=0))
+        resultado[f'n_{col}'] = n
+    return resultado
+
+def rollup_competencias(df_competencias, cursos, prova, chave_por_curso=None):
+    # {chave: {competência: {obj_acertos, obj_validas, disc_soma, disc_cont}}} somando os cursos de cada chave,
+    # com chaves e competências na ordem da primeira ocorrência nos microdados (a mesma da varredura linha a linha).
+    # chave_por_curso: Series CO_CURSO -> chave (ex.: o CO_GRUPO); sem ela, todos os cursos entram em uma só chave.
+    df = df_competencias[(df_competencias['prova'] == prova) & df_competencias['CO_CURSO'].isin(cursos)]
+    if df.empty:
+        return {}
+    chaves = df['CO_CURSO'].map(chave_por_curso) if chave_por_curso is not None else pd.Series(prova.upper(), index=df.index)
+    df = df.assign(chave=chaves.to_numpy()).sort_values(['primeira_linha', 'primeira_ordem'], kind='stable')
+
+    somas = df.groupby(['chave', 'competencia'], sort=False)[['obj_acertos', 'obj_validas', 'disc_soma', 'disc_cont']].sum()
+    resultado = {}
+    for (chave, comp), linha in somas.iterrows():
+        resultado.setdefault(chave, {})[comp] = {
+            'obj_acertos': int(linha['obj_acertos']), 'obj_validas': int(linha['obj_validas']),
+            'disc_soma': float(linha['disc_soma']), 'disc_cont': int(linha['disc_cont']),
+        }
+    return resultado
+
+
+def calcular_escopos(configs):
+    # Mesmo contrato de utils.calculate_averages_competencia_escopos, a partir das tabelas do ano
+    year = configs[0]['year']
+    tabelas = carregar(year)
+    if tabelas is None:
+        return None
+    df_cursos, df_competencias = tabelas
+
+    resultados = {}
+    for config in configs:
+        json_suffix = config['json_suffix']
+        filtros = {config['filter_col']: config['filter_val']} if config.get('filter_col') else None
+        cursos_escopo = filtrar_cursos(df_cursos, filtros, config['relevant_grupos'])
+        if cursos_escopo.empty:
+            print(f"   -> Aviso: Nenhum curso relevante encontrado para [ {json_suffix.upper()} ] em {year}.")
+            resultados[json_suffix] = (None, None)
+            continue
+
+        grupo_por_curso = pd.Series(cursos_escopo['CO_GRUPO'].astype(str).to_numpy(), index=cursos_escopo['CO_CURSO'])
+        comps_ce = rollup_competencias(df_competencias, cursos_escopo['CO_CURSO'], 'ce', grupo_por_curso)
+        comps_fg = rollup_competencias(df_competencias, cursos_escopo['CO_CURSO'], 'fg')
+        resultados[json_suffix] = (
+            {chave: formatar_medias_competencia(comps, json_suffix) for chave, comps in comps_ce.items()},
+            formatar_medias_competencia(comps_fg.get('FG', {}), json_suffix),
+        )
+        print(f"   -> Médias [ {json_suffix.upper()} ] (estatísticas por curso) calculadas para {year}.")
+    return resultados
+
+
+def main(workers=1, forcar=False):
+    tasks = [(f"Ano {year}", (year, forcar)) for year in YEARS_TO_PROCESS]
+    resultados = run_parallel(atualizar_ano, tasks, workers, "Estatísticas por curso")
+    for year, ok in zip(YEARS_TO_PROCESS, resultados):
+        print(f"   -> {year}: {'ok' if ok else 'sem estatísticas'}")
+    return all(resultados)
+
+if __name__ == '__main__':
+    parser = workers_parser("Tabelas de estatísticas suficientes por curso")
+    parser.add_argument('--forcar', action='store_true', help="Recalcula mesmo sem mudança nas entradas")
+    args = parser.parse_args()
+    if not main(workers=args.workers, forcar=args.forcar):
+        sys.exit(1)
@@ -1,57 +1,81 @@
 import os
-import json
+import sys
+import math
 from collections import defaultdict
-from config import YEARS_TO_PROCESS, FINAL_VG_JSON_PATH, FINAL_EH_JSON_PATH
-from utils import load_json
+from config import YEARS_TO_PROCESS, FINAL_VG_JSON_PATH, FINAL_EH_JSON_PATH, JSON_SHARDS
+from utils import load_json, save_json_shards, write_json
+from manifesto import Manifesto
+from instrumentacao import instrumentar
 
+def _valor(valor):
+    # Notas sem alunos vêm como NaN no consolidado da Visão Geral
+    return None if isinstance(valor, float) and math.isnan(valor) else valor
+
+@instrumentar('evolucao_historica')
 def main():
     print("--- INICIANDO: Geração de Evolução Histórica ---")
 
+    if not os.path.isdir(FINAL_VG_JSON_PATH):
+        print(f"ERRO: Pasta da Visão Geral não encontrada: {FINAL_VG_JSON_PATH}")
+        return False
+
     campus_folders = [
         d for d in os.listdir(FINAL_VG_JSON_PATH) 
         if os.path.isdir(os.path.join(FINAL_VG_JSON_PATH, d))
     ]
 
+    manifesto = Manifesto()
+
+    falhas = []
     for campus_name in campus_folders:
         print(f"\nProcessando Campus: {campus_name}")
         campus_path_vg = os.path.join(FINAL_VG_JSON_PATH, campus_name)
+
+        # Um só arquivo por campus: {CO_CURSO: {ano: linha da Visão Geral}}
+        visao_geral_path = os.path.join(campus_path_vg, 'visao_geral_consolidado.json')
+        unidade = f"evolucao_historica/{campus_name}"
+        entradas = {
+            'visao_geral': manifesto.hash_arquivo(visao_geral_path),
+            'anos': sorted(YEARS_TO_PROCESS),
+            'shards': JSON_SHARDS,
+        }
+        if manifesto.atualizado(unidade, entradas):
+            print(f"  -> Histórico de {campus_name} já atualizado. Pulando.")
+            continue
         
         historico_por_curso = defaultdict(list)
+        dados_campus = load_json(visao_geral_path) or {}
 
-        for year in sorted(YEARS_TO_PROCESS):
-            visao_geral_path = os.path.join(campus_path_vg, f'visao_geral_{year}.json')
-            dados_ano = load_json(visao_geral_path)
-
-            if not dados_ano:
-                continue
-
-            for curso in dados_ano:
-                co_curso = str(curso['CO_CURSO'])
+        for co_curso, anos in dados_campus.items():
+            for year in sorted(YEARS_TO_PROCESS):
+                curso = anos.get(str(year))
+                if not curso:
+                    continue
                 
                 entry = {
                     "ano": str(year),
-                    "nota_geral": curso.get('nota_geral_media_curso'),
-                    "nota_fg": curso.get('nota_fg_media_curso'),
-                    "nota_ce": curso.get('nota_ce_media_curso'),
+                    "nota_geral": _valor(curso.get('nota_geral')),
+                    "nota_fg": _valor(curso.get('nota_fg')),
+                    "nota_ce": _valor(curso.get('nota_ce')),
 
-                    "ufc_geral": curso.get('media_ufc_geral'),
-                    "ufc_fg": curso.get('media_ufc_fg'),
-                    "ufc_ce": curso.get('media_ufc_ce'),
+                    "ufc_geral": _valor(curso.get('media_ufc_geral')),
+                    "ufc_fg": _valor(curso.get('media_ufc_fg')),
+                    "ufc_ce": _valor(curso.get('media_ufc_ce')),
 
-                    "nacional_geral": curso.get('media_nacional_geral'),
-                    "nacional_fg": curso.get('media_nacional_fg'),
-                    "nacional_ce": curso.get('media_nacional_ce'),
+                    "nacional_geral": _valor(curso.get('media_nacional_geral')),
+                    "nacional_fg": _valor(curso.get('media_nacional_fg')),
+                    "nacional_ce": _valor(curso.get('media_nacional_ce')),
 
-                    "regiao_geral": curso.get('media_regiao_geral'),
-                    "regiao_fg": curso.get('media_regiao_fg'),
-                    "regiao_ce": curso.get('media_regiao_ce'),
+                    "regiao_geral": _valor(curso.get('media_regiao_geral')),
+                    "regiao_fg": _valor(curso.get('media_regiao_fg')),
+                    "regiao_ce": _valor(curso.get('media_regiao_ce')),
 
-                    "uf_geral": curso.get('media_uf_geral'),
-                    "uf_fg": curso.get('media_uf_fg'),
-                    "uf_ce": curso.get('media_uf_ce')
+                    "uf_geral": _valor(curso.get('media_uf_geral')),
+                    "uf_fg": _valor(curso.get('media_uf_fg')),
+                    "uf_ce": _valor(curso.get('media_uf_ce'))
                 }
                 
-                historico_por_curso[co_curso].append(entry)
+                historico_por_curso[str(co_curso)].append(entry)
 
         if historico_por_curso:
             output_dir = os.path.join(FINAL_EH_JSON_PATH, campus_name)
@@ -61,13 +85,24 @@ def main():
             output_path = os.path.join(output_dir, 'evolucao_historica.json')
             
             try:
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(historico_por_curso, f, ensure_ascii=False, indent=4)
+                write_json(historico_por_curso, output_path)
                 print(f"  -> Histórico salvo em: {output_path}")
+                index_path = save_json_shards(historico_por_curso, output_dir, f"Histórico {campus_name}")
+                manifesto.registrar(unidade, entradas, [output_path] + ([index_path] if index_path else []))
             except Exception as e:
                 print(f"  -> ERRO ao salvar histórico: {e}")
+                falhas.append(campus_name)
+        else:
+            print(f"  -> ERRO: Visão Geral consolidada não encontrada para {campus_name}.")
+            falhas.append(campus_name)
 
+    manifesto.salvar()
+    if falhas:
+        print(f"\nERRO: Histórico não gerado para {', '.join(falhas)}.")
+        return False
     print("\nProcesso concluído.")
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if not main():
+        sys.exit(1)
@@ -1,18 +1,22 @@
 import pandas as pd
 import os
+import sys
 import glob
-import json
-from collections import defaultdict
 import numpy as np
 
 from config import (
     PROCESSED_DATA_PATH, YEARS_TO_PROCESS, FINAL_MEDIA_JSON_PATH, 
-    FINAL_ESTRUTURA_JSON_PATH
+    FINAL_ESTRUTURA_JSON_PATH, CURSOS_CSV_PATH
 )
 
 from utils import (
-    load_json, get_curso_info_map_from_csv, save_json_safe
+    load_json, get_curso_info_map_from_csv, save_json_safe, hash_mapas_ano
 )
+from manifesto import Manifesto
+from pontuacao import AcumuladorCompetencias, MapeamentoCompetencias, acumular_chunk, respostas_da_prova
+from registros import ler_notas
+from tipos import ler_csv
+from instrumentacao import instrumentar, contar_linhas, registrar_leitura
 
 MAP_CE_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_competencias_final.json')
 MAP_FG_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_fg_final.json')
@@ -37,9 +41,62 @@ def calculate_and_save_results(base_path, campus_name, year, results_dict, suffi
         output_dir = os.path.join(base_path, campus_name, str(year))
         output_path = os.path.join(output_dir, f"medias_curso_{suffix}.json")
         save_json_safe(final_data, output_path, f"Médias ({suffix.upper()}) {campus_name} {year}")
+        return output_path
     else:
         print(f"       -> Sem dados ({suffix.upper()}) para {campus_name} {year}")
-
+        return None
+
+def load_notas_campus(notas_file_path):
+    registrar_leitura(notas_file_path)
+    # Notas discursivas já vêm como float (tipos.py, com decimal=',')
+    df_notas = ler_csv(notas_file_path, 'utf-8')
+    df_notas.columns = [col.upper() for col in df_notas.columns]
+
+    df_notas['CO_CURSO'] = pd.to_numeric(df_notas['CO_CURSO'], errors='coerce').astype('Int64')
+    return df_notas.dropna(subset=['CO_CURSO'])
+
+@instrumentar('calculate_year_curso', 'year')
+def calculate_year(year, campus_notas, curso_grupo_map, mapeamento):
+    # Junta os arq3 de todos os campus do ano e pontua tudo em um único lote; a chave (campus, curso)
+    # separa os resultados de volta por campus. As linhas de cada campus ficam contíguas, então a
+    # ordem de primeira ocorrência dentro de cada campus é a mesma do cálculo campus a campus.
+    df_ano = pd.concat(
+        [df_notas.assign(CAMPUS=campus_name) for campus_name, df_notas in campus_notas.items()],
+        ignore_index=True
+    )
+    contar_linhas(len(df_ano))
+    disc_cols = [col for col in df_ano.columns if col.startswith(('NT_CE_D', 'NT_FG_D'))]
+
+    chaves = pd.Series(list(zip(df_ano['CAMPUS'], df_ano['CO_CURSO'].to_numpy(dtype=object))), dtype=object).to_numpy()
+    linhas = np.arange(len(df_ano))
+    notas_disc = df_ano[disc_cols]
+
+    results_agg_ce = AcumuladorCompetencias()
+    results_agg_fg = AcumuladorCompetencias()
+
+    respostas_ce = respostas_da_prova(df_ano, 'DS_VT_ACE_OCE')
+    acumular_chunk(
+        results_agg_ce, chaves,
+        lambda chave: mapeamento.ce(curso_grupo_map.get(chave[1]), year),
+        respostas_ce, notas_disc, linhas
+    )
+
+    eventos_fg = mapeamento.fg(year)
+    if eventos_fg:
+        respostas_fg = respostas_da_prova(df_ano, 'DS_VT_ACE_OFG')
+        acumular_chunk(
+            results_agg_fg, chaves, lambda chave: eventos_fg,
+            respostas_fg, notas_disc, linhas
+        )
+
+    por_campus = {campus_name: ({}, {}) for campus_name in campus_notas}
+    for (campus_name, curso_id), comps in results_agg_ce.resultados().items():
+        por_campus[campus_name][0][curso_id] = comps
+    for (campus_name, curso_id), comps in results_agg_fg.resultados().items():
+        por_campus[campus_name][1][curso_id] = comps
+    return por_campus
+
+@instrumentar('run_calculation_curso')
 def run_calculation_curso():
     print("--- INICIANDO: Calculando Médias de Competência por CURSO (CE e FG) ---")
     
@@ -49,27 +106,28 @@ def run_calculation_curso():
 
     if not all([map_competencias_ce, map_competencias_fg, curso_grupo_map]):
         print("Encerrando script devido a erro no carregamento dos arquivos de mapeamento.")
-        return
+        return False
+
+    manifesto = Manifesto()
+    maps = {'ce': map_competencias_ce, 'fg': map_competencias_fg}
+    mapeamento = MapeamentoCompetencias(map_competencias_ce, map_competencias_fg)
 
+    falhas = []
     for year in YEARS_TO_PROCESS:
         print(f"\n=== Processando Ano: {year} ===")
         ano_str = str(year)
 
-        map_fg_ano_obj, map_fg_ano_disc, lista_componentes_fg = {}, {}, []
-        map_ano_fg_data = next((item for item in map_competencias_fg if str(item.get("ANO")) == ano_str), None)
-        if map_ano_fg_data:
-            lista_componentes_fg = map_ano_fg_data.get("Formacao_geral", [])
-            map_fg_ano_obj = map_ano_fg_data.get("questoes", {}).get("objetivas", {})
-            map_fg_ano_disc = map_ano_fg_data.get("questoes", {}).get("discursivas", {})
-        else:
+        if mapeamento.fg(year) is None:
             print(f"   -> Aviso: Mapeamento de FG para {year} não encontrado.")
 
         try:
             campus_folders = [d for d in os.listdir(PROCESSED_DATA_PATH) if os.path.isdir(os.path.join(PROCESSED_DATA_PATH, d))]
         except FileNotFoundError:
             print(f"   -> ERRO CRÍTICO: O diretório de dados processados não foi encontrado: {PROCESSED_DATA_PATH}")
+            falhas.append(year)
             continue
 
+        campus_notas, entradas_por_campus = {}, {}
         for campus_name in campus_folders:
             print(f"\n   >> Processando Campus: {campus_name}")
 
@@ -85,110 +143,49 @@ def run_calculation_curso():
             
             notas_file_path = notas_file_path_list[0]
 
-            try:
-                df_notas = pd.read_csv(notas_file_path, sep=';', encoding='utf-8', low_memory=False)
-                df_notas.columns = [col.upper() for col in df_notas.columns]
-                
-                df_notas['CO_CURSO'] = pd.to_numeric(df_notas['CO_CURSO'], errors='coerce').astype('Int64')
-                df_notas = df_notas.dropna(subset=['CO_CURSO'])
-
-                disc_cols = [col for col in df_notas.columns if col.startswith(('NT_CE_D', 'NT_FG_D'))]
-                for col in disc_cols:
-                    if df_notas[col].dtype == 'object':
-                        df_notas[col] = df_notas[col].str.replace(',', '.', regex=False)
-                    df_notas[col] = pd.to_numeric(df_notas[col], errors='coerce')
-                
-                results_curso_agg_ce = defaultdict(lambda: defaultdict(lambda: {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0}))
-                results_curso_agg_fg = defaultdict(lambda: defaultdict(lambda: {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0}))
-
-                for _, row in df_notas.iterrows():
-                    curso_id = row['CO_CURSO']
-                    co_grupo_str = curso_grupo_map.get(curso_id)
-
-                    if co_grupo_str and co_grupo_str in map_competencias_ce:
-                        map_grupo = map_competencias_ce[co_grupo_str]
-                        lista_componentes_ce = map_grupo.get('Componente_especifico', [])
-                        map_ano_ce = map_grupo.get('Anos', {}).get(ano_str, {})
-                        questoes_ce = map_ano_ce.get('questoes_CE', {})
-                        map_obj_ce = questoes_ce.get('objetivas', {})
-                        map_disc_ce = questoes_ce.get('discursivas', {})
-
-                        respostas_obj_ce = str(row['DS_VT_ACE_OCE']) if pd.notna(row['DS_VT_ACE_OCE']) else ''
-                        if len(respostas_obj_ce) >= 27:
-                            for q_key, mapeamento in map_obj_ce.items():
-                                try:
-                                    q_index = int(q_key[1:]) - 9
-                                    indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                                    for idx_1 in indices:
-                                        idx_0 = int(idx_1) - 1
-                                        if 0 <= idx_0 < len(lista_componentes_ce) and 0 <= q_index < len(respostas_obj_ce):
-                                            comp = lista_componentes_ce[idx_0]
-                                            resp = respostas_obj_ce[q_index]
-                                            if resp in ['0', '1']:
-                                                results_curso_agg_ce[curso_id][comp]['obj_validas'] += 1
-                                                if resp == '1':
-                                                    results_curso_agg_ce[curso_id][comp]['obj_acertos'] += 1
-                                except Exception:
-                                    continue 
-
-                        for d_key, mapeamento in map_disc_ce.items():
-                            try:
-                                suffix = int(d_key[1:]) - 2
-                                col_name = f"NT_CE_D{suffix}"
-                                indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                                for idx_1 in indices:
-                                    idx_0 = int(idx_1) - 1
-                                    if 0 <= idx_0 < len(lista_componentes_ce):
-                                        comp = lista_componentes_ce[idx_0]
-                                        nota = row.get(col_name)
-                                        if pd.notna(nota):
-                                            results_curso_agg_ce[curso_id][comp]['disc_soma'] += nota
-                                            results_curso_agg_ce[curso_id][comp]['disc_cont'] += 1
-                            except Exception:
-                                continue
-
-                    if map_ano_fg_data:
-                        respostas_obj_fg = str(row['DS_VT_ACE_OFG']) if pd.notna(row['DS_VT_ACE_OFG']) else ''
-                        if len(respostas_obj_fg) >= 8:
-                            for q_key, mapeamento in map_fg_ano_obj.items():
-                                try:
-                                    q_index = int(q_key[1:]) - 1
-                                    indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                                    for idx_1 in indices:
-                                        idx_0 = int(idx_1) - 1
-                                        if 0 <= idx_0 < len(lista_componentes_fg) and 0 <= q_index < len(respostas_obj_fg):
-                                            comp = lista_componentes_fg[idx_0]
-                                            resp = respostas_obj_fg[q_index]
-                                            if resp in ['0', '1']:
-                                                results_curso_agg_fg[curso_id][comp]['obj_validas'] += 1
-                                                if resp == '1':
-                                                    results_curso_agg_fg[curso_id][comp]['obj_acertos'] += 1
-                                except Exception:
-                                    continue
-
-                        for d_key, mapeamento in map_fg_ano_disc.items():
-                            try:
-                                suffix = int(d_key[1:])
-                                col_name = f"NT_FG_D{suffix}"
-                                indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                                for idx_1 in indices:
-                                    idx_0 = int(idx_1) - 1
-                                    if 0 <= idx_0 < len(lista_componentes_fg):
-                                        comp = lista_componentes_fg[idx_0]
-                                        nota = row.get(col_name)
-                                        if pd.notna(nota):
-                                            results_curso_agg_fg[curso_id][comp]['disc_soma'] += nota
-                                            results_curso_agg_fg[curso_id][comp]['disc_cont'] += 1
-                            except Exception:
-                                continue
-
-                calculate_and_save_results(BASE_CE_OUTPUT_PATH, campus_name, year, results_curso_agg_ce, "ce")
-                calculate_and_save_results(BASE_FG_OUTPUT_PATH, campus_name, year, results_curso_agg_fg, "fg")
+            unidade = f"medias_curso/{campus_name}/{year}"
+            entradas = {
+                'notas': manifesto.hash_arquivo(notas_file_path),
+                'cursos': manifesto.hash_arquivo(CURSOS_CSV_PATH),
+                'mapas': hash_mapas_ano(maps, year),
+            }
+            if manifesto.atualizado(unidade, entradas):
+                print(f"     -> Médias de {campus_name} {year} já atualizadas. Pulando.")
+                continue
 
+            try:
+                # O store de registros evita o parse do CSV; sem ele, lê o arq3 processado
+                df_notas = ler_notas(campus_name, year)
+                campus_notas[campus_name] = df_notas if df_notas is not None else load_notas_campus(notas_file_path)
+                entradas_por_campus[campus_name] = entradas
             except Exception as e:
                 print(f"   -> ERRO GERAL ao processar o arquivo {notas_file_path}: {e}")
+                falhas.append(year)
+
+        if not campus_notas:
+            continue
+
+        try:
+            por_campus = calculate_year(year, campus_notas, curso_grupo_map, mapeamento)
+        except Exception as e:
+            print(f"   -> ERRO GERAL ao calcular as médias por curso de {year}: {e}")
+            falhas.append(year)
+            continue
+
+        for campus_name, (results_curso_agg_ce, results_curso_agg_fg) in por_campus.items():
+            saidas = [
+                calculate_and_save_results(BASE_CE_OUTPUT_PATH, campus_name, year, results_curso_agg_ce, "ce"),
+                calculate_and_save_results(BASE_FG_OUTPUT_PATH, campus_name, year, results_curso_agg_fg, "fg"),
+            ]
+            manifesto.registrar(f"medias_curso/{campus_name}/{year}", entradas_por_campus[campus_name], [saida for saida in saidas if saida])
     
+    manifesto.salvar()
+    if falhas:
+        print(f"   -> ERRO: Médias por curso incompletas para {', '.join(sorted(set(falhas)))}.")
+        return False
     print("\n--- Cálculo de Médias por CURSO (CE e FG) Concluído ---")
+    return True
 
 if __name__ == '__main__':
-    run_calculation_curso()
\ No newline at end of file
+    if not run_calculation_curso():
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,143 @@
+import os
+import sys
+
+from config import (
+    RAW_DATA_PATH, YEARS_TO_PROCESS, FINAL_MEDIA_JSON_PATH,
+    FINAL_ESTRUTURA_JSON_PATH, REGIAO_CODE, UF_CODE, UFC_IES_CODE, USE_ESTATISTICAS_CURSO
+)
+
+from utils import (
+    load_json, get_relevant_grupos,
+    calculate_averages_competencia_escopos, save_json_safe, run_parallel,
+    workers_parser, get_competencia_inputs
+)
+from manifesto import Manifesto
+from estatisticas_curso import calcular_escopos
+from instrumentacao import instrumentar
+
+MAP_CE_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_competencias_final.json')
+MAP_FG_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_fg_final.json')
+
+BASE_CE_OUTPUT_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'CE', 'Medias_Agregadas')
+BASE_FG_OUTPUT_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico', 'FG', 'Medias_Agregadas')
+
+# sufixo do JSON -> (rótulo nos logs, coluna de filtro, valor do filtro)
+ESCOPOS = {
+    'br': ('BR', None, None),
+    'regiao': ('NE', 'CO_REGIAO_CURSO', REGIAO_CODE),
+    'uf': ('UF', 'CO_UF_CURSO', UF_CODE),
+    'ufc': ('UFC', 'CO_IES', UFC_IES_CODE),
+}
+
+
+def output_paths(year, json_suffix):
+    ano_str = str(year)
+    return (
+        os.path.join(BASE_CE_OUTPUT_PATH, ano_str, f'medias_{json_suffix}_ce.json'),
+        os.path.join(BASE_FG_OUTPUT_PATH, ano_str, f'medias_{json_suffix}_fg.json'),
+    )
+
+
+@instrumentar('run_calculation_escopos')
+def run_calculation_escopos(sufixos, workers=1):
+    # Calcula os escopos pedidos com uma única leitura do arq3 por ano,
+    # pulando os pares (ano, escopo) cujas entradas não mudaram desde o último build
+    relevant_grupos = get_relevant_grupos()
+    maps = {
+        'ce': load_json(MAP_CE_JSON_PATH),
+        'fg': load_json(MAP_FG_JSON_PATH)
+    }
+
+    if relevant_grupos is None or not maps['ce'] or not maps['fg']:
+        print("Encerrando script devido a erro ao obter arquivos de mapeamento.")
+        return False
+
+    manifesto = Manifesto()
+    configs_por_ano = []
+    entradas_por_unidade = {}
+    for year in YEARS_TO_PROCESS:
+        configs = []
+        for json_suffix in sufixos:
+            rotulo, filter_col, filter_val = ESCOPOS[json_suffix]
+            config = {
+                "year": year,
+                "year_path": os.path.join(RAW_DATA_PATH, f'enade_{year}'),
+                "maps": maps,
+                "json_suffix": json_suffix,
+                "group_by_curso": False,
+                "filter_col": filter_col,
+                "filter_val": filter_val,
+                "info_col_variants": {filter_col: [filter_col, f'"{filter_col}"']} if filter_col else {},
+                "relevant_grupos": relevant_grupos,
+            }
+
+            unidade = f"medias_dt/{year}/{json_suffix}"
+            entradas = get_competencia_inputs(manifesto, config)
+            if manifesto.atualizado(unidade, entradas, output_paths(year, json_suffix)):
+                print(f"   -> Médias ({rotulo}) de {year} já atualizadas. Pulando.")
+                continue
+
+            entradas_por_unidade[unidade] = entradas
+            configs.append(config)
+
+        if configs:
+            configs_por_ano.append(configs)
+
+    # Os anos são independentes: cada um pode rodar em um processo separado. Com as estatísticas por curso,
+    # os escopos são rollups da tabela do ano; sem elas, uma leitura do arq3 por ano
+    calcular = calcular_escopos if USE_ESTATISTICAS_CURSO else calculate_averages_competencia_escopos
+    resultados_por_ano = run_parallel(
+        calcular,
+        [(f"Ano {configs[0]['year']}", (configs,)) for configs in configs_por_ano],
+        workers, "Médias por ano"
+    )
+
+    falhas = []
+    for configs, resultados in zip(configs_por_ano, resultados_por_ano):
+        year = configs[0]['year']
+        if resultados is None:
+            falhas.append(year)
+            resultados = {}
+
+        for config in configs:
+            json_suffix = config['json_suffix']
+            rotulo = ESCOPOS[json_suffix][0]
+            medias_ce_ano, medias_fg_ano = resultados.get(json_suffix, (None, None))
+            output_path_ce, output_path_fg = output_paths(year, json_suffix)
+
+            if medias_ce_ano:
+                data_to_save_ce = {str(k): v for k, v in medias_ce_ano.items()}
+                if not save_json_safe(data_to_save_ce, output_path_ce, f"Médias CE ({rotulo}) de {year}"):
+                    falhas.append(year)
+            else:
+                print(f"   -> Aviso: Não foram calculadas médias CE ({rotulo}) para {year}.")
+
+            if medias_fg_ano:
+                data_to_save_fg = {str(k): v for k, v in medias_fg_ano.items()}
+                if not save_json_safe(data_to_save_fg, output_path_fg, f"Médias FG ({rotulo}) de {year}"):
+                    falhas.append(year)
+            else:
+                print(f"   -> Aviso: Não foram calculadas médias FG ({rotulo}) para {year}.")
+
+            # Só registra a unidade completa, para que anos sem dados sejam tentados de novo
+            if medias_ce_ano and medias_fg_ano:
+                unidade = f"medias_dt/{year}/{json_suffix}"
+                manifesto.registrar(unidade, entradas_por_unidade[unidade], [output_path_ce, output_path_fg])
+
+    manifesto.salvar()
+    if falhas:
+        print(f"   -> ERRO: Médias agregadas incompletas para {', '.join(sorted(set(falhas)))}.")
+        return False
+    return True
+
+
+def run_calculation_agregadas(workers=1):
+    print("Iniciando cálculo de médias BR, NE, UF e UFC em passada única...")
+    ok = run_calculation_escopos(list(ESCOPOS), workers)
+    print("\nProcesso de geração de médias agregadas (BR, NE, UF, UFC) por ano concluído.")
+    return ok
+
+if __name__ == '__main__':
+    args = workers_parser("Cálculo de médias agregadas de Desempenho por Tópico").parse_args()
+    if not run_calculation_agregadas(workers=args.workers):
+        sys.exit(1)
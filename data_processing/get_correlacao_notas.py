@@ -1,14 +1,17 @@
 import pandas as pd
 import os
+import sys
 import glob
 import json
-from collections import defaultdict
 import numpy as np 
-from tqdm import tqdm
 
-from config import PROCESSED_DATA_PATH, YEARS_TO_PROCESS, JSON_DATA_PATH, FINAL_CE_JSON_PATH
+from config import PROCESSED_DATA_PATH, YEARS_TO_PROCESS, JSON_DATA_PATH, FINAL_CE_JSON_PATH, FINAL_ESTRUTURA_JSON_PATH
+from pontuacao import AcumuladorCompetencias, MapeamentoCompetencias, acumular_chunk, respostas_da_prova
+from registros import ler_notas
+from tipos import ler_csv
+from instrumentacao import instrumentar, contar_linhas, registrar_leitura
 
-MAP_JSON_PATH = os.path.join(JSON_DATA_PATH, 'comp_especifico_grupo.json/estrutura_competencias_final.json')
+MAP_JSON_PATH = os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_competencias_final.json')
 CURSOS_CSV_PATH = os.path.join('data', 'cursos_ufc.csv')
 
 
@@ -43,118 +46,49 @@ def load_curso_grupo_map():
          print(f"  -> Erro ao ler mapa de cursos: {e}")
          return None
 
-def analisar_competencias_campus_ano(campus_path, campus_name, year, map_competencias, curso_grupo_map):
+@instrumentar('correlacao_notas', 'campus_name', 'year')
+def analisar_competencias_campus_ano(campus_path, campus_name, year, map_competencias, mapeamento, curso_grupo_map):
     print(f"Analisando Competências: {campus_name} - {year}")
 
-    notas_file_path = glob.glob(os.path.join(campus_path, '*arq3.csv'))
-    notas_file_path = glob.glob(os.path.join(campus_path, '*arq3.csv'))
-    if not notas_file_path:
-        print(f"  -> Aviso: Arquivo arq3.csv não encontrado.")
-        return {}
-
-    results = defaultdict(lambda: defaultdict(lambda: {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0}))
+    # Store de registros (notas numéricas e respostas empacotadas) ou, sem ele, o arq3 processado
+    df_notas = ler_notas(campus_name, year)
+    if df_notas is None:
+        notas_file_path = glob.glob(os.path.join(campus_path, '*arq3.csv'))
+        if not notas_file_path:
+            print(f"  -> Aviso: Arquivo arq3.csv não encontrado.")
+            return {}
 
     try:
-        df_notas = pd.read_csv(notas_file_path[0], sep=';', encoding='utf-8', low_memory=False)
-        df_notas.columns = [col.upper() for col in df_notas.columns]
+        if df_notas is None:
+            registrar_leitura(notas_file_path[0])
+            df_notas = ler_csv(notas_file_path[0], 'utf-8')
+            df_notas.columns = [col.upper() for col in df_notas.columns]
 
-        required_cols = ['CO_CURSO', 'DS_VT_ACE_OCE']
         disc_cols_ce = [col for col in df_notas.columns if col.startswith('NT_CE_D')]
-        required_cols.extend(disc_cols_ce)
 
-        if not 'CO_CURSO' in df_notas.columns or not 'DS_VT_ACE_OCE' in df_notas.columns:
+        if not 'CO_CURSO' in df_notas.columns or not any(col.startswith('DS_VT_ACE_OCE') for col in df_notas.columns):
              print(f"  -> ERRO: Colunas CO_CURSO ou DS_VT_ACE_OCE ausentes no arq3.")
              return {}
 
         df_notas['CO_CURSO'] = pd.to_numeric(df_notas['CO_CURSO'], errors='coerce').astype('Int64')
         df_notas = df_notas.dropna(subset=['CO_CURSO'])
-        for col in disc_cols_ce:
-            if df_notas[col].dtype == 'object':
-                 df_notas[col] = df_notas[col].str.replace(',', '.', regex=False)
-            df_notas[col] = pd.to_numeric(df_notas[col], errors='coerce')
 
 
         print(f"  -> Processando {len(df_notas)} registros de alunos...")
-        alunos_sem_mapeamento = 0
-
-        for index, row in tqdm(df_notas.iterrows(), total=len(df_notas), desc="Processando Alunos"):
-            curso_id = row['CO_CURSO']
-            co_grupo_str = curso_grupo_map.get(curso_id)
-
-            if not co_grupo_str or co_grupo_str not in map_competencias:
-                alunos_sem_mapeamento += 1
-                continue
-
-            map_grupo = map_competencias.get(co_grupo_str, {})
-            lista_componentes = map_grupo.get('Componente_especifico', []) 
-            map_ano = map_grupo.get('Anos', {}).get(str(year), {})
-            questoes_ce = map_ano.get('questoes_CE', {})
-            map_obj = questoes_ce.get('objetivas', {})
-            map_disc = questoes_ce.get('discursivas', {})
-
-            respostas_obj = str(row['DS_VT_ACE_OCE']) if pd.notna(row['DS_VT_ACE_OCE']) else ''
-            questoes_obj_mapeadas = list(map_obj.keys())
-
-            if len(respostas_obj) >= 27:
-                for q_key in questoes_obj_mapeadas:
-                    try:
-                        q_index = int(q_key[1:]) - 9
-                        if 0 <= q_index < len(respostas_obj):
-                            mapeamento = map_obj.get(q_key)
-
-                            if mapeamento is None: continue
-
-                            indices_competencia = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                            
-                            for indice_1_based in indices_competencia:
-                                try:
-                                    indice_0_based = int(indice_1_based) - 1 
-                                    if 0 <= indice_0_based < len(lista_componentes):
-                                        competencia_nome = lista_componentes[indice_0_based]
-                                        resposta = respostas_obj[q_index]
-                                        if resposta in ['0', '1']:
-                                            results[curso_id][competencia_nome]['obj_validas'] += 1
-                                            if resposta == '1':
-                                                results[curso_id][competencia_nome]['obj_acertos'] += 1
-                                    else:
-                                         print(f"  -> Aviso: Índice de competência inválido ({indice_1_based}) para {q_key} no grupo {co_grupo_str}/{year}.")
-                                except (ValueError, TypeError):
-                                     print(f"  -> Aviso: Valor de mapeamento inválido ('{indice_1_based}') para {q_key} no grupo {co_grupo_str}/{year}. Esperado número(s).")
-                    except (ValueError, IndexError):
-                         continue
-
-            questoes_disc_mapeadas = list(map_disc.keys())
-
-            for d_key in questoes_disc_mapeadas:
-                try:
-                    d_index_num = int(d_key[1:])
-                    nota_col_suffix = d_index_num - 2
-                    nota_col_name = f"NT_CE_D{nota_col_suffix}"
-
-                    mapeamento = map_disc.get(d_key)
-                    
-                    if mapeamento is None: continue
-
-                    indices_competencia = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-
-                    for indice_1_based in indices_competencia:
-                         try:
-                             indice_0_based = int(indice_1_based) - 1
-                             if 0 <= indice_0_based < len(lista_componentes):
-                                 competencia_nome = lista_componentes[indice_0_based]
-
-                                 if nota_col_name in row:
-                                     nota = row[nota_col_name]
-                                     if pd.notna(nota):
-                                         results[curso_id][competencia_nome]['disc_soma'] += nota
-                                         results[curso_id][competencia_nome]['disc_cont'] += 1
-                             else:
-                                 print(f"  -> Aviso: Índice de competência inválido ({indice_1_based}) para {d_key} no grupo {co_grupo_str}/{year}.")
-                         except (ValueError, TypeError):
-                              print(f"  -> Aviso: Valor de mapeamento inválido ('{indice_1_based}') para {d_key} no grupo {co_grupo_str}/{year}. Esperado número(s).")
-                    # =======================================
-                except ValueError:
-                    continue
+        contar_linhas(len(df_notas))
+        grupos = df_notas['CO_CURSO'].map(curso_grupo_map)
+        com_mapeamento = grupos.isin(list(map_competencias.keys())).to_numpy(dtype=bool)
+        alunos_sem_mapeamento = int((~com_mapeamento).sum())
+
+        df_mapeados = df_notas[com_mapeamento]
+        respostas = respostas_da_prova(df_mapeados, 'DS_VT_ACE_OCE')
+        acumulador = AcumuladorCompetencias()
+        acumular_chunk(
+            acumulador, df_mapeados['CO_CURSO'].to_numpy(dtype=object),
+            lambda curso_id: mapeamento.ce(curso_grupo_map.get(curso_id), year),
+            respostas, df_mapeados[disc_cols_ce], np.arange(len(df_mapeados))
+        )
+        results = acumulador.resultados()
 
         if alunos_sem_mapeamento > 0:
             print(f"  -> Aviso: {alunos_sem_mapeamento} alunos foram pulados por falta de mapeamento CO_GRUPO.")
@@ -186,10 +120,10 @@ def analisar_competencias_campus_ano(campus_path, campus_name, year, map_compete
 
     except KeyError as e:
         print(f"  -> ERRO de Coluna (KeyError) em {campus_name}/{year}: A coluna {e} não foi encontrada. Verifique o arquivo arq3.csv.")
-        return {}
+        return None
     except Exception as e:
         print(f"  -> ERRO GERAL ao processar competências de {campus_name}/{year}: {e}")
-        return {}
+        return None
 
 def main():
     map_competencias = load_json(MAP_JSON_PATH, "Mapeamento de Competências")
@@ -197,19 +131,25 @@ def main():
 
     if not map_competencias or not curso_grupo_map:
         print("Encerrando script devido a erro no carregamento dos arquivos de mapeamento.")
-        return
+        return False
+
+    # Só a parte CE é usada aqui; os avisos de mapeamento saem uma vez por (grupo, ano)
+    mapeamento = MapeamentoCompetencias(map_competencias, [])
 
     os.makedirs(JSON_DATA_PATH, exist_ok=True)
     campus_folders = [d for d in os.listdir(PROCESSED_DATA_PATH) if os.path.isdir(os.path.join(PROCESSED_DATA_PATH, d))]
 
+    falhas = []
     for campus_name in campus_folders:
         for year_str in YEARS_TO_PROCESS:
             campus_year_path = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year_str))
             if os.path.exists(campus_year_path):
                 resultados_competencia = analisar_competencias_campus_ano(
                     campus_year_path, campus_name, str(year_str),
-                    map_competencias, curso_grupo_map
+                    map_competencias, mapeamento, curso_grupo_map
                 )
+                if resultados_competencia is None:
+                    falhas.append(f"{campus_name}/{year_str}")
 
                 if resultados_competencia:
                     output_dir = os.path.join(FINAL_CE_JSON_PATH, campus_name)
@@ -221,6 +161,13 @@ def main():
                         print(f"  -> Sucesso! Análise de competência salva em '{output_path}'")
                     except Exception as e:
                         print(f"  -> ERRO ao salvar JSON de competências para {campus_name}/{year_str}: {e}")
+                        falhas.append(f"{campus_name}/{year_str}")
+
+    if falhas:
+        print(f"  -> ERRO: Análise de competências incompleta para {', '.join(falhas)}.")
+        return False
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if not main():
+        sys.exit(1)
@@ -1,27 +1,41 @@
+import sys
+from utils import workers_parser
+
 # Importa as FUNÇÕES de dentro do seu pacote
 from get_Media_DT.get_media_Nacional_DT import run_calculation_br
 from get_Media_DT.get_medias_Regiao_DT import run_calculation_regiao
-from get_Media_DT.get_medias_UF_DT import run_calculation_uf 
+from get_Media_DT.get_medias_UF_DT import run_calculation_uf
 from get_Media_DT.get_medias_UFC_DT import run_calculation_ufc
+from get_Media_DT.get_medias_Agregadas_DT import run_calculation_agregadas
 from get_Media_DT.get_media_Curso_DT import run_calculation_curso
 
-def main_orchestrator():
+def main_orchestrator(separado=False, workers=1):
     print("--- INICIANDO ORQUESTRADOR MESTRE DE CÁLCULO DE MÉDIAS ---")
 
-    print("\n[BLOCO 1/5] Calculando Médias Nacionais (BR)...")
-    run_calculation_br()
+    if separado:
+        print("\n[BLOCO 1/5] Calculando Médias Nacionais (BR)...")
+        ok = run_calculation_br(workers=workers)
+
+        print("\n[BLOCO 2/5] Calculando Médias Regionais (NE)...")
+        ok = run_calculation_regiao(workers=workers) and ok
 
-    print("\n[BLOCO 2/5] Calculando Médias Regionais (NE)...")
-    run_calculation_regiao()
+        print("\n[BLOCO 3/5] Calculando Médias Estaduais (UF)...")
+        ok = run_calculation_uf(workers=workers) and ok
 
-    print("\n[BLOCO 3/5] Calculando Médias Estaduais (UF)...")
-    run_calculation_uf()    
+        print("\n[BLOCO 4/5] Calculando Médias da UFC (UFC)...")
+        ok = run_calculation_ufc(workers=workers) and ok
+    else:
+        # Uma única leitura do arq3 por ano alimenta os quatro escopos
+        print("\n[BLOCO 1-4/5] Calculando Médias BR, NE, UF e UFC (passada única)...")
+        ok = run_calculation_agregadas(workers=workers)
 
-    print("\n[BLOCO 4/5] Calculando Médias da UFC (UFC)...")
-    run_calculation_ufc()
-    
     print("\n[BLOCO 5/5] Calculando Médias por Curso...")
-    run_calculation_curso()
+    return run_calculation_curso() and ok
 
 if __name__ == "__main__":
-    main_orchestrator()
\ No newline at end of file
+    parser = workers_parser("Cálculo das médias de Desempenho por Tópico")
+    parser.add_argument('--separado', action='store_true',
+                        help="Executa BR, NE, UF e UFC separadamente (uma leitura do arq3 por escopo)")
+    args = parser.parse_args()
+    if not main_orchestrator(separado=args.separado, workers=args.workers):
+        sys.exit(1)
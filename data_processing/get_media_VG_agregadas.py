@@ -1,19 +1,59 @@
 import pandas as pd
 import os
+import sys
 import glob
-import json
-from collections import defaultdict
 import numpy as np
-from tqdm import tqdm
 from utils import find_data_files
 from utils import get_relevant_grupos
 from utils import find_required_columns
+from utils import read_microdados
+from utils import progress, run_parallel, workers_parser, load_json, write_json
+from manifesto import Manifesto, hash_valor
+from instrumentacao import instrumentar, contar_linhas
+from estatisticas_curso import carregar as carregar_estatisticas, filtrar_cursos, rollup_notas
 
-from config import RAW_DATA_PATH, YEARS_TO_PROCESS, FINAL_VG_JSON_PATH
+from config import (
+    RAW_DATA_PATH, YEARS_TO_PROCESS, FINAL_VG_JSON_PATH, UFC_IES_CODE, UF_CODE, REGIAO_CODE, USE_ESTATISTICAS_CURSO
+)
 
 CURSOS_CSV_PATH = os.path.join('data', 'cursos_ufc.csv')
 OUTPUT_PATH = os.path.join(FINAL_VG_JSON_PATH, 'medias_agregadas_geral.json')
 
+LEVELS = ['nacional', 'regiao', 'uf', 'ufc']
+COLUNAS_NOTAS_STD = ['NT_GER', 'NT_FG', 'NT_CE']
+
+# Bits de nível de cada curso; 'nacional' vale para todos
+NIVEL_REGIAO, NIVEL_UF, NIVEL_UFC = 1, 2, 4
+NIVEIS_BITS = {'nacional': 0, 'regiao': NIVEL_REGIAO, 'uf': NIVEL_UF, 'ufc': NIVEL_UFC}
+# Mesmos níveis como filtros sobre a tabela de estatísticas por curso
+NIVEIS_FILTROS = {
+    'nacional': None,
+    'regiao': {'CO_REGIAO_CURSO': REGIAO_CODE},
+    'uf': {'CO_UF_CURSO': UF_CODE},
+    'ufc': {'CO_IES': UFC_IES_CODE},
+}
+
+def build_info_lookup(df_info_map):
+    # Arrays indexados pelo próprio CO_CURSO, no lugar do merge de cada chunk com df_info_map:
+    # grupo_idx guarda a posição do CO_GRUPO em `grupos` (-1 = curso fora dos grupos relevantes)
+    # e niveis os bits de região/UF/UFC do curso
+    df_info_map = df_info_map[df_info_map['CO_CURSO'] >= 0]
+    grupos = np.sort(df_info_map['CO_GRUPO'].unique())
+    cursos = df_info_map['CO_CURSO'].to_numpy(dtype=np.int64)
+    tamanho = int(cursos.max()) + 1 if len(cursos) else 0
+
+    grupo_idx = np.full(tamanho, -1, dtype=np.int32)
+    grupo_idx[cursos] = np.searchsorted(grupos, df_info_map['CO_GRUPO'].to_numpy())
+
+    niveis = np.zeros(tamanho, dtype=np.uint8)
+    niveis[cursos] = (
+        np.where(df_info_map['CO_REGIAO_CURSO'].to_numpy() == REGIAO_CODE, NIVEL_REGIAO, 0)
+        | np.where(df_info_map['CO_UF_CURSO'].to_numpy() == UF_CODE, NIVEL_UF, 0)
+        | np.where(df_info_map['CO_IES'].to_numpy() == UFC_IES_CODE, NIVEL_UFC, 0)
+    )
+    return grupos, grupo_idx, niveis
+
+@instrumentar('calculate_all_averages', 'year')
 def calculate_all_averages(year, year_path, relevant_grupos):
     print(f"\nCalculando médias agregadas para {year} (chunks)...")
     
@@ -69,8 +109,7 @@ def calculate_all_averages(year, year_path, relevant_grupos):
     try:
         print(f"  -> Lendo arquivo de info: {os.path.basename(info_file_path)}...")
         # Lendo o arquivo de info
-        df_info = pd.read_csv(info_file_path, sep=';', encoding='latin1', low_memory=False,
-                              usecols=[col_info_curso, col_info_grupo, col_info_ies, col_info_regiao, col_info_uf])
+        df_info = read_microdados(info_file_path, usecols=[col_info_curso, col_info_grupo, col_info_ies, col_info_regiao, col_info_uf])
         
         # Padronizando
         for col in [col_info_grupo, col_info_ies, col_info_regiao, col_info_uf]:
@@ -98,92 +137,67 @@ def calculate_all_averages(year, year_path, relevant_grupos):
         df_info_map = df_info_map.drop_duplicates(subset=['CO_CURSO'], keep='first')
 
         chunk_size = 500000
-        levels = ['nacional', 'regiao', 'uf', 'ufc']
+        grupos, grupo_idx, niveis = build_info_lookup(df_info_map)
 
-        # Inicializando acumuladores para soma e contagem
-        accumulators_sum = {level: defaultdict(lambda: defaultdict(float)) for level in levels}
-        accumulators_count = {level: defaultdict(lambda: defaultdict(int)) for level in levels}
+        # Acumuladores de soma e contagem: (nível, grupo, nota)
+        accumulators_sum = np.zeros((len(LEVELS), len(grupos), len(COLUNAS_NOTAS_STD)), dtype=np.float64)
+        accumulators_count = np.zeros((len(LEVELS), len(grupos), len(COLUNAS_NOTAS_STD)), dtype=np.int64)
+        grupos_vistos = np.zeros(len(grupos), dtype=bool)
         
         print(f"  -> Lendo {os.path.basename(notas_file_path)} em chunks...")
-        reader = pd.read_csv(
-            notas_file_path, sep=';', encoding='latin1', low_memory=False, 
-            usecols=notas_cols_real_list, iterator=True, chunksize=chunk_size
-        )
+        reader = read_microdados(notas_file_path, usecols=notas_cols_real_list, chunksize=chunk_size)
 
-        for chunk in tqdm(reader, desc=f"Processando Chunks {year}"):
+        for chunk in progress(reader, desc=f"Processando Chunks {year}"):
+            contar_linhas(len(chunk))
             # Padronizando as colunas
             chunk.columns = [col.upper() for col in chunk.columns]
             real_notas_col_curso_chunk = next(c for c in chunk.columns if c.upper() == col_notas_curso.upper())
             
-            # Converte CO_CURSO no chunk
-            chunk[real_notas_col_curso_chunk] = pd.to_numeric(chunk[real_notas_col_curso_chunk], errors='coerce')
-            chunk.dropna(subset=[real_notas_col_curso_chunk], inplace=True)
-            chunk[real_notas_col_curso_chunk] = chunk[real_notas_col_curso_chunk].astype('Int64')
-            
-            # Renomeia colunas de notas para padrão
-            chunk.rename(columns={
-                real_notas_col_curso_chunk: 'CO_CURSO',
-                real_col(notas_cols_map, 'NT_GER'): 'NT_GER',
-                real_col(notas_cols_map, 'NT_FG'): 'NT_FG',
-                real_col(notas_cols_map, 'NT_CE'): 'NT_CE',
-            }, inplace=True)
-
-            # Cruzando as notas com o mapa de informações
-            chunk_merged = pd.merge(chunk, df_info_map, on='CO_CURSO', how='inner')
-            if chunk_merged.empty: continue
-            
+            # Cruzando as notas com o mapa de informações por indexação direta no CO_CURSO
+            co_curso = pd.to_numeric(chunk[real_notas_col_curso_chunk], errors='coerce').to_numpy(dtype=np.float64)
+            no_mapa = ~np.isnan(co_curso) & (co_curso >= 0) & (co_curso < len(grupo_idx))
+            posicoes = np.flatnonzero(no_mapa)
+            cursos_chunk = co_curso[posicoes].astype(np.int64)
+            grupo_chunk = grupo_idx[cursos_chunk]
+            relevantes = grupo_chunk >= 0
+            if not relevantes.any(): continue
+            posicoes, cursos_chunk, grupo_chunk = posicoes[relevantes], cursos_chunk[relevantes], grupo_chunk[relevantes]
+
             # Padronizando colunas de notas
-            colunas_notas_std = ['NT_GER', 'NT_FG', 'NT_CE']
-            for col in colunas_notas_std:
-                if chunk_merged[col].dtype == 'object':
-                    chunk_merged.loc[:, col] = chunk_merged[col].str.replace(',', '.', regex=False).astype(float)
-                chunk_merged.loc[:, col] = pd.to_numeric(chunk_merged[col], errors='coerce')
+            notas = chunk[[real_col(notas_cols_map, col) for col in COLUNAS_NOTAS_STD]].iloc[posicoes]
+            notas.columns = COLUNAS_NOTAS_STD
+            for col in COLUNAS_NOTAS_STD:
+                notas[col] = pd.to_numeric(notas[col], errors='coerce')
 
-            
-            for col_nota in colunas_notas_std:
-                # Nacional (todos no chunk)
-                sum_nacional = chunk_merged.groupby('CO_GRUPO')[col_nota].sum()
-                count_nacional = chunk_merged.groupby('CO_GRUPO')[col_nota].count()
-                for grupo, val in sum_nacional.items(): accumulators_sum['nacional'][grupo][col_nota] += val
-                for grupo, val in count_nacional.items(): accumulators_count['nacional'][grupo][col_nota] += val
-                
-                # Região (Nordeste = 2)
-                chunk_regiao = chunk_merged[chunk_merged['CO_REGIAO_CURSO'] == 2]
-                sum_regiao = chunk_regiao.groupby('CO_GRUPO')[col_nota].sum()
-                count_regiao = chunk_regiao.groupby('CO_GRUPO')[col_nota].count()
-                for grupo, val in sum_regiao.items(): accumulators_sum['regiao'][grupo][col_nota] += val
-                for grupo, val in count_regiao.items(): accumulators_count['regiao'][grupo][col_nota] += val
-                
-                # UF (Ceará = 23)
-                chunk_uf = chunk_merged[chunk_merged['CO_UF_CURSO'] == 23]
-                sum_uf = chunk_uf.groupby('CO_GRUPO')[col_nota].sum()
-                count_uf = chunk_uf.groupby('CO_GRUPO')[col_nota].count()
-                for grupo, val in sum_uf.items(): accumulators_sum['uf'][grupo][col_nota] += val
-                for grupo, val in count_uf.items(): accumulators_count['uf'][grupo][col_nota] += val
-                
-                # UFC (IES = 583)
-                chunk_ufc = chunk_merged[chunk_merged['CO_IES'] == 583]
-                sum_ufc = chunk_ufc.groupby('CO_GRUPO')[col_nota].sum()
-                count_ufc = chunk_ufc.groupby('CO_GRUPO')[col_nota].count()
-                for grupo, val in sum_ufc.items(): accumulators_sum['ufc'][grupo][col_nota] += val
-                for grupo, val in count_ufc.items(): accumulators_count['ufc'][grupo][col_nota] += val
+            # Soma e contagem das três notas por nível com np.bincount, que acumula na ordem das linhas do
+            # chunk: é a mesma soma simples, sem compensação, que o groupby('CO_GRUPO') original fazia sobre
+            # as notas em object. Um groupby numérico (soma compensada) ou parciais por (grupo, bits de nível)
+            # mudam o arredondamento de médias em x.xx5
+            valores = notas.to_numpy(dtype=np.float64)
+            validos = ~np.isnan(valores)
+            niveis_chunk = niveis[cursos_chunk]
+            grupos_vistos[grupo_chunk] = True
+            for i, level in enumerate(LEVELS):
+                bit = NIVEIS_BITS[level]
+                no_nivel = (niveis_chunk & bit) == bit
+                for j in range(len(COLUNAS_NOTAS_STD)):
+                    linhas = no_nivel & validos[:, j]
+                    accumulators_sum[i, :, j] += np.bincount(grupo_chunk[linhas], weights=valores[linhas, j], minlength=len(grupos))
+                    accumulators_count[i, :, j] += np.bincount(grupo_chunk[linhas], minlength=len(grupos))
 
         final_means_year = {}
-        all_grupos = set().union(
-            *[accumulators_sum[level].keys() for level in levels]
-        )
         
         # Calculando médias finais
-        for grupo in all_grupos:
-            grupo_str = str(grupo)
+        for g in np.flatnonzero(grupos_vistos):
+            grupo_str = str(int(grupos[g]))
             final_means_year[grupo_str] = {}
-            for col_nota in colunas_notas_std:
+            for j, col_nota in enumerate(COLUNAS_NOTAS_STD):
                 col_sufixo = col_nota.split('_')[1].lower()
                 
-                for level in levels:
-                    soma = accumulators_sum[level].get(grupo, {}).get(col_nota, 0)
-                    cont = accumulators_count[level].get(grupo, {}).get(col_nota, 0)
-                    media = (soma / cont) if cont > 0 else None
+                for i, level in enumerate(LEVELS):
+                    soma = accumulators_sum[i, g, j]
+                    cont = accumulators_count[i, g, j]
+                    media = float(soma / cont) if cont > 0 else None
                     
                     chave_json = f"media_{level}_{col_sufixo}"
                     final_means_year[grupo_str][chave_json] = round(media, 2) if media is not None else None
@@ -195,25 +209,89 @@ def calculate_all_averages(year, year_path, relevant_grupos):
         print(f"  -> ERRO GERAL ao processar médias agregadas de {year}: {e}")
         return None
 
-def main():
+@instrumentar('calculate_all_averages_estatisticas', 'year')
+def calculate_all_averages_estatisticas(year, year_path, relevant_grupos):
+    # Mesmo resultado de calculate_all_averages, com cada nível como rollup da tabela de estatísticas do ano
+    print(f"\nCalculando médias agregadas para {year} (estatísticas por curso)...")
+    tabelas = carregar_estatisticas(year)
+    if tabelas is None:
+        print(f"  -> ERRO CRÍTICO: Estatísticas por curso indisponíveis para {year}.")
+        return None
+
+    df_cursos = tabelas[0].dropna(subset=['CO_IES', 'CO_REGIAO_CURSO', 'CO_UF_CURSO'])
+    df_cursos = filtrar_cursos(df_cursos, grupos=relevant_grupos)
+    rollups = {level: rollup_notas(filtrar_cursos(df_cursos, filtros)) for level, filtros in NIVEIS_FILTROS.items()}
+
+    final_means_year = {}
+    for grupo in np.sort(df_cursos['CO_GRUPO'].unique()):
+        grupo_str = str(int(grupo))
+        final_means_year[grupo_str] = {}
+        for col_nota in COLUNAS_NOTAS_STD:
+            col_sufixo = col_nota.split('_')[1].lower()
+            for level in LEVELS:
+                rollup = rollups[level]
+                media = rollup.at[grupo, f'media_{col_nota}'] if grupo in rollup.index else None
+                media = None if media is None or pd.isna(media) else float(media)
+                final_means_year[grupo_str][f"media_{level}_{col_sufixo}"] = round(media, 2) if media is not None else None
+
+    print(f"  -> Médias agregadas (estatísticas por curso) calculadas para {year}.")
+    return final_means_year
+
+def main(workers=1):
     relevant_grupos = get_relevant_grupos()
     if relevant_grupos is None:
         print("Encerrando script devido a erro ao obter CO_GRUPOs.")
-        return
+        return False
 
     os.makedirs(FINAL_VG_JSON_PATH, exist_ok=True)
     medias_totais_todos_anos = {}
 
+    # Anos com as mesmas entradas do último build reaproveitam o que já está no JSON de saída
+    manifesto = Manifesto()
+    medias_anteriores = (load_json(OUTPUT_PATH) or {}) if os.path.exists(OUTPUT_PATH) else {}
+    entradas_por_ano = {}
+    for year in YEARS_TO_PROCESS:
+        entradas = {
+            'microdados': manifesto.hash_arquivos(find_data_files(os.path.join(RAW_DATA_PATH, f'enade_{year}'))),
+            'cursos': manifesto.hash_arquivo(CURSOS_CSV_PATH),
+            'constantes': hash_valor([REGIAO_CODE, UF_CODE, UFC_IES_CODE]),
+        }
+        if str(year) in medias_anteriores and manifesto.atualizado(f"medias_vg/{year}", entradas, [OUTPUT_PATH]):
+            print(f"   -> Médias agregadas de {year} já atualizadas. Pulando.")
+            continue
+        entradas_por_ano[year] = entradas
+
+    anos = list(entradas_por_ano)
+    tasks = [
+        (f"Ano {year}", (year, os.path.join(RAW_DATA_PATH, f'enade_{year}'), relevant_grupos))
+        for year in anos
+    ]
+    calcular = calculate_all_averages_estatisticas if USE_ESTATISTICAS_CURSO else calculate_all_averages
+    resultados = dict(zip(anos, run_parallel(calcular, tasks, workers, "Médias agregadas")))
+
+    falhas = []
     for year in YEARS_TO_PROCESS:
-        year_extract_path = os.path.join(RAW_DATA_PATH, f'enade_{year}')
-        medias_ano = calculate_all_averages(year, year_extract_path, relevant_grupos) 
+        if year in resultados:
+            medias_ano = resultados[year]
+            if medias_ano:
+                manifesto.registrar(f"medias_vg/{year}", entradas_por_ano[year], [OUTPUT_PATH])
+            else:
+                falhas.append(year)
+        else:
+            medias_ano = medias_anteriores.get(str(year))
         if medias_ano:
             medias_totais_todos_anos[str(year)] = medias_ano
 
-    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(medias_totais_todos_anos, f, ensure_ascii=False, indent=4)
+    write_json(medias_totais_todos_anos, OUTPUT_PATH)
     
+    manifesto.salvar()
+    if falhas:
+        print(f"\nERRO: Médias agregadas não calculadas para {', '.join(falhas)}.")
+        return False
     print(f"\nSucesso! Médias agregadas salvas em '{OUTPUT_PATH}'")
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    args = workers_parser("Cálculo das médias agregadas de Visão Geral").parse_args()
+    if not main(workers=args.workers):
+        sys.exit(1)
\ No newline at end of file
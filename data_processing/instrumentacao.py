@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import inspect
+import argparse
+import cProfile
+import functools
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime
+
+from config import TRACE_ENABLED, TRACE_PATH, PROFILE_PATH, PROFILE_ETAPAS
+import compactados
+
+# Spans de tempo das etapas do pipeline, gravados em TRACE_PATH (uma linha JSON por span) com etapa,
+# contexto (ano, escopo, campus...), segundos, CPU, linhas processadas, bytes lidos e pico de memória.
+# Uso nas etapas:
+#   @instrumentar('process_year', 'year')      span por chamada, com o argumento year no contexto
+#   with etapa('calculate_year', year=year):   span em um trecho
+#   contar_linhas(len(chunk))                  soma linhas no span atual
+# Resumo (a partir de data_processing): python instrumentacao.py [--execucao ID] [--top 15]
+
+# Identifica a execução; os processos de run_parallel herdam o valor pelo ambiente
+EXECUCAO = os.environ.setdefault('ENADE_EXECUCAO', datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6])
+
+_local = threading.local()
+_erro_gravacao = False
+
+
+class Span:
+    def __init__(self, nome, contexto):
+        self.nome = nome
+        self.contexto = contexto
+        self.linhas = 0
+        self.bytes_lidos = 0
+
+
+def _pilha():
+    if not hasattr(_local, 'pilha'):
+        _local.pilha = []
+    return _local.pilha
+
+def pico_rss_mb():
+    # Pico de memória do processo até agora (ru_maxrss não existe no Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def contar_linhas(n):
+    pilha = _pilha()
+    if pilha:
+        pilha[-1].linhas += int(n)
+
+def registrar_leitura(path):
+    # Bytes lidos contam para todos os spans abertos (a etapa e as que a envolvem)
+    tamanho = compactados.tamanho(path)
+    if tamanho is None:
+        return
+    for span in _pilha():
+        span.bytes_lidos += tamanho
+
+def anotar(**contexto):
+    pilha = _pilha()
+    if pilha:
+        pilha[-1].contexto.update({chave: valor for chave, valor in contexto.items() if valor is not None})
+
+
+def _etapas_perfiladas():
+    valor = os.environ.get('ENADE_PROFILE')
+    return {nome.strip() for nome in valor.split(',')} if valor else set(PROFILE_ETAPAS)
+
+def _iniciar_perfil(nome):
+    etapas = _etapas_perfiladas()
+    # Um perfilador por vez: etapas aninhadas entram no perfil da etapa de fora
+    if getattr(_local, 'perfilando', False) or (nome not in etapas and 'all' not in etapas):
+        return None
+
+    if os.environ.get('ENADE_PROFILER') == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+            perfil = Profiler()
+            perfil.start()
+            _local.perfilando = True
+            return perfil
+        except ImportError:
+            print("   -> Aviso: pyinstrument não instalado; usando cProfile.")
+
+    perfil = cProfile.Profile()
+    perfil.enable()
+    _local.perfilando = True
+    return perfil
+
+def _salvar_perfil(perfil, span):
+    _local.perfilando = False
+    partes = [EXECUCAO, span.nome] + [str(valor) for valor in span.contexto.values()] + [str(os.getpid())]
+    base = os.path.join(PROFILE_PATH, re.sub(r'[^\w.-]+', '_', '_'.join(partes)))
+    try:
+        os.makedirs(PROFILE_PATH, exist_ok=True)
+        if isinstance(perfil, cProfile.Profile):
+            perfil.disable()
+            perfil.dump_stats(base + '.prof')
+            return base + '.prof'
+        perfil.stop()
+        with open(base + '.html', 'w', encoding='utf-8') as f:
+            f.write(perfil.output_html())
+        return base + '.html'
+    except Exception as e:
+        print(f"   -> ERRO ao salvar perfil de {span.nome}: {e}")
+        return None
+
+def _gravar(registro):
+    global _erro_gravacao
+    try:
+        os.makedirs(os.path.dirname(TRACE_PATH), exist_ok=True)
+        with open(TRACE_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+    except Exception as e:
+        if not _erro_gravacao:
+            print(f"   -> Aviso: não foi possível gravar o trace em '{TRACE_PATH}': {e}")
+            _erro_gravacao = True
+
+
+@contextmanager
+def etapa(nome, **contexto):
+    span = Span(nome, {chave: valor for chave, valor in contexto.items() if valor is not None})
+    pilha = _pilha()
+    pai = pilha[-1].nome if pilha else None
+    pilha.append(span)
+    perfil = _iniciar_perfil(nome)
+
+    inicio = datetime.now().isoformat(timespec='milliseconds')
+    relogio, cpu = time.perf_counter(), time.process_time()
+    erro = None
+    try:
+        yield span
+    except BaseException as e:
+        erro = repr(e)
+        raise
+    finally:
+        segundos = time.perf_counter() - relogio
+        cpu_segundos = time.process_time() - cpu
+        pilha.pop()
+        perfil_path = _salvar_perfil(perfil, span) if perfil is not None else None
+
+        if TRACE_ENABLED:
+            _gravar({
+                'execucao': EXECUCAO,
+                'etapa': nome,
+                'pai': pai,
+                'contexto': span.contexto,
+                'inicio': inicio,
+                'segundos': round(segundos, 4),
+                'cpu_segundos': round(cpu_segundos, 4),
+                'linhas': span.linhas,
+                'bytes_lidos': span.bytes_lidos,
+                'pico_rss_mb': pico_rss_mb(),
+                'pid': os.getpid(),
+                'erro': erro,
+                'perfil': perfil_path,
+            })
+
+def instrumentar(nome, *argumentos):
+    # Decorador: um span por chamada; argumentos são os parâmetros da função que entram no contexto
+    def decorador(func):
+        assinatura = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            valores = assinatura.bind_partial(*args, **kwargs).arguments
+            with etapa(nome, **{argumento: valores.get(argumento) for argumento in argumentos}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def carregar_trace(path=TRACE_PATH):
+    registros = []
+    if not os.path.exists(path):
+        return registros
+    with open(path, 'r', encoding='utf-8') as f:
+        for linha in f:
+            try:
+                registros.append(json.loads(linha))
+            except json.JSONDecodeError:
+                continue
+    return registros
+
+def resumo(registros, top=15):
+    por_etapa = defaultdict(lambda: {'spans': 0, 'segundos': 0.0, 'maximo': 0.0, 'linhas': 0, 'bytes': 0, 'pico': 0.0, 'erros': 0})
+    for registro in registros:
+        dados = por_etapa[registro['etapa']]
+        dados['spans'] += 1
+        dados['segundos'] += registro['segundos']
+        dados['maximo'] = max(dados['maximo'], registro['segundos'])
+        dados['linhas'] += registro.get('linhas') or 0
+        dados['bytes'] += registro.get('bytes_lidos') or 0
+        dados['pico'] = max(dados['pico'], registro.get('pico_rss_mb') or 0)
+        dados['erros'] += 1 if registro.get('erro') else 0
+
+    print(f"\n{'Etapa':<32}{'Spans':>7}{'Total (s)':>12}{'Máx (s)':>10}{'Linhas':>12}{'Linhas/s':>11}{'Lido (MB)':>11}{'Pico (MB)':>11}")
+    for nome, dados in sorted(por_etapa.items(), key=lambda item: item[1]['segundos'], reverse=True)[:top]:
+        linhas_s = round(dados['linhas'] / dados['segundos']) if dados['linhas'] and dados['segundos'] > 0 else '-'
+        print(
+            f"{nome:<32}{dados['spans']:>7}{dados['segundos']:>12.2f}{dados['maximo']:>10.2f}{dados['linhas']:>12}"
+            f"{linhas_s:>11}{dados['bytes'] / 2**20:>11.1f}{dados['pico']:>11.1f}"
+            + (f"  ({dados['erros']} com erro)" if dados['erros'] else '')
+        )
+
+    print("\nSpans mais lentos:")
+    for registro in sorted(registros, key=lambda r: r['segundos'], reverse=True)[:top]:
+        contexto = ', '.join(f"{chave}={valor}" for chave, valor in registro.get('contexto', {}).items())
+        print(f"   {registro['segundos']:>9.2f}s  {registro['etapa']}" + (f" [{contexto}]" if contexto else '')
+              + (f"  perfil: {registro['perfil']}" if registro.get('perfil') else ''))
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo do trace de execução do pipeline")
+    parser.add_argument('--trace', default=TRACE_PATH)
+    parser.add_argument('--execucao', help="ID da execução (padrão: a última do trace)")
+    parser.add_argument('--todas', action='store_true', help="Soma todas as execuções do trace")
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    registros = carregar_trace(args.trace)
+    if not registros:
+        print(f"Nenhum span encontrado em '{args.trace}'.")
+        return
+
+    if not args.todas:
+        execucao = args.execucao or registros[-1]['execucao']
+        registros = [registro for registro in registros if registro['execucao'] == execucao]
+        print(f"Execução {execucao}: {len(registros)} spans")
+    resumo(registros, args.top)
+
+if __name__ == '__main__':
+    main()
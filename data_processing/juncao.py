@@ -0,0 +1,160 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+from config import RAW_DATA_PATH, YEARS_TO_PROCESS
+from utils import find_data_files, find_required_columns, read_microdados, progress
+from instrumentacao import instrumentar, contar_linhas
+import compactados
+
+# Junção por aluno dos arquivos de um ano (arq1: curso e instituição, arq3: notas e respostas, arq4:
+# questionário...). Nos microdados do INEP a linha i de cada arquivo é o mesmo aluno, então os arquivos
+# são lidos lado a lado, uma vez cada, e cada lote sai com as colunas pedidas de todos eles, sem merge
+# por CO_CURSO (que repetiria as colunas do curso para cada aluno numa cópia expandida do frame).
+# O índice de cada lote é a linha do aluno no ano (a mesma 'linha' usada pela pontuação).
+# Uso:
+#   for lote in ler_alinhado('2019', {'arq1': ['CO_IES'], 'arq3': ['CO_CURSO', 'NT_GER'], 'arq4': ['QE_I08']}):
+#       ...
+# Verificação do alinhamento (a partir de data_processing): python juncao.py [--anos 2019 2023]
+
+CHUNK_SIZE = 500000
+# Coluna presente em todos os arquivos, comparada lote a lote para detectar arquivos desalinhados
+CHAVE_ALINHAMENTO = 'CO_CURSO'
+
+
+def arquivos_do_ano(year):
+    # Nome lógico -> arquivo (extraído ou membro do zip/rar)
+    arquivos = {}
+    for path in find_data_files(os.path.join(RAW_DATA_PATH, f'enade_{year}')):
+        nome = compactados.nome_logico(path)
+        if nome:
+            arquivos.setdefault(nome, path)
+    return arquivos
+
+def _variantes(colunas):
+    return {col: [col, f'"{col}"'] for col in colunas}
+
+def _realinhar(leitores, nomes):
+    # Os chunks do cache Parquet seguem os row groups e podem ter tamanhos diferentes entre os arquivos:
+    # cada lote vai até o fim do menor chunk disponível (com os CSVs, os chunks já têm o mesmo tamanho)
+    cabecas = [None] * len(leitores)
+    while True:
+        for i, leitor in enumerate(leitores):
+            while cabecas[i] is None or len(cabecas[i]) == 0:
+                cabecas[i] = next(leitor, None)
+                if cabecas[i] is None:
+                    break
+        terminados = [nome for nome, cabeca in zip(nomes, cabecas) if cabeca is None]
+        if len(terminados) == len(leitores):
+            return
+        if terminados:
+            raise ValueError(f"número de linhas diferente entre os arquivos ({', '.join(terminados)} terminou antes)")
+        n = min(len(cabeca) for cabeca in cabecas)
+        yield [cabeca.iloc[:n] for cabeca in cabecas]
+        cabecas = [cabeca.iloc[n:] for cabeca in cabecas]
+
+def _chave(valores):
+    return pd.to_numeric(valores, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _lotes(planos, chunksize, verificar):
+    nomes = [nome for nome, _, _, _ in planos]
+    leitores = [
+        iter(read_microdados(path, usecols=list(cols_map.values()), chunksize=chunksize))
+        for _, path, cols_map, _ in planos
+    ]
+    inicio = 0
+    for partes in _realinhar(leitores, nomes):
+        n = len(partes[0])
+        indice = pd.RangeIndex(inicio, inicio + n, name='linha')
+        frames, incluidas, referencia = [], set(), None
+        for (nome, _, cols_map, pedidas), parte in zip(planos, partes):
+            parte = parte.rename(columns={real: padrao for padrao, real in cols_map.items()})
+            parte.index = indice
+
+            if verificar and CHAVE_ALINHAMENTO in parte.columns:
+                chave = _chave(parte[CHAVE_ALINHAMENTO])
+                if referencia is None:
+                    referencia = (nome, chave)
+                else:
+                    iguais = (referencia[1] == chave) | (np.isnan(referencia[1]) & np.isnan(chave))
+                    if not iguais.all():
+                        diferente = np.flatnonzero(~iguais)[0]
+                        raise ValueError(
+                            f"{nome} desalinhado de {referencia[0]} na linha {inicio + diferente} "
+                            f"({CHAVE_ALINHAMENTO} {referencia[1][diferente]} x {chave[diferente]})"
+                        )
+
+            # Colunas pedidas a mais de um arquivo saem uma vez só (a do primeiro)
+            novas = [col for col in pedidas if col not in incluidas]
+            incluidas.update(novas)
+            if novas:
+                frames.append(parte[novas])
+
+        contar_linhas(n)
+        inicio += n
+        # Os frames já compartilham o índice: a concatenação só junta os blocos de colunas
+        yield pd.concat(frames, axis=1, copy=False) if frames else pd.DataFrame(index=indice)
+
+def ler_alinhado(year, colunas, chunksize=CHUNK_SIZE, verificar=True, arquivos=None):
+    # colunas: {nome lógico: [colunas padronizadas]}; devolve um iterador de DataFrames (um por lote)
+    # ou None se faltar arquivo ou coluna. Com verificar, o CO_CURSO de cada arquivo é comparado lote a lote.
+    arquivos = arquivos if arquivos is not None else arquivos_do_ano(year)
+    planos = []
+    for nome, pedidas in colunas.items():
+        path = arquivos.get(nome)
+        if not path:
+            print(f"   -> ERRO: Arquivo {nome} não encontrado para {year}.")
+            return None
+        pedidas = list(dict.fromkeys(pedidas))
+        lidas = list(pedidas)
+        if verificar and CHAVE_ALINHAMENTO not in lidas and find_required_columns(path, _variantes([CHAVE_ALINHAMENTO])):
+            lidas.append(CHAVE_ALINHAMENTO)
+        cols_map = find_required_columns(path, _variantes(lidas))
+        if cols_map is None:
+            print(f"   -> ERRO: Colunas {pedidas} não encontradas em {os.path.basename(path)}.")
+            return None
+        planos.append((nome, path, cols_map, pedidas))
+
+    if not planos:
+        print("   -> ERRO: Nenhum arquivo pedido para a junção.")
+        return None
+    return _lotes(planos, chunksize, verificar)
+
+
+@instrumentar('verificar_alinhamento', 'year')
+def verificar_alinhamento(year):
+    # Lê só o CO_CURSO de cada arquivo do ano e confere que as linhas batem
+    arquivos = arquivos_do_ano(year)
+    colunas = {
+        nome: [CHAVE_ALINHAMENTO] for nome, path in sorted(arquivos.items())
+        if find_required_columns(path, _variantes([CHAVE_ALINHAMENTO]))
+    }
+    if len(colunas) < 2:
+        print(f"   -> Aviso: menos de dois arquivos com {CHAVE_ALINHAMENTO} em {year}. Nada a verificar.")
+        return None
+
+    lotes = ler_alinhado(year, colunas, arquivos=arquivos)
+    if lotes is None:
+        return False
+    total = 0
+    try:
+        for lote in progress(lotes, desc=f"Verificando {year}"):
+            total += len(lote)
+    except ValueError as e:
+        print(f"   -> ERRO: {year}: {e}")
+        return False
+    print(f"   -> {year}: {', '.join(colunas)} alinhados ({total} linhas).")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere o alinhamento por linha dos arquivos de microdados de cada ano")
+    parser.add_argument('--anos', nargs='+', default=YEARS_TO_PROCESS, help="Anos a verificar (padrão: YEARS_TO_PROCESS)")
+    args = parser.parse_args()
+
+    for year in args.anos:
+        print(f"\n=== Verificando {year} ===")
+        verificar_alinhamento(year)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+
+from config import BUILD_MANIFEST_PATH, INCREMENTAL_BUILD
+import compactados
+
+
+def hash_valor(valor):
+    # Hash estável de estruturas JSON (fatias de mapeamento, constantes do config...)
+    conteudo = json.dumps(valor, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+class Manifesto:
+    # Registra, para cada unidade de build (ex.: "medias_dt/2019/br"), os hashes das entradas
+    # e os arquivos gerados. Uma unidade só é recalculada quando alguma entrada muda.
+    def __init__(self, path=BUILD_MANIFEST_PATH):
+        self.path = path
+        self.dados = self._carregar()
+        self.arquivos_alterados = {}
+        self.unidades_alteradas = {}
+
+    def _carregar(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    dados = json.load(f)
+                dados.setdefault('arquivos', {})
+                dados.setdefault('unidades', {})
+                return dados
+            except Exception as e:
+                print(f"   -> Aviso: manifesto de build ilegível ({e}). Tudo será recalculado.")
+        return {'arquivos': {}, 'unidades': {}}
+
+    def hash_arquivo(self, path):
+        if path and compactados.eh_membro(path):
+            # Membro de zip/rar: hash do arquivo que o contém mais o nome do membro
+            arquivo, membro = compactados.dividir(path)
+            hash_arquivo = self.hash_arquivo(arquivo)
+            return hash_valor([hash_arquivo, membro]) if hash_arquivo else None
+        if not path or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        chave = os.path.normpath(path)
+
+        # Reaproveita o hash enquanto tamanho e mtime não mudarem (os brutos têm vários GB)
+        registro = self.dados['arquivos'].get(chave)
+        if registro and registro['tamanho'] == stat.st_size and registro['mtime'] == stat.st_mtime:
+            return registro['sha256']
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for bloco in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                sha.update(bloco)
+
+        registro = {'tamanho': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha.hexdigest()}
+        self.dados['arquivos'][chave] = registro
+        self.arquivos_alterados[chave] = registro
+        return registro['sha256']
+
+    def hash_arquivos(self, paths):
+        return hash_valor(sorted((os.path.normpath(p), self.hash_arquivo(p)) for p in paths))
+
+    def atualizado(self, unidade, entradas, saidas=None):
+        if not INCREMENTAL_BUILD:
+            return False
+        registro = self.dados['unidades'].get(unidade)
+        if not registro or registro.get('entradas') != entradas:
+            return False
+        saidas = registro.get('saidas', []) if saidas is None else saidas
+        return all(os.path.exists(saida) for saida in saidas)
+
+    def registrar(self, unidade, entradas, saidas):
+        registro = {'entradas': entradas, 'saidas': [os.path.normpath(s) for s in saidas]}
+        self.dados['unidades'][unidade] = registro
+        self.unidades_alteradas[unidade] = registro
+
+    def salvar(self):
+        if not self.arquivos_alterados and not self.unidades_alteradas:
+            return
+        # Relê o arquivo antes de gravar para não descartar unidades registradas por outro script
+        dados = self._carregar()
+        dados['arquivos'].update(self.arquivos_alterados)
+        dados['unidades'].update(self.unidades_alteradas)
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(dados, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            self.dados = dados
+            self.arquivos_alterados, self.unidades_alteradas = {}, {}
+        except Exception as e:
+            print(f"   -> ERRO ao salvar manifesto de build: {e}")
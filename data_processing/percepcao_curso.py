@@ -1,14 +1,24 @@
 import pandas as pd
 import os
+import sys
 import glob
-import json
 import numpy as np
 from collections import defaultdict
 
 from config import PROCESSED_DATA_PATH, YEARS_TO_PROCESS, JSON_DATA_PATH, QUESTOES_MAP
+from registros import ler_questionario
+from utils import save_json_shards, write_json
+from instrumentacao import instrumentar, contar_linhas, registrar_leitura
+import catalogo
+from tipos import ler_csv
 
 OUTPUT_PERFIL_BASE_PATH = os.path.join(JSON_DATA_PATH, 'Analise_Perfil')
 
+# Escala das questões de percepção: 1 a 6 são respostas válidas, 7 e 8 "não sei" / "não se aplica"
+CODIGOS_VALIDOS = np.arange(1, 7)
+CODIGOS_NAO_SEI = [7, 8]
+N_CODIGOS = 9
+
 def load_course_names():
     curso_path = os.path.join('data', 'cursos_ufc.csv')
     if not os.path.exists(curso_path): return {}
@@ -17,6 +27,23 @@ def load_course_names():
         return pd.Series(df.Curso.values, index=df['Código']).to_dict()
     except: return {}
 
+def histogramas_likert(df, colunas):
+    # Contagem de cada código de resposta (0 = ausente/fora da escala, 1 a 8) por curso e questão,
+    # em um único bincount sobre (curso, questão, código). Os cursos saem na ordem de aparição.
+    codigos_curso, cursos = pd.factorize(df['CO_CURSO'])
+    com_curso = codigos_curso >= 0
+    codigos_curso = codigos_curso[com_curso]
+    respostas = df[colunas].to_numpy(dtype=np.float64, na_value=np.nan)[com_curso]
+    na_escala = np.isin(respostas, np.arange(1, N_CODIGOS))
+    codigos = np.where(na_escala, respostas, 0).astype(np.int64)
+
+    n_questoes = len(colunas)
+    chaves = (codigos_curso[:, None] * n_questoes + np.arange(n_questoes)) * N_CODIGOS + codigos
+    histogramas = np.bincount(chaves.ravel(), minlength=len(cursos) * n_questoes * N_CODIGOS)
+    totais = np.bincount(codigos_curso, minlength=len(cursos))
+    return cursos, histogramas.reshape(len(cursos), n_questoes, N_CODIGOS), totais
+
+@instrumentar('percepcao_curso')
 def main():
     print("--- INICIANDO: Geração Unificada de Análise de Perfil ---")
 
@@ -26,6 +53,7 @@ def main():
     colunas_interesse = list(QUESTOES_MAP.keys()) 
     nome_cursos_map = load_course_names()
 
+    falhas = []
     for campus_name in campus_folders:
         print(f"\nProcessando Campus: {campus_name}")
         
@@ -35,31 +63,41 @@ def main():
             campus_year_path = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year))
             if not os.path.exists(campus_year_path): continue
 
-            possible_files = glob.glob(os.path.join(campus_year_path, '*arq4.csv'))
-            
-            target_file = None
-            found_cols = []
-
-            for fpath in possible_files:
-                try:
-                    df_head = pd.read_csv(fpath, sep=';', encoding='utf-8', nrows=1)
-                    cols_upper = [c.upper() for c in df_head.columns]
+            # Códigos QE_I* do store de registros (0 = sem resposta, fora da escala como o NaN do CSV)
+            # ou, sem ele, o arq4 processado
+            df = ler_questionario(campus_name, year)
+            if df is not None:
+                found_cols = [c for c in colunas_interesse if c in df.columns]
+                if len(found_cols) <= 5:
+                    continue
+            else:
+                possible_files = glob.glob(os.path.join(campus_year_path, '*arq4.csv'))
+                
+                target_file = None
+                found_cols = []
+
+                for fpath in possible_files:
+                    cols_arquivo = catalogo.colunas(fpath)
+                    if not cols_arquivo:
+                        continue
+                    cols_upper = [c.upper() for c in cols_arquivo]
                     intersection = [c for c in colunas_interesse if c in cols_upper]
                     if len(intersection) > 5:
                         target_file = fpath
                         found_cols = intersection
                         break
-                except: continue
 
-            if not target_file:
-                continue
+                if not target_file:
+                    continue
 
             try:
-                print(f"  -> Lendo {year}: {os.path.basename(target_file)}")
-                cols_to_load = ['CO_CURSO'] + found_cols
-                
-                df = pd.read_csv(target_file, sep=';', encoding='utf-8', usecols=cols_to_load, low_memory=False)
-                df.columns = [col.upper() for col in df.columns]
+                if df is None:
+                    print(f"  -> Lendo {year}: {os.path.basename(target_file)}")
+                    cols_to_load = ['CO_CURSO'] + found_cols
+                    
+                    registrar_leitura(target_file)
+                    df = ler_csv(target_file, catalogo.encoding(target_file) or 'utf-8', usecols=cols_to_load)
+                    df.columns = [col.upper() for col in df.columns]
 
                 for col in found_cols:
                     df[col] = pd.to_numeric(df[col], errors='coerce')
@@ -67,10 +105,17 @@ def main():
                 if df['CO_CURSO'].dtype == 'float':
                     df['CO_CURSO'] = df['CO_CURSO'].fillna(0).astype(int)
 
-                cursos_unicos = df['CO_CURSO'].unique()
+                contar_linhas(len(df))
+                questoes = [q_code for q_code in found_cols if q_code in QUESTOES_MAP]
+                cursos_unicos, histogramas, totais = histogramas_likert(df, questoes)
+
+                # Soma e número de respostas válidas e de "não sei" de todos os cursos e questões de uma vez
+                contagens_validas = histogramas[:, :, CODIGOS_VALIDOS]
+                n_validas = contagens_validas.sum(axis=2)
+                soma_validas = (contagens_validas * CODIGOS_VALIDOS).sum(axis=2)
+                n_nao_sei = histogramas[:, :, CODIGOS_NAO_SEI].sum(axis=2)
 
-                for co_curso in cursos_unicos:
-                    df_curso = df[df['CO_CURSO'] == co_curso].copy()
+                for i, co_curso in enumerate(cursos_unicos):
                     curso_str = str(co_curso)
                     
                     if not dados_consolidados_campus[curso_str]["nome"]:
@@ -83,42 +128,47 @@ def main():
                         "geral": []
                     }
 
-                    total_alunos = len(df_curso)
-
-                    for q_code in found_cols:
-                        if q_code not in QUESTOES_MAP: continue
-                        
-                        respostas = df_curso[q_code]
-                        validas = respostas[respostas.isin([1, 2, 3, 4, 5, 6])]
-                        nao_sei = respostas[respostas.isin([7, 8])]
-                        
-                        media = validas.mean()
-                        count_nao_sei = len(nao_sei)
+                    total_alunos = int(totais[i])
+
+                    for j, q_code in enumerate(questoes):
+                        if n_validas[i, j] == 0:
+                            continue
+
+                        media = soma_validas[i, j] / n_validas[i, j]
+                        count_nao_sei = int(n_nao_sei[i, j])
                         perc_nao_sei = (count_nao_sei / total_alunos * 100) if total_alunos > 0 else 0
 
-                        if pd.notna(media):
-                            info = QUESTOES_MAP[q_code]
-                            item = {
-                                "codigo": q_code,
-                                "pergunta": info["texto"],
-                                "nota": round(media),
-                                "nao_sei_perc": round(perc_nao_sei, 1)
-                            }
-                            dados_ano[info["cat"]].append(item)
+                        info = QUESTOES_MAP[q_code]
+                        item = {
+                            "codigo": q_code,
+                            "pergunta": info["texto"],
+                            "nota": round(float(media)),
+                            "nao_sei_perc": round(perc_nao_sei, 1),
+                            # Quantidade de respostas 1 a 8, para o frontend mostrar a distribuição completa
+                            "distribuicao": histogramas[i, j, 1:].tolist()
+                        }
+                        dados_ano[info["cat"]].append(item)
                     
                     dados_consolidados_campus[curso_str]["historico"][str(year)] = dados_ano
 
             except Exception as e:
                 print(f"  -> Erro em {campus_name}/{year}: {e}")
+                falhas.append(f"{campus_name}/{year}")
 
         if dados_consolidados_campus:
             output_dir = os.path.join(OUTPUT_PERFIL_BASE_PATH, campus_name)
             os.makedirs(output_dir, exist_ok=True)
             output_path = os.path.join(output_dir, 'perfil_consolidado.json')
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(dados_consolidados_campus, f, ensure_ascii=False, indent=4)
+            write_json(dados_consolidados_campus, output_path)
             print(f"  -> Arquivo consolidado salvo em '{output_path}'")
+            save_json_shards(dados_consolidados_campus, output_dir, f"Perfil {campus_name}")
+
+    if falhas:
+        print(f"  -> ERRO: Análise de perfil incompleta para {', '.join(falhas)}.")
+        return False
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if not main():
+        sys.exit(1)
@@ -0,0 +1,369 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import threading
+import subprocess
+from graphlib import TopologicalSorter, CycleError
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+from config import (
+    RAW_DATA_PATH, PROCESSED_DATA_PATH, CACHE_DATA_PATH, REGISTROS_PATH, JSON_DATA_PATH, CURSOS_CSV_PATH,
+    FINAL_VG_JSON_PATH, FINAL_MEDIA_JSON_PATH, FINAL_ESTRUTURA_JSON_PATH, FINAL_DT_JSON_PATH,
+    FINAL_EH_JSON_PATH, FINAL_CE_JSON_PATH, DOWNLOAD_MANIFEST_PATH, PIPELINE_LOG_PATH, ESTATISTICAS_CURSO_PATH,
+    DESEMPENHO_PERFIL_PATH
+)
+from manifesto import Manifesto, hash_valor
+from instrumentacao import etapa
+
+# Runner do pipeline completo: cada etapa roda em um processo próprio assim que as etapas de que
+# depende terminam, com até --jobs etapas simultâneas. Uma etapa cujas entradas (arquivos, código e
+# constantes do config) não mudaram desde a última execução bem-sucedida é pulada.
+# Uso (a partir da raiz do repositório):
+#   python -m data_processing run [--only etapa ...] [--from etapa] [--jobs 3] [--workers 4] [--forcar]
+#   python -m data_processing listar
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+RAIZ = os.path.dirname(PASTA)
+
+PUBLIC_DATA_PATH = os.path.join('..', 'frontend', 'public', 'data')
+CACHE_MICRODADOS = os.path.join(CACHE_DATA_PATH, 'enade_*')
+# Microdados extraídos ou ainda nos arquivos baixados (lidos sem extração, ver compactados.py)
+MICRODADOS_BRUTOS = [
+    os.path.join(RAW_DATA_PATH, 'enade_*'),
+    os.path.join(RAW_DATA_PATH, 'microdados_enade_*.zip'),
+    os.path.join(RAW_DATA_PATH, 'microdados_enade_*.rar'),
+]
+ESTRUTURAS_CE_FG = [
+    os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_competencias_final.json'),
+    os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_fg_final.json'),
+]
+MEDIAS_DT_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Desempenho_Topico')
+ESTATISTICAS_PROVA_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Estatisticas_Prova')
+ANALISE_PERFIL_PATH = os.path.join(JSON_DATA_PATH, 'Analise_Perfil')
+DESEMPENHO_PERFIL_JSON_PATH = os.path.join(JSON_DATA_PATH, 'Desempenho_Perfil')
+OPCOES_FILTRO_PATH = os.path.join(JSON_DATA_PATH, 'opcoes_filtro.json')
+
+# Código compartilhado por todas as etapas
+CODIGO_COMUM = ['utils.py', 'pontuacao.py', 'registros.py', 'catalogo.py', 'compactados.py', 'tipos.py']
+
+# comando: argumentos do Python (rodados em data_processing, ou na raiz com raiz=True)
+# depende: etapas que precisam terminar antes; entradas: arquivos, pastas ou globs lidos pela etapa
+# config: constantes do config.py usadas; saidas: o que a etapa gera; workers: aceita --workers
+ETAPAS = {
+    'download_data': {
+        'comando': ['-m', 'utilities.download_data'],
+        'codigo': ['utilities/download_data.py'],
+        'depende': [],
+        'entradas': [],
+        'config': ['URLS', 'EXTRACT_ARCHIVES'],
+        'saidas': [DOWNLOAD_MANIFEST_PATH],
+    },
+    'filter_data': {
+        'comando': ['-m', 'utilities.filter_data'],
+        'codigo': ['utilities/filter_data.py'],
+        # co_grupo reescreve o cursos_ufc.csv lido pelo store de registros
+        'depende': ['download_data', 'co_grupo'],
+        'entradas': [*MICRODADOS_BRUTOS, CACHE_MICRODADOS, CURSOS_CSV_PATH],
+        'config': ['YEARS_TO_PROCESS', 'UFC_IES_CODE', 'CAMPUS_MAP', 'USE_REGISTROS'],
+        'saidas': [PROCESSED_DATA_PATH],
+        'workers': True,
+    },
+    'co_grupo': {
+        'comando': ['-m', 'utilities.co_grupo'],
+        'codigo': ['utilities/co_grupo.py'],
+        'depende': ['download_data'],
+        'entradas': [*MICRODADOS_BRUTOS, CACHE_MICRODADOS, CURSOS_CSV_PATH],
+        'config': ['YEARS_TO_PROCESS'],
+        'saidas': [CURSOS_CSV_PATH],
+    },
+    'dist_topicos': {
+        'comando': ['dist_topicos.py'],
+        'codigo': ['dist_topicos.py'],
+        'depende': [],
+        'entradas': ESTRUTURAS_CE_FG,
+        'config': [],
+        'saidas': [ESTATISTICAS_PROVA_PATH],
+    },
+    'estatisticas_curso': {
+        'comando': ['estatisticas_curso.py'],
+        'codigo': ['estatisticas_curso.py'],
+        'depende': ['download_data', 'co_grupo'],
+        'entradas': [*MICRODADOS_BRUTOS, CACHE_MICRODADOS, CURSOS_CSV_PATH, *ESTRUTURAS_CE_FG],
+        'config': ['YEARS_TO_PROCESS'],
+        'saidas': [ESTATISTICAS_CURSO_PATH],
+        'workers': True,
+    },
+    'get_media_VG_agregadas': {
+        'comando': ['get_media_VG_agregadas.py'],
+        'codigo': ['get_media_VG_agregadas.py', 'estatisticas_curso.py'],
+        'depende': ['download_data', 'co_grupo', 'estatisticas_curso'],
+        'entradas': [*MICRODADOS_BRUTOS, CACHE_MICRODADOS, CURSOS_CSV_PATH, ESTATISTICAS_CURSO_PATH],
+        'config': ['YEARS_TO_PROCESS', 'UFC_IES_CODE', 'UF_CODE', 'REGIAO_CODE', 'USE_ESTATISTICAS_CURSO'],
+        'saidas': [os.path.join(FINAL_VG_JSON_PATH, 'medias_agregadas_geral.json')],
+        'workers': True,
+    },
+    'get_media_DT_agregadas': {
+        'comando': ['get_media_DT_agregadas.py'],
+        'codigo': ['get_media_DT_agregadas.py', 'get_Media_DT', 'estatisticas_curso.py'],
+        'depende': ['download_data', 'filter_data', 'co_grupo', 'estatisticas_curso'],
+        'entradas': [
+            *MICRODADOS_BRUTOS, CACHE_MICRODADOS, PROCESSED_DATA_PATH, REGISTROS_PATH,
+            CURSOS_CSV_PATH, ESTATISTICAS_CURSO_PATH, *ESTRUTURAS_CE_FG
+        ],
+        'config': ['YEARS_TO_PROCESS', 'UFC_IES_CODE', 'UF_CODE', 'REGIAO_CODE', 'USE_REGISTROS', 'USE_ESTATISTICAS_CURSO'],
+        'saidas': [MEDIAS_DT_PATH],
+        'workers': True,
+    },
+    'desempenho_topico': {
+        'comando': ['desempenho_topico.py'],
+        'codigo': ['desempenho_topico.py'],
+        'depende': ['get_media_DT_agregadas', 'dist_topicos'],
+        'entradas': [MEDIAS_DT_PATH, ESTATISTICAS_PROVA_PATH, CURSOS_CSV_PATH, *ESTRUTURAS_CE_FG],
+        'config': ['YEARS_TO_PROCESS'],
+        'saidas': [FINAL_DT_JSON_PATH],
+    },
+    'visao_geral': {
+        'comando': ['visao_geral.py'],
+        'codigo': ['visao_geral.py'],
+        'depende': ['filter_data', 'get_media_VG_agregadas'],
+        'entradas': [PROCESSED_DATA_PATH, REGISTROS_PATH, FINAL_VG_JSON_PATH, CURSOS_CSV_PATH],
+        'config': ['YEARS_TO_PROCESS', 'CURSO_MAP', 'USE_REGISTROS'],
+        'saidas': [FINAL_VG_JSON_PATH],
+        'workers': True,
+    },
+    'get_correlacao_notas': {
+        'comando': ['get_correlacao_notas.py'],
+        'codigo': ['get_correlacao_notas.py'],
+        'depende': ['filter_data', 'co_grupo'],
+        'entradas': [PROCESSED_DATA_PATH, REGISTROS_PATH, CURSOS_CSV_PATH, *ESTRUTURAS_CE_FG],
+        'config': ['YEARS_TO_PROCESS', 'USE_REGISTROS'],
+        'saidas': [FINAL_CE_JSON_PATH],
+    },
+    'evolucao_historica': {
+        'comando': ['evolucao_historica.py'],
+        'codigo': ['evolucao_historica.py'],
+        'depende': ['visao_geral'],
+        'entradas': [FINAL_VG_JSON_PATH],
+        'config': ['YEARS_TO_PROCESS'],
+        'saidas': [FINAL_EH_JSON_PATH],
+    },
+    'percepcao_curso': {
+        'comando': ['percepcao_curso.py'],
+        'codigo': ['percepcao_curso.py'],
+        'depende': ['filter_data'],
+        'entradas': [PROCESSED_DATA_PATH, REGISTROS_PATH, CURSOS_CSV_PATH],
+        'config': ['YEARS_TO_PROCESS', 'QUESTOES_MAP', 'USE_REGISTROS'],
+        'saidas': [ANALISE_PERFIL_PATH],
+    },
+    'desempenho_perfil': {
+        'comando': ['desempenho_perfil.py'],
+        'codigo': ['desempenho_perfil.py', 'juncao.py', 'estatisticas_curso.py', 'percepcao_curso.py'],
+        'depende': ['download_data', 'co_grupo'],
+        'entradas': [*MICRODADOS_BRUTOS, CACHE_MICRODADOS, CURSOS_CSV_PATH, *ESTRUTURAS_CE_FG],
+        'config': ['YEARS_TO_PROCESS', 'UFC_IES_CODE', 'CAMPUS_MAP', 'VARIAVEIS_PERFIL', 'PERFIL_MIN_ALUNOS'],
+        'saidas': [DESEMPENHO_PERFIL_JSON_PATH, DESEMPENHO_PERFIL_PATH],
+        'workers': True,
+    },
+    'opcoes_curso': {
+        'comando': ['-m', 'utilities.opcoes_curso'],
+        'codigo': ['utilities/opcoes_curso.py'],
+        'depende': ['visao_geral'],
+        'entradas': [FINAL_VG_JSON_PATH],
+        'config': ['YEARS_TO_PROCESS', 'CAMPUS_MAP'],
+        'saidas': [OPCOES_FILTRO_PATH],
+    },
+    'data_public_copy': {
+        'comando': ['data_public_copy.py'],
+        'codigo': [os.path.join('..', 'data_public_copy.py')],
+        'raiz': True,
+        'depende': [
+            'desempenho_topico', 'visao_geral', 'evolucao_historica', 'percepcao_curso', 'desempenho_perfil', 'opcoes_curso'
+        ],
+        'entradas': [
+            FINAL_DT_JSON_PATH, FINAL_VG_JSON_PATH, FINAL_EH_JSON_PATH, ANALISE_PERFIL_PATH,
+            DESEMPENHO_PERFIL_JSON_PATH, OPCOES_FILTRO_PATH
+        ],
+        'config': [],
+        'saidas': [PUBLIC_DATA_PATH],
+    },
+}
+
+_lock_manifesto = threading.Lock()
+
+
+def grafo(etapas=ETAPAS):
+    return {nome: set(dados['depende']) for nome, dados in etapas.items()}
+
+def ordem_topologica(etapas=ETAPAS):
+    return list(TopologicalSorter(grafo(etapas)).static_order())
+
+def descendentes(raizes, etapas=ETAPAS):
+    selecionadas = set(raizes)
+    for nome in ordem_topologica(etapas):
+        if set(etapas[nome]['depende']) & selecionadas:
+            selecionadas.add(nome)
+    return selecionadas
+
+def _arquivos(caminhos):
+    for caminho in caminhos:
+        for encontrado in sorted(glob.glob(caminho)):
+            if os.path.isdir(encontrado):
+                for raiz, pastas, arquivos in os.walk(encontrado):
+                    pastas[:] = sorted(pasta for pasta in pastas if pasta != '__pycache__')
+                    for arquivo in sorted(arquivos):
+                        if not arquivo.endswith(('.tmp', '.part')):
+                            yield os.path.join(raiz, arquivo)
+            else:
+                yield encontrado
+
+def assinatura_entradas(nome):
+    # Tamanho e mtime bastam aqui: as etapas ainda conferem o conteúdo (sha256) pelo manifesto de build
+    dados = ETAPAS[nome]
+    arquivos = []
+    for path in _arquivos(dados['entradas'] + CODIGO_COMUM + dados['codigo']):
+        stat = os.stat(path)
+        arquivos.append((os.path.normpath(path), stat.st_size, stat.st_mtime_ns))
+    return {
+        'arquivos': hash_valor(arquivos),
+        'config': hash_valor({chave: getattr(config, chave, None) for chave in dados['config']}),
+    }
+
+def saidas_ausentes(nome):
+    # Saídas declaradas que não existem depois da execução (pasta vazia conta como ausente): as etapas
+    # tratam os próprios erros, então o código de saída 0 sozinho não garante que algo foi gerado
+    return [saida for saida in ETAPAS[nome]['saidas'] if next(_arquivos([saida]), None) is None]
+
+def _registrar(nome, entradas):
+    with _lock_manifesto:
+        manifesto = Manifesto()
+        manifesto.registrar(f"pipeline/{nome}", entradas, ETAPAS[nome]['saidas'])
+        manifesto.salvar()
+
+def caminho_log(nome):
+    return os.path.join(PIPELINE_LOG_PATH, f'{nome}.log')
+
+def executar_etapa(nome, forcar=False, workers=None):
+    # Roda nas threads do agendador: não imprime nada, devolve (estado, duração, linhas a mostrar)
+    # para que a thread de run() escreva tudo no terminal sem intercalar as etapas
+    dados = ETAPAS[nome]
+    if not forcar and Manifesto().atualizado(f"pipeline/{nome}", assinatura_entradas(nome), dados['saidas']):
+        return 'atualizada', 0.0, []
+
+    comando = [sys.executable, *dados['comando']]
+    if workers and dados.get('workers'):
+        comando += ['--workers', str(workers)]
+
+    os.makedirs(PIPELINE_LOG_PATH, exist_ok=True)
+    log_path = caminho_log(nome)
+
+    inicio = time.perf_counter()
+    with etapa(f"pipeline.{nome}"), open(log_path, 'w', encoding='utf-8') as log:
+        processo = subprocess.run(
+            comando, cwd=RAIZ if dados.get('raiz') else PASTA,
+            stdout=log, stderr=subprocess.STDOUT, env={**os.environ, 'PYTHONUNBUFFERED': '1'}
+        )
+    duracao = time.perf_counter() - inicio
+
+    ausentes = saidas_ausentes(nome) if processo.returncode == 0 else []
+    if processo.returncode != 0 or ausentes:
+        motivo = f"código {processo.returncode}" if processo.returncode != 0 else f"sem saída: {', '.join(ausentes)}"
+        detalhes = [f"   -> ERRO em [{nome}] ({motivo}). Últimas linhas do log:"]
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as log:
+            detalhes += [f"      {linha.rstrip()}" for linha in log.readlines()[-15:]]
+        return 'erro', duracao, detalhes
+
+    # Assinatura de depois da execução: etapas que reescrevem as próprias entradas (co_grupo
+    # atualiza o cursos_ufc.csv) não devem parecer desatualizadas na próxima vez
+    _registrar(nome, assinatura_entradas(nome))
+    return 'ok', duracao, []
+
+def run(only=None, inicio=None, jobs=3, workers=None, forcar=False):
+    if only:
+        selecionadas = set(only)
+    elif inicio:
+        selecionadas = descendentes([inicio])
+    else:
+        selecionadas = set(ETAPAS)
+
+    # Dependências fora da seleção são tratadas como prontas
+    sorter = TopologicalSorter({nome: set(ETAPAS[nome]['depende']) & selecionadas for nome in selecionadas})
+    sorter.prepare()
+
+    print(f"--- Pipeline: {len(selecionadas)} etapas, até {jobs} simultâneas ---")
+    estados, duracoes = {}, {}
+    inicio_total = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        rodando = {}
+        while sorter.is_active():
+            for nome in sorter.get_ready():
+                falhas = [dep for dep in ETAPAS[nome]['depende'] if estados.get(dep) in ('erro', 'bloqueada')]
+                if falhas:
+                    print(f"   -> [{nome}] não executada: depende de {', '.join(falhas)}")
+                    estados[nome] = 'bloqueada'
+                    sorter.done(nome)
+                    continue
+                print(f"   -> [{nome}] iniciando (log em {caminho_log(nome)})")
+                rodando[executor.submit(executar_etapa, nome, forcar, workers)] = nome
+
+            if not rodando:
+                continue
+            concluidos, _ = wait(rodando, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                nome = rodando.pop(futuro)
+                try:
+                    estados[nome], duracoes[nome], detalhes = futuro.result()
+                except Exception as e:
+                    estados[nome], duracoes[nome], detalhes = 'erro', 0.0, [f"   -> ERRO inesperado em [{nome}]: {e}"]
+                for linha in detalhes:
+                    print(linha)
+                if estados[nome] == 'atualizada':
+                    print(f"   -> [{nome}] já atualizada. Pulando.")
+                elif estados[nome] == 'ok':
+                    print(f"   -> [{nome}] concluída em {duracoes[nome]:.1f}s")
+                sorter.done(nome)
+
+    print(f"\n--- Pipeline concluído em {time.perf_counter() - inicio_total:.1f}s ---")
+    for nome in ordem_topologica():
+        if nome in estados:
+            print(f"   {nome:<26}{estados[nome]:<12}{duracoes.get(nome, 0.0):>8.1f}s")
+    return all(estado in ('ok', 'atualizada') for estado in estados.values())
+
+def listar():
+    for nome in ordem_topologica():
+        dependencias = ', '.join(ETAPAS[nome]['depende']) or '-'
+        print(f"   {nome:<26} depende de: {dependencias}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m data_processing', description="Runner do pipeline do ENADE")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    parser_run = subparsers.add_parser('run', help="Executa o pipeline")
+    alvo = parser_run.add_mutually_exclusive_group()
+    alvo.add_argument('--only', nargs='+', choices=list(ETAPAS), help="Executa apenas estas etapas")
+    alvo.add_argument('--from', dest='inicio', choices=list(ETAPAS), help="Executa esta etapa e todas as que dependem dela")
+    parser_run.add_argument('--jobs', type=int, default=3, help="Etapas simultâneas (padrão: 3)")
+    parser_run.add_argument('--workers', type=int, help="Repassado às etapas que aceitam --workers")
+    parser_run.add_argument('--forcar', action='store_true', help="Executa mesmo as etapas já atualizadas")
+
+    subparsers.add_parser('listar', help="Lista as etapas e suas dependências")
+    args = parser.parse_args(argv)
+
+    try:
+        ordem_topologica()
+    except CycleError as e:
+        print(f"ERRO: dependência circular entre as etapas: {e.args[1]}")
+        sys.exit(1)
+
+    if args.comando == 'listar':
+        listar()
+        return
+
+    if not run(only=args.only, inicio=args.inicio, jobs=args.jobs, workers=args.workers, forcar=args.forcar):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
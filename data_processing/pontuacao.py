@@ -0,0 +1,353 @@
+import numpy as np
+import pandas as pd
+
+# Tamanho mínimo da string de respostas para que as objetivas sejam consideradas
+CE_MIN_RESPOSTAS = 27
+FG_MIN_RESPOSTAS = 8
+
+# Respostas objetivas empacotadas em uint64 (bit i = posição i da string DS_VT_ACE_*)
+MAX_QUESTOES = 64
+
+
+def _indices_mapeamento(mapeamento):
+    # Mesma regra dos loops antigos: o primeiro índice inválido descarta o restante da questão
+    indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
+    indices_0 = []
+    for idx_1 in indices:
+        try:
+            indices_0.append(int(idx_1) - 1)
+        except Exception:
+            return indices_0, idx_1
+    return indices_0, None
+
+
+class EventosCompetencia:
+    # Questões de uma prova (CE ou FG) já resolvidas para posições na string de respostas,
+    # colunas de nota discursiva e índices de competência, na ordem em que eram visitadas
+    def __init__(self, componentes, mapa_obj, mapa_disc, offset_obj, coluna_disc, min_respostas):
+        self.min_respostas = min_respostas
+        self.componentes = []
+        comp_idx = {}
+        for comp in componentes:
+            if comp not in comp_idx:
+                comp_idx[comp] = len(self.componentes)
+                self.componentes.append(comp)
+
+        # Entradas descartadas do mapeamento, para serem avisadas uma única vez na compilação
+        self.invalidos = []
+
+        self.obj = []
+        for q_key, mapeamento in mapa_obj.items():
+            try:
+                q_index = int(q_key[1:]) - offset_obj
+            except Exception:
+                self.invalidos.append(f"questão '{q_key}' não reconhecida")
+                continue
+            if q_index < 0:
+                self.invalidos.append(f"questão '{q_key}' fora da prova")
+                continue
+            if q_index >= MAX_QUESTOES:
+                # As respostas só guardam as MAX_QUESTOES primeiras posições (ver empacotar_respostas)
+                self.invalidos.append(
+                    f"questão '{q_key}' na posição {q_index + 1}, além das {MAX_QUESTOES} objetivas empacotadas (ignorada)"
+                )
+                continue
+            for idx_0 in self._indices_validos(q_key, mapeamento, componentes):
+                self.obj.append((q_index, comp_idx[componentes[idx_0]]))
+
+        self.disc = []
+        for d_key, mapeamento in mapa_disc.items():
+            try:
+                col_name = coluna_disc(int(d_key[1:]))
+            except Exception:
+                self.invalidos.append(f"questão '{d_key}' não reconhecida")
+                continue
+            for idx_0 in self._indices_validos(d_key, mapeamento, componentes):
+                self.disc.append((col_name, comp_idx[componentes[idx_0]]))
+
+        n_comp = len(self.componentes)
+        largura = max((pos for pos, _ in self.obj), default=-1) + 1
+        incidencia_obj = np.zeros((largura, n_comp), dtype=np.int64)
+        for pos, c in self.obj:
+            incidencia_obj[pos, c] += 1
+
+        # Máscara de questões de cada competência; uma questão mapeada k vezes para a mesma competência
+        # aparece nas k primeiras camadas, para continuar contando k vezes
+        self.mascaras_obj = []
+        for camada in range(1, int(incidencia_obj.max(initial=0)) + 1):
+            mascaras = np.zeros(n_comp, dtype=np.uint64)
+            for pos in range(min(largura, MAX_QUESTOES)):
+                for c in np.flatnonzero(incidencia_obj[pos] >= camada):
+                    mascaras[c] |= np.uint64(1) << np.uint64(pos)
+            self.mascaras_obj.append(mascaras)
+
+        self.colunas_disc = list(dict.fromkeys(col for col, _ in self.disc))
+        self.incidencia_disc = np.zeros((len(self.colunas_disc), n_comp), dtype=np.int64)
+        for col_name, c in self.disc:
+            self.incidencia_disc[self.colunas_disc.index(col_name), c] += 1
+
+    def _indices_validos(self, q_key, mapeamento, componentes):
+        indices_0, invalido = _indices_mapeamento(mapeamento)
+        if invalido is not None:
+            self.invalidos.append(f"valor '{invalido}' em {q_key} não é número (restante da questão ignorado)")
+        validos = []
+        for idx_0 in indices_0:
+            if 0 <= idx_0 < len(componentes):
+                validos.append(idx_0)
+            else:
+                self.invalidos.append(f"índice de competência {idx_0 + 1} em {q_key} fora da lista ({len(componentes)} competências)")
+        return validos
+
+    def contar_objetivas(self, mascaras):
+        # (aluno x competência): popcount(máscara do aluno & máscara da competência)
+        contagem = np.zeros((len(mascaras), len(self.componentes)), dtype=np.int64)
+        for mascaras_comp in self.mascaras_obj:
+            contagem += _popcount(mascaras[:, None] & mascaras_comp[None, :])
+        return contagem
+
+    def __bool__(self):
+        return bool(self.obj or self.disc)
+
+
+def compilar_eventos_ce(map_grupo, year):
+    questoes_ce = map_grupo.get('Anos', {}).get(str(year), {}).get('questoes_CE', {})
+    return EventosCompetencia(
+        map_grupo.get('Componente_especifico', []),
+        questoes_ce.get('objetivas', {}), questoes_ce.get('discursivas', {}),
+        offset_obj=9, coluna_disc=lambda n: f"NT_CE_D{n - 2}", min_respostas=CE_MIN_RESPOSTAS
+    )
+
+
+def compilar_eventos_fg(map_ano_fg_data):
+    questoes_fg = map_ano_fg_data.get("questoes", {})
+    return EventosCompetencia(
+        map_ano_fg_data.get("Formacao_geral", []),
+        questoes_fg.get("objetivas", {}), questoes_fg.get("discursivas", {}),
+        offset_obj=1, coluna_disc=lambda n: f"NT_FG_D{n}", min_respostas=FG_MIN_RESPOSTAS
+    )
+
+
+class MapeamentoCompetencias:
+    # Índice questão -> competência compilado uma única vez por (CO_GRUPO, ano) a partir de
+    # estrutura_competencias_final.json e estrutura_fg_final.json. É compartilhado pelos cálculos
+    # agregados, por curso e de correlação; mapeamentos inválidos são avisados só na compilação.
+    def __init__(self, map_ce, map_fg):
+        self.map_ce = map_ce or {}
+        self.map_fg = map_fg or []
+        self._ce = {}
+        self._fg = {}
+
+    def ce(self, co_grupo, year):
+        chave = (str(co_grupo), str(year))
+        if chave not in self._ce:
+            eventos = compilar_eventos_ce(self.map_ce.get(chave[0], {}), year)
+            _avisar_invalidos(eventos, f"CE do grupo {chave[0]}/{year}")
+            self._ce[chave] = eventos
+        return self._ce[chave]
+
+    def fg(self, year):
+        ano_str = str(year)
+        if ano_str not in self._fg:
+            map_ano_fg_data = next((item for item in self.map_fg if str(item.get("ANO")) == ano_str), None)
+            eventos = compilar_eventos_fg(map_ano_fg_data) if map_ano_fg_data else None
+            if eventos is not None:
+                _avisar_invalidos(eventos, f"FG de {year}")
+            self._fg[ano_str] = eventos
+        return self._fg[ano_str]
+
+
+def _avisar_invalidos(eventos, descricao):
+    for invalido in dict.fromkeys(eventos.invalidos):
+        print(f"   -> Aviso: Mapeamento {descricao}: {invalido}.")
+
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_BYTE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(valores):
+        valores = np.ascontiguousarray(valores, dtype=np.uint64)
+        return _POPCOUNT_BYTE[valores.view(np.uint8)].reshape(valores.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+class Respostas:
+    # Objetivas de cada aluno em duas máscaras de bits, respondidas de forma válida ('0' ou '1') e
+    # certas ('1'), mais o tamanho da string, que decide se as objetivas contam (CE/FG_MIN_RESPOSTAS)
+    def __init__(self, validas, certas, tamanhos):
+        self.validas = np.asarray(validas, dtype=np.uint64)
+        self.certas = np.asarray(certas, dtype=np.uint64)
+        self.tamanhos = np.asarray(tamanhos, dtype=np.int64)
+
+    def __getitem__(self, posicoes):
+        return Respostas(self.validas[posicoes], self.certas[posicoes], self.tamanhos[posicoes])
+
+    def __len__(self):
+        return len(self.tamanhos)
+
+
+def empacotar_respostas(serie):
+    # Converte a coluna DS_VT_ACE_* (strings) em Respostas, já na leitura de cada chunk/arquivo
+    textos = serie.astype(object).where(serie.notna(), '').astype(str)
+    tamanhos = textos.str.len().to_numpy(dtype=np.int64)
+    largura = max(int(tamanhos.max()) if len(tamanhos) else 0, 1)
+
+    # As provas têm bem menos de 64 objetivas; posições além disso não entram em nenhuma competência
+    # (um mapeamento que as use é avisado por MapeamentoCompetencias)
+    codigos = np.array(textos.tolist(), dtype=f'<U{largura}').view(np.uint32).reshape(len(textos), largura)
+    codigos = codigos[:, :MAX_QUESTOES]
+    largura = codigos.shape[1]
+    pesos = np.left_shift(np.uint64(1), np.arange(largura, dtype=np.uint64))
+    certas = codigos == ord('1')
+    validas = certas | (codigos == ord('0'))
+    return Respostas(
+        (validas * pesos).sum(axis=1, dtype=np.uint64),
+        (certas * pesos).sum(axis=1, dtype=np.uint64),
+        tamanhos
+    )
+
+
+def respostas_da_prova(df, coluna):
+    # coluna: 'DS_VT_ACE_OCE' ou 'DS_VT_ACE_OFG'. Lidos do CSV vêm as strings de respostas;
+    # lidos do store de registros (registros.py) vêm as máscaras já empacotadas
+    if coluna in df.columns:
+        return empacotar_respostas(df[coluna])
+    return Respostas(df[f'{coluna}_VALIDAS'].to_numpy(), df[f'{coluna}_CERTAS'].to_numpy(), df[f'{coluna}_TAM'].to_numpy())
+
+
+class AcumuladorCompetencias:
+    # Soma acertos/válidas/notas por (chave, competência) e guarda a primeira ocorrência de cada par,
+    # de forma que a ordem das chaves no JSON final seja a mesma da varredura linha a linha
+    def __init__(self):
+        self.dados = {}
+        self.primeira_ocorrencia = {}
+
+    def adicionar(self, chaves, eventos, respostas, notas, linhas_globais):
+        # Acumula de uma vez todas as chaves que usam o mesmo mapeamento (ex.: os cursos de um CO_GRUPO):
+        # as matrizes aluno x competência são calculadas uma vez e somadas por chave com um groupby
+        if not eventos or len(linhas_globais) == 0:
+            return
+
+        codigos, chaves_unicas = pd.factorize(pd.Series(chaves, dtype=object), sort=False)
+
+        tamanho_ok = respostas.tamanhos >= eventos.min_respostas
+        validas = np.where(tamanho_ok, respostas.validas, np.uint64(0))
+        certas = np.where(tamanho_ok, respostas.certas, np.uint64(0))
+
+        colunas_disc = [col for col in eventos.colunas_disc if col in notas.columns]
+        incidencia_disc = eventos.incidencia_disc[[eventos.colunas_disc.index(col) for col in colunas_disc]]
+        valores_disc = notas[colunas_disc].to_numpy(dtype=np.float64) if colunas_disc else np.empty((len(linhas_globais), 0))
+        notas_validas = ~np.isnan(valores_disc)
+
+        validas_linha = eventos.contar_objetivas(validas)
+        acertos_linha = eventos.contar_objetivas(certas)
+        disc_cont_linha = notas_validas.astype(np.int64) @ incidencia_disc
+
+        n_comp = len(eventos.componentes)
+        somas = pd.DataFrame(np.hstack([validas_linha, acertos_linha, disc_cont_linha])).groupby(codigos).sum().to_numpy()
+        validas_comp, acertos_comp, disc_cont_comp = somas[:, :n_comp], somas[:, n_comp:2 * n_comp], somas[:, 2 * n_comp:]
+
+        # Primeira linha de cada chave com algum evento (objetiva válida ou nota discursiva) em cada competência
+        com_evento = (validas_linha + disc_cont_linha) > 0
+        n_linhas = len(linhas_globais)
+        primeira_linha = pd.DataFrame(
+            np.where(com_evento, np.arange(n_linhas)[:, None], n_linhas)
+        ).groupby(codigos).min().to_numpy()
+
+        # Linhas de cada chave em ordem de varredura, para a soma sequencial das discursivas
+        ordem_linhas = np.argsort(codigos, kind='stable')
+        limites = np.searchsorted(codigos[ordem_linhas], np.arange(len(chaves_unicas) + 1))
+        cols_por_comp = [
+            [colunas_disc.index(col) for col, cc in eventos.disc if cc == c and col in colunas_disc]
+            for c in range(n_comp)
+        ]
+
+        for codigo, chave in enumerate(chaves_unicas):
+            chave_dados = self.dados.setdefault(chave, {})
+            linhas_chave = ordem_linhas[limites[codigo]:limites[codigo + 1]]
+
+            for c, comp in enumerate(eventos.componentes):
+                if comp not in chave_dados:
+                    linha = int(primeira_linha[codigo, c])
+                    if linha == n_linhas:
+                        continue
+                    ordem = self._ordem_na_linha(eventos, c, validas[linha], notas_validas[linha], colunas_disc)
+                    self.primeira_ocorrencia[(chave, comp)] = (int(linhas_globais[linha]), ordem)
+                    chave_dados[comp] = {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0}
+
+                stats = chave_dados[comp]
+                stats['obj_validas'] += int(validas_comp[codigo, c])
+                stats['obj_acertos'] += int(acertos_comp[codigo, c])
+                stats['disc_cont'] += int(disc_cont_comp[codigo, c])
+
+                # Soma sequencial (linha a linha) para manter o mesmo arredondamento de ponto flutuante
+                if cols_por_comp[c]:
+                    valores = valores_disc[np.ix_(linhas_chave, cols_por_comp[c])].ravel()
+                    valores = valores[~np.isnan(valores)]
+                    if len(valores):
+                        stats['disc_soma'] = float(np.add.accumulate(np.concatenate(([stats['disc_soma']], valores)))[-1])
+
+    @staticmethod
+    def _ordem_na_linha(eventos, c, validas_linha, notas_validas_linha, colunas_disc):
+        for ordem, (pos, cc) in enumerate(eventos.obj):
+            if cc == c and pos < MAX_QUESTOES and (int(validas_linha) >> pos) & 1:
+                return ordem
+        for ordem, (col_name, cc) in enumerate(eventos.disc, start=len(eventos.obj)):
+            if cc == c and col_name in colunas_disc and notas_validas_linha[colunas_disc.index(col_name)]:
+                return ordem
+        return len(eventos.obj) + len(eventos.disc)
+
+    def resultados(self):
+        chaves_ordem = {}
+        for (chave, comp), ocorrencia in self.primeira_ocorrencia.items():
+            if chave not in chaves_ordem or ocorrencia < chaves_ordem[chave]:
+                chaves_ordem[chave] = ocorrencia
+
+        resultado = {}
+        for chave in sorted(chaves_ordem, key=chaves_ordem.get):
+            comps = self.dados[chave]
+            resultado[chave] = {
+                comp: comps[comp]
+                for comp in sorted(comps, key=lambda comp: self.primeira_ocorrencia[(chave, comp)])
+            }
+        return resultado
+
+
+def pontuar_alunos(eventos, respostas, notas):
+    # Matrizes aluno x competência (objetivas válidas, acertos, notas discursivas válidas e a soma delas),
+    # para quem agrega os alunos por chaves próprias sem passar pelo AcumuladorCompetencias
+    tamanho_ok = respostas.tamanhos >= eventos.min_respostas
+    validas = np.where(tamanho_ok, respostas.validas, np.uint64(0))
+    certas = np.where(tamanho_ok, respostas.certas, np.uint64(0))
+
+    colunas_disc = [col for col in eventos.colunas_disc if col in notas.columns]
+    incidencia_disc = eventos.incidencia_disc[[eventos.colunas_disc.index(col) for col in colunas_disc]]
+    valores_disc = notas[colunas_disc].to_numpy(dtype=np.float64) if colunas_disc else np.empty((len(respostas), 0))
+    notas_validas = ~np.isnan(valores_disc)
+    return (
+        eventos.contar_objetivas(validas),
+        eventos.contar_objetivas(certas),
+        notas_validas.astype(np.int64) @ incidencia_disc,
+        np.where(notas_validas, valores_disc, 0.0) @ incidencia_disc,
+    )
+
+
+def acumular_chunk(acumulador, chaves, eventos_por_chave, respostas, notas, linhas_globais):
+    # Distribui as linhas do chunk entre as chaves de agregação (grupo, curso...) e acumula em um só lote
+    # todas as chaves que compartilham o mesmo mapeamento compilado.
+    # linhas_globais: posição de cada linha na varredura, usada apenas para ordenar a saída
+    codigos, chaves_unicas = pd.factorize(pd.Series(chaves, dtype=object), sort=False)
+
+    lotes = {}
+    for codigo, chave in enumerate(chaves_unicas):
+        eventos = eventos_por_chave(chave)
+        if eventos:
+            lotes.setdefault(id(eventos), (eventos, []))[1].append(codigo)
+
+    chaves = np.asarray(chaves, dtype=object)
+    for eventos, codigos_lote in lotes.values():
+        posicoes = np.flatnonzero(np.isin(codigos, codigos_lote))
+        acumulador.adicionar(
+            chaves[posicoes], eventos, respostas[posicoes],
+            notas.iloc[posicoes], linhas_globais[posicoes]
+        )
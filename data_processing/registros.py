@@ -0,0 +1,261 @@
+import os
+import glob
+import json
+import argparse
+import numpy as np
+import pandas as pd
+
+from config import PROCESSED_DATA_PATH, REGISTROS_PATH, USE_REGISTROS, YEARS_TO_PROCESS, CURSOS_CSV_PATH
+from utils import safe_numeric_convert, get_curso_info_map_from_csv
+from pontuacao import empacotar_respostas
+from instrumentacao import instrumentar, contar_linhas, registrar_leitura
+from tipos import ler_csv
+
+# Store binário por ano, com um registro de tamanho fixo por aluno dos campi, gerado a partir dos CSVs
+# de data/processed (utilities/filter_data.py). Em data/cache/registros/<ano>/:
+#   notas.npy         CO_CURSO, CO_GRUPO, CAMPUS, NT_* (float64) e as objetivas empacotadas em bits
+#   questionario.npy  CO_CURSO, CAMPUS e QE_I* (uint8, 0 = sem resposta)
+#   meta.json         campi, faixa de linhas de cada campus, colunas e arquivos de origem
+# As linhas de cada campus ficam contíguas e na ordem do CSV: o recorte de um campus é uma view do
+# memory-map, compartilhada entre processos, e ler_notas/ler_questionario entregam DataFrames sobre
+# os campos dessa view, sem cópia; as análises não fazem mais o parse dos CSVs.
+# arq3 e arq4 ficam em arrays separados porque as linhas dos dois arquivos não são pareadas.
+# Uso (a partir de data_processing): python registros.py
+
+VERSAO = 1
+PROVAS = ['DS_VT_ACE_OCE', 'DS_VT_ACE_OFG']
+ARQUIVOS = {'notas': '*arq3.csv', 'questionario': '*arq4.csv'}
+SEM_GRUPO = -1
+
+# (ano, tipo) -> (registros, meta) já abertos neste processo
+_abertos = {}
+
+
+def pasta_ano(year):
+    return os.path.join(REGISTROS_PATH, str(year))
+
+def fontes_do_ano(year):
+    # {tipo: {campus: csv}}, com o primeiro CSV de cada tipo em cada campus (mesmo critério das análises)
+    fontes = {tipo: {} for tipo in ARQUIVOS}
+    if not os.path.isdir(PROCESSED_DATA_PATH):
+        return fontes
+    for campus_name in sorted(os.listdir(PROCESSED_DATA_PATH)):
+        campus_year_path = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year))
+        if not os.path.isdir(campus_year_path):
+            continue
+        for tipo, padrao in ARQUIVOS.items():
+            arquivos = glob.glob(os.path.join(campus_year_path, padrao))
+            if arquivos:
+                fontes[tipo][campus_name] = arquivos[0]
+    return fontes
+
+def _assinatura(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+def _assinaturas(arquivos_por_campus):
+    return {campus_name: [path, _assinatura(path)] for campus_name, path in arquivos_por_campus.items()}
+
+
+def _registros_notas(frames, campi, curso_grupo_map):
+    colunas_nt = list(dict.fromkeys(col for df in frames.values() for col in df.columns if col.startswith('NT_')))
+    provas = [prova for prova in PROVAS if any(prova in df.columns for df in frames.values())]
+
+    campos = [('CO_CURSO', np.int32), ('CO_GRUPO', np.int32), ('CAMPUS', np.uint8)]
+    campos += [(col, np.float64) for col in colunas_nt]
+    for prova in provas:
+        campos += [(f'{prova}_VALIDAS', np.uint64), (f'{prova}_CERTAS', np.uint64), (f'{prova}_TAM', np.uint8)]
+
+    registros = np.zeros(sum(len(df) for df in frames.values()), dtype=np.dtype(campos))
+    intervalos, inicio = {}, 0
+    for campus_name, df in frames.items():
+        fim = inicio + len(df)
+        bloco = registros[inicio:fim]
+        bloco['CO_CURSO'] = df['CO_CURSO']
+        bloco['CO_GRUPO'] = df['CO_CURSO'].map(curso_grupo_map).fillna(SEM_GRUPO).astype(int)
+        bloco['CAMPUS'] = campi.index(campus_name)
+        for col in colunas_nt:
+            bloco[col] = safe_numeric_convert(df[col]) if col in df.columns else np.nan
+        for prova in provas:
+            respostas = df[prova] if prova in df.columns else pd.Series([None] * len(df), dtype=object)
+            empacotadas = empacotar_respostas(respostas)
+            bloco[f'{prova}_VALIDAS'] = empacotadas.validas
+            bloco[f'{prova}_CERTAS'] = empacotadas.certas
+            bloco[f'{prova}_TAM'] = np.minimum(empacotadas.tamanhos, 255)
+        intervalos[campus_name] = [inicio, fim]
+        inicio = fim
+    return registros, {'intervalos': intervalos, 'colunas': colunas_nt, 'provas': provas}
+
+def _tipo_questao(serie):
+    # 'numero' para escalas (inteiros de 1 a 255), 'letra' para alternativas de um caractere
+    valores = serie.dropna()
+    numeros = pd.to_numeric(valores, errors='coerce')
+    if numeros.notna().all():
+        if ((numeros % 1 == 0) & (numeros >= 1) & (numeros <= 255)).all():
+            return 'numero'
+        return None
+    if valores.astype(str).str.len().eq(1).all():
+        return 'letra'
+    return None
+
+def _registros_questionario(frames, campi):
+    colunas_qe = list(dict.fromkeys(col for df in frames.values() for col in df.columns if col.startswith('QE_I')))
+    tipos = {}
+    for col in colunas_qe:
+        tipos_col = {_tipo_questao(df[col]) for df in frames.values() if col in df.columns and df[col].notna().any()}
+        if not tipos_col:
+            tipos[col] = 'numero'
+        elif len(tipos_col) == 1 and None not in tipos_col:
+            tipos[col] = tipos_col.pop()
+        # Colunas em outro formato (texto livre, decimais) ficam fora do store
+
+    campos = [('CO_CURSO', np.int32), ('CAMPUS', np.uint8)] + [(col, np.uint8) for col in tipos]
+    registros = np.zeros(sum(len(df) for df in frames.values()), dtype=np.dtype(campos))
+    intervalos, inicio = {}, 0
+    for campus_name, df in frames.items():
+        fim = inicio + len(df)
+        bloco = registros[inicio:fim]
+        bloco['CO_CURSO'] = df['CO_CURSO']
+        bloco['CAMPUS'] = campi.index(campus_name)
+        for col, tipo in tipos.items():
+            if col not in df.columns:
+                continue
+            if tipo == 'numero':
+                bloco[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(np.uint8)
+            else:
+                bloco[col] = df[col].map(lambda v: ord(v) if isinstance(v, str) else 0)
+        intervalos[campus_name] = [inicio, fim]
+        inicio = fim
+    return registros, {'intervalos': intervalos, 'tipos': tipos}
+
+def _ler_csv(path):
+    registrar_leitura(path)
+    # Tipos do registro central: DS_VT_* como texto, NT_* como float e QE_* como categoria
+    df = ler_csv(path, 'utf-8')
+    df.columns = [col.upper() for col in df.columns]
+    df['CO_CURSO'] = pd.to_numeric(df['CO_CURSO'], errors='coerce')
+    return df.dropna(subset=['CO_CURSO']).reset_index(drop=True)
+
+@instrumentar('construir_registros', 'year')
+def construir_registros(year):
+    fontes = fontes_do_ano(year)
+    if not any(fontes.values()):
+        print(f"   -> Sem CSVs processados para {year}; store de registros não gerado.")
+        return None
+
+    curso_grupo_map, _ = get_curso_info_map_from_csv()
+    curso_grupo_map = {curso: int(grupo) for curso, grupo in (curso_grupo_map or {}).items()}
+    campi = sorted(set(fontes['notas']) | set(fontes['questionario']))
+
+    output_dir = pasta_ano(year)
+    os.makedirs(output_dir, exist_ok=True)
+    meta = {'versao': VERSAO, 'ano': str(year), 'campi': campi, 'cursos': _assinatura(CURSOS_CSV_PATH)}
+
+    try:
+        for tipo, arquivos in fontes.items():
+            frames = {campus_name: _ler_csv(path) for campus_name, path in arquivos.items()}
+            contar_linhas(sum(len(df) for df in frames.values()))
+            if tipo == 'notas':
+                registros, meta_tipo = _registros_notas(frames, campi, curso_grupo_map)
+            else:
+                registros, meta_tipo = _registros_questionario(frames, campi)
+            meta_tipo['fontes'] = _assinaturas(arquivos)
+            meta[tipo] = meta_tipo
+
+            output_path = os.path.join(output_dir, f'{tipo}.npy')
+            with open(output_path + '.tmp', 'wb') as f:
+                np.save(f, registros)
+            os.replace(output_path + '.tmp', output_path)
+
+        with open(os.path.join(output_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=4)
+    except Exception as e:
+        print(f"   -> ERRO ao gerar store de registros de {year}: {e}")
+        return None
+
+    _abertos.pop((str(year), 'notas'), None)
+    _abertos.pop((str(year), 'questionario'), None)
+    print(f"   -> Store de registros de {year} salvo em '{output_dir}'")
+    return output_dir
+
+
+def _ler_meta(year):
+    meta_path = os.path.join(pasta_ano(year), 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except Exception:
+        return None
+    return meta if meta.get('versao') == VERSAO else None
+
+def atualizado(year, tipo, meta=None):
+    # O store vale enquanto os CSVs de origem (e o cursos_ufc.csv) forem os mesmos da geração
+    meta = meta or _ler_meta(year)
+    if not meta or tipo not in meta or meta.get('cursos') != _assinatura(CURSOS_CSV_PATH):
+        return False
+    return meta[tipo]['fontes'] == _assinaturas(fontes_do_ano(year)[tipo])
+
+def carregar(year, tipo):
+    # (registros, meta): registros é um memory-map somente leitura; (None, None) sem store atualizado
+    if not USE_REGISTROS:
+        return None, None
+    chave = (str(year), tipo)
+    if chave not in _abertos:
+        meta = _ler_meta(year)
+        _abertos[chave] = (None, None)
+        if atualizado(year, tipo, meta):
+            try:
+                _abertos[chave] = (np.load(os.path.join(pasta_ano(year), f'{tipo}.npy'), mmap_mode='r'), meta)
+            except Exception as e:
+                print(f"   -> Aviso: store de registros de {year} ilegível ({e}). Lendo os CSVs.")
+    return _abertos[chave]
+
+def registros_campus(campus_name, year, tipo):
+    registros, meta = carregar(year, tipo)
+    if registros is None or campus_name not in meta[tipo]['intervalos']:
+        return None
+    inicio, fim = meta[tipo]['intervalos'][campus_name]
+    return registros[inicio:fim]
+
+def _quadro(vista, colunas):
+    # DataFrame cujas colunas são os próprios campos da view (copy=False): nada é copiado nem
+    # convertido, e os processos que leem o mesmo ano compartilham as páginas do memory-map.
+    # Os arrays são somente leitura; quem precisar alterar uma coluna a substitui (df[col] = ...)
+    return pd.DataFrame({nome: vista[nome] for nome in colunas}, copy=False)
+
+def ler_notas(campus_name, year):
+    # Mesmas colunas do arq3 processado, já numéricas (CO_CURSO em int32); as strings DS_VT_ACE_*
+    # dão lugar às máscaras <prova>_VALIDAS/_CERTAS/_TAM (ver pontuacao.respostas_da_prova)
+    vista = registros_campus(campus_name, year, 'notas')
+    if vista is None:
+        return None
+    return _quadro(vista, [nome for nome in vista.dtype.names if nome not in ('CO_GRUPO', 'CAMPUS')])
+
+def ler_questionario(campus_name, year):
+    # QE_I* com os códigos do store, sem decodificar: 0 = sem resposta, as escalas com o próprio
+    # número e as alternativas em letra com o código ASCII (chr); o tipo de cada coluna está em
+    # meta['questionario']['tipos']
+    vista = registros_campus(campus_name, year, 'questionario')
+    if vista is None:
+        return None
+    return _quadro(vista, [nome for nome in vista.dtype.names if nome != 'CAMPUS'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o store binário de registros por ano a partir dos CSVs processados")
+    parser.add_argument('--anos', nargs='+', default=YEARS_TO_PROCESS)
+    parser.add_argument('--forcar', action='store_true', help="Regera mesmo os anos já atualizados")
+    args = parser.parse_args()
+
+    for year in args.anos:
+        if not args.forcar and all(atualizado(year, tipo) for tipo in ARQUIVOS):
+            print(f"   -> Store de registros de {year} já atualizado. Pulando.")
+            continue
+        construir_registros(year)
+
+if __name__ == '__main__':
+    main()
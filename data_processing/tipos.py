@@ -0,0 +1,116 @@
+import pandas as pd
+
+import catalogo
+import compactados
+
+# Registro central dos tipos das colunas do ENADE, usado por todas as leituras de microdados (brutos e processados)
+# e pelo cache Parquet (utilities/cache_parquet.py). Os CSVs são lidos já tipados e com decimal=',':
+#   NT_*                            float64 (notas; mantidas em 64 bits para não alterar as médias arredondadas)
+#   CO_*, NU_*, TP_*, IN_*          Int32 (códigos, anulável)
+#   CO_GRUPO, CO_MUNIC_CURSO        category (poucos valores distintos, repetidos em todas as linhas)
+#   QE_*, CO_RS_*, DS_*, TP_SEXO    category (alternativas de uma letra ou escalas)
+#   DS_VT_*                         str (vetores de respostas, empacotados em bits por pontuacao.py)
+# Colunas fora do registro ficam com o tipo inferido pelo pandas. O caminho pode ser um membro de zip/rar (compactados.py).
+
+COLUNAS_TEXTO = {'TP_SEXO'}
+COLUNAS_CATEGORIA = {'CO_GRUPO', 'CO_MUNIC_CURSO'}
+PREFIXOS_RESPOSTAS = ('DS_VT_',)
+PREFIXOS_TEXTO = ('DS_', 'CO_RS_', 'QE_')
+PREFIXOS_INTEIRO = ('CO_', 'NU_', 'TP_', 'IN_')
+
+_avisados = set()
+
+
+def classe_coluna(nome):
+    nome = catalogo.normalizar(nome)
+    if nome.startswith('NT_'):
+        return 'real'
+    if nome.startswith(PREFIXOS_RESPOSTAS):
+        return 'respostas'
+    if nome in COLUNAS_TEXTO or nome.startswith(PREFIXOS_TEXTO):
+        return 'texto'
+    if nome in COLUNAS_CATEGORIA:
+        return 'codigo_categoria'
+    if nome.startswith(PREFIXOS_INTEIRO):
+        return 'inteiro'
+    return None
+
+def tipo_pandas(nome):
+    return {
+        'real': 'float64',
+        'inteiro': 'Int32',
+        'codigo_categoria': 'category',
+        'texto': 'category',
+        'respostas': str,
+    }.get(classe_coluna(nome))
+
+def tipo_arrow(nome):
+    # Tipos do cache Parquet: códigos em int64 (lidos de volta como Int64) e texto como string
+    import pyarrow as pa
+    classe = classe_coluna(nome)
+    if classe == 'real':
+        return pa.float64()
+    if classe in ('inteiro', 'codigo_categoria'):
+        return pa.int64()
+    return pa.string()
+
+def dtypes(colunas):
+    return {col: tipo for col in colunas if (tipo := tipo_pandas(col)) is not None}
+
+
+def converter(df):
+    # Mesmos tipos da leitura tipada para um DataFrame lido sem eles (valores inválidos viram nulos)
+    for col in df.columns:
+        classe = classe_coluna(col)
+        if classe in ('real', 'inteiro', 'codigo_categoria'):
+            valores = df[col]
+            if valores.dtype == 'object':
+                valores = valores.str.replace(',', '.', regex=False)
+            valores = pd.to_numeric(valores, errors='coerce')
+            if classe != 'real':
+                valores = valores.where(valores % 1 == 0).astype('Int32')
+            df[col] = valores.astype('category') if classe == 'codigo_categoria' else valores
+        elif classe == 'texto':
+            df[col] = df[col].astype('category')
+    return df
+
+def _avisar(path, erro):
+    if path not in _avisados:
+        _avisados.add(path)
+        print(f"   -> Aviso: leitura tipada de '{path}' falhou ({erro}); convertendo após a leitura.")
+
+def _ler_chunks(path, opcoes, tipado, chunksize):
+    # Se um chunk não couber nos tipos do registro, o restante do arquivo é lido sem eles e convertido
+    lidas = 0
+    try:
+        with compactados.fonte_csv(path) as fonte:
+            for chunk in pd.read_csv(fonte, chunksize=chunksize, **opcoes, **tipado):
+                lidas += len(chunk)
+                yield chunk
+        return
+    except (ValueError, TypeError, OverflowError) as e:
+        _avisar(path, e)
+    with compactados.fonte_csv(path) as fonte:
+        for chunk in pd.read_csv(fonte, chunksize=chunksize, skiprows=range(1, lidas + 1), **opcoes, **_sem_tipos(tipado)):
+            yield converter(chunk)
+
+def _sem_tipos(tipado):
+    # Os vetores de respostas continuam como texto (ex.: '0110' não pode virar número)
+    return {'dtype': {col: tipo for col, tipo in tipado['dtype'].items() if tipo is str}}
+
+def ler_csv(path, encoding='latin1', usecols=None, chunksize=None):
+    # Leitura de um CSV do ENADE com os tipos do registro (brutos em latin1, processados em utf-8);
+    # com chunksize, devolve um iterador de chunks
+    colunas = usecols if usecols is not None else (catalogo.colunas(path) or [])
+    opcoes = {'sep': ';', 'encoding': encoding, 'low_memory': False, 'usecols': usecols}
+    tipado = {'dtype': dtypes(colunas), 'decimal': ','}
+
+    if chunksize:
+        return _ler_chunks(path, opcoes, tipado, chunksize)
+    try:
+        with compactados.fonte_csv(path) as fonte:
+            return pd.read_csv(fonte, **opcoes, **tipado)
+    except (ValueError, TypeError, OverflowError) as e:
+        _avisar(path, e)
+    with compactados.fonte_csv(path) as fonte:
+        return converter(pd.read_csv(fonte, **opcoes, **_sem_tipos(tipado)))
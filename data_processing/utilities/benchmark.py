@@ -0,0 +1,210 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from config import RAW_DATA_PATH, PROCESSED_DATA_PATH, FINAL_ESTRUTURA_JSON_PATH
+from utilities.dados_sinteticos import gerar_dados
+from instrumentacao import pico_rss_mb
+
+# Mede cada etapa do pipeline sobre microdados sintéticos (utilities/dados_sinteticos.py).
+# Cada etapa roda em um processo novo, para que o pico de memória seja só dela.
+# Uso (a partir de data_processing): python -m utilities.benchmark --alunos 500000
+
+HISTORICO_PATH = os.path.join('data', 'benchmark_historico.json')
+
+
+def etapa_process_year(year):
+    from utilities.filter_data import process_year
+    return process_year(year)
+
+def etapa_calculate_all_averages(year):
+    from utils import get_relevant_grupos
+    from get_media_VG_agregadas import calculate_all_averages
+    return calculate_all_averages(year, os.path.join(RAW_DATA_PATH, f'enade_{year}'), get_relevant_grupos())
+
+def etapa_calculate_averages_competencia(year):
+    from utils import load_json, get_relevant_grupos, calculate_averages_competencia
+    medias_ce, medias_fg = calculate_averages_competencia({
+        "year": year,
+        "year_path": os.path.join(RAW_DATA_PATH, f'enade_{year}'),
+        "maps": {
+            'ce': load_json(os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_competencias_final.json')),
+            'fg': load_json(os.path.join(FINAL_ESTRUTURA_JSON_PATH, 'estrutura_fg_final.json')),
+        },
+        "json_suffix": "br",
+        "group_by_curso": False,
+        "filter_col": None,
+        "filter_val": None,
+        "info_col_variants": {},
+        "relevant_grupos": get_relevant_grupos(),
+    })
+    return medias_ce is not None or medias_fg is not None
+
+def etapa_run_calculation_curso(year):
+    from get_Media_DT.get_media_Curso_DT import run_calculation_curso
+    return run_calculation_curso()
+
+def etapa_percepcao_curso(year):
+    import percepcao_curso
+    return percepcao_curso.main()
+
+# Em ordem de execução: as etapas por curso dependem dos arquivos gerados por process_year.
+# Cada etapa devolve o resultado da função medida; None ou False conta como erro da etapa
+ETAPAS = {
+    'process_year': etapa_process_year,
+    'calculate_all_averages': etapa_calculate_all_averages,
+    'calculate_averages_competencia': etapa_calculate_averages_competencia,
+    'run_calculation_curso': etapa_run_calculation_curso,
+    'percepcao_curso': etapa_percepcao_curso,
+}
+
+
+def _executar_etapa(nome, year, fila):
+    import utils
+    utils._PROGRESS_BARS = False
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            inicio = time.perf_counter()
+            resultado = ETAPAS[nome](year)
+            segundos = time.perf_counter() - inicio
+        if not resultado:
+            fila.put((None, pico_rss_mb(), f"etapa terminou sem resultado ({resultado!r})"))
+            return
+        fila.put((segundos, pico_rss_mb(), None))
+    except Exception as e:
+        fila.put((None, pico_rss_mb(), repr(e)))
+
+def medir_etapa(nome, year):
+    ctx = multiprocessing.get_context('spawn')
+    fila = ctx.Queue()
+    processo = ctx.Process(target=_executar_etapa, args=(nome, year, fila))
+    processo.start()
+    resultado = fila.get()
+    processo.join()
+    return resultado
+
+def contar_linhas(paths):
+    total = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            total += max(sum(1 for _ in f) - 1, 0)
+    return total
+
+def linhas_da_etapa(nome, year, n_alunos):
+    # Linhas do arquivo principal de cada etapa: o arq3 bruto, ou os CSVs já filtrados por campus
+    if nome == 'run_calculation_curso':
+        return contar_linhas(glob.glob(os.path.join(PROCESSED_DATA_PATH, '*', str(year), '*arq3.csv')))
+    if nome == 'percepcao_curso':
+        return contar_linhas(glob.glob(os.path.join(PROCESSED_DATA_PATH, '*', str(year), '*arq4.csv')))
+    return n_alunos
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def carregar_historico(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def comparar_com_anterior(historico, registro, tolerancia):
+    anteriores = [r for r in historico if r['alunos'] == registro['alunos']]
+    if not anteriores:
+        return []
+    anterior = anteriores[-1]['etapas']
+
+    regressoes = []
+    for nome, medida in registro['etapas'].items():
+        base = anterior.get(nome, {}).get('segundos')
+        if base and medida['segundos'] and medida['segundos'] > base * (1 + tolerancia):
+            regressoes.append(f"{nome}: {base:.2f}s -> {medida['segundos']:.2f}s")
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com microdados sintéticos do ENADE")
+    parser.add_argument('--alunos', type=int, default=200000, help="Linhas por arquivo sintético")
+    parser.add_argument('--ano', default='2023')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument('--historico', default=HISTORICO_PATH, help="Arquivo JSON com o histórico de execuções")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Aumento de tempo (fração) considerado regressão")
+    parser.add_argument('--manter', action='store_true', help="Não apaga a pasta temporária com os dados gerados")
+    args = parser.parse_args()
+
+    historico_path = os.path.abspath(args.historico)
+    commit = commit_atual()
+    workdir = tempfile.mkdtemp(prefix='enade_bench_')
+    cwd_original = os.getcwd()
+
+    try:
+        # Os caminhos do config são relativos a 'data', então as etapas rodam dentro da pasta temporária
+        os.chdir(workdir)
+        print(f"Gerando dados sintéticos em '{workdir}'...")
+        gerar_dados('data', [args.ano], args.alunos, seed=args.seed)
+
+        registro = {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'alunos': args.alunos,
+            'ano': args.ano,
+            'python': sys.version.split()[0],
+            'etapas': {},
+        }
+
+        etapas = [nome for nome in ETAPAS if nome in args.etapas]
+        if any(nome in etapas for nome in ('run_calculation_curso', 'percepcao_curso')) and 'process_year' not in etapas:
+            print("   -> Aviso: etapas por curso dependem de process_year; ele será executado sem ser medido.")
+            medir_etapa('process_year', args.ano)
+
+        for nome in etapas:
+            print(f"\n>> {nome}...")
+            segundos, pico_rss, erro = medir_etapa(nome, args.ano)
+            if erro:
+                print(f"   -> ERRO em {nome}: {erro}")
+                registro['etapas'][nome] = {'segundos': None, 'erro': erro}
+                continue
+
+            linhas = linhas_da_etapa(nome, args.ano, args.alunos)
+            registro['etapas'][nome] = {
+                'segundos': round(segundos, 3),
+                'linhas': linhas,
+                'linhas_por_segundo': round(linhas / segundos) if segundos > 0 else None,
+                'pico_rss_mb': pico_rss,
+            }
+            print(f"   -> {segundos:.2f}s | {linhas} linhas | {registro['etapas'][nome]['linhas_por_segundo']} linhas/s | pico RSS {pico_rss} MB")
+    finally:
+        os.chdir(cwd_original)
+        if args.manter:
+            print(f"\nDados mantidos em '{workdir}'")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    historico = carregar_historico(historico_path)
+    regressoes = comparar_com_anterior(historico, registro, args.tolerancia)
+    historico.append(registro)
+
+    os.makedirs(os.path.dirname(historico_path), exist_ok=True)
+    with open(historico_path, 'w', encoding='utf-8') as f:
+        json.dump(historico, f, ensure_ascii=False, indent=4)
+    print(f"\nResultado adicionado a '{historico_path}'")
+
+    if regressoes:
+        print("\nREGRESSÕES em relação à execução anterior com o mesmo número de alunos:")
+        for regressao in regressoes:
+            print(f"   -> {regressao}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import os
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+from utils import find_data_files, get_parquet_cache_path, get_fresh_parquet_cache, normalize_column_name
+from config import YEARS_TO_PROCESS, RAW_DATA_PATH
+import catalogo
+import compactados
+from tipos import tipo_arrow
+
+CHUNK_SIZE = 500000
+
+def converter_chunk(chunk, schema):
+    perdidos = {}
+    for campo in schema:
+        col = campo.name
+        if campo.type == pa.string():
+            continue
+
+        # Decimais com vírgula já convertidos no cache
+        valores = pd.to_numeric(chunk[col].str.replace(',', '.', regex=False), errors='coerce')
+        if campo.type == pa.int64():
+            valores = valores.where(valores % 1 == 0)
+            valores = valores.astype('Int64')
+
+        n_perdidos = int((chunk[col].notna() & valores.isna()).sum())
+        if n_perdidos:
+            perdidos[col] = n_perdidos
+        chunk[col] = valores
+    return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False), perdidos
+
+def converter_arquivo(source_file_path, cache_path):
+    # Lido como texto para contar os valores descartados na conversão; os tipos vêm do registro (tipos.py).
+    # Membros de zip/rar são lidos como stream, sem extração (compactados.py).
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    writer, schema = None, None
+    perdidos_total = {}
+    total_linhas = 0
+    try:
+        with compactados.fonte_csv(source_file_path) as fonte:
+            reader = pd.read_csv(fonte, sep=';', encoding='latin1', dtype=str, chunksize=CHUNK_SIZE)
+            for chunk in tqdm(reader, desc=f"Convertendo {os.path.basename(source_file_path)}"):
+                chunk.columns = [normalize_column_name(col) for col in chunk.columns]
+                if schema is None:
+                    schema = pa.schema([(col, tipo_arrow(col)) for col in chunk.columns])
+                    writer = pq.ParquetWriter(tmp_path, schema, compression='zstd')
+
+                tabela, perdidos = converter_chunk(chunk, schema)
+                writer.write_table(tabela)
+                total_linhas += len(chunk)
+                for col, n in perdidos.items():
+                    perdidos_total[col] = perdidos_total.get(col, 0) + n
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        print(f"   -> Aviso: '{source_file_path}' está vazio. Pulando.")
+        return False
+
+    os.replace(tmp_path, cache_path)
+    catalogo.registrar_linhas(source_file_path, total_linhas)
+    for col, n in perdidos_total.items():
+        print(f"   -> Aviso: {n} valores não numéricos descartados em {col} ({os.path.basename(source_file_path)})")
+    return True
+
+def build_cache_year(year, force=False):
+    year_path = os.path.join(RAW_DATA_PATH, f'enade_{year}')
+    all_source_files = find_data_files(year_path)
+
+    for source_file_path in all_source_files:
+        cache_path = get_parquet_cache_path(source_file_path)
+        if not force and get_fresh_parquet_cache(source_file_path):
+            print(f"   -> Cache já atualizado: {cache_path}")
+            continue
+        try:
+            if converter_arquivo(source_file_path, cache_path):
+                print(f"   -> Cache salvo em '{cache_path}'")
+        except Exception as e:
+            print(f"   -> ERRO ao converter '{os.path.basename(source_file_path)}': {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte os microdados brutos do ENADE para Parquet")
+    parser.add_argument('--force', action='store_true', help="Reconverte mesmo os arquivos com cache atualizado")
+    args = parser.parse_args()
+
+    for year in YEARS_TO_PROCESS:
+        print(f"\n=== Gerando cache Parquet de {year} ===")
+        build_cache_year(year, force=args.force)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 import pandas as pd
 import os
 import glob
+import sys
 from config import RAW_DATA_PATH, YEARS_TO_PROCESS
-from data_processing.utils.filter_data import find_data_files 
+from utils import find_data_files, read_microdados
+import compactados
 
 CURSOS_CSV_PATH = os.path.join('data', 'cursos_ufc.csv')
 
@@ -16,7 +18,7 @@ def get_curso_grupo_map_from_raw_data():
         print(f"  Processando ano: {year}")
         year_extract_path = os.path.join(RAW_DATA_PATH, f'enade_{year}')
         
-        if not os.path.exists(year_extract_path):
+        if not compactados.dados_disponiveis(year_extract_path):
             print(f"    -> Pasta de dados brutos não encontrada para {year}. Pulando.")
             continue
         
@@ -29,11 +31,8 @@ def get_curso_grupo_map_from_raw_data():
             continue
 
         try:
-            df_info_raw = pd.read_csv(
+            df_info_raw = read_microdados(
                 arq1_path, 
-                sep=';', 
-                encoding='latin1', 
-                low_memory=False, 
                 usecols=['CO_CURSO', 'CO_GRUPO'] # Usando apenas as colunas que me importam
             )
 
@@ -72,7 +71,8 @@ def get_curso_grupo_map_from_raw_data():
 def main():
     curso_grupo_map = get_curso_grupo_map_from_raw_data()
     if curso_grupo_map is None:
-        return
+        print("ERRO: Nenhum mapeamento CO_CURSO -> CO_GRUPO encontrado nos microdados.")
+        return False
     
     # Lendo o arquivo mestre
     try:
@@ -83,7 +83,7 @@ def main():
         df_cursos_ufc[coluna_codigo] = df_cursos_ufc[coluna_codigo].astype('Int64')
     except Exception as e:
         print(f"ERRO ao ler {CURSOS_CSV_PATH}: {e}")
-        return
+        return False
 
     # Adicionando a coluna CO_GRUPO ao arquivo mestre
     df_cursos_ufc['CO_GRUPO'] = df_cursos_ufc['Código'].map(curso_grupo_map)
@@ -91,10 +91,16 @@ def main():
     df_cursos_ufc['CO_GRUPO'] = df_cursos_ufc['CO_GRUPO'].astype('Int64')
 
     try:
-        df_cursos_ufc.to_csv(CURSOS_CSV_PATH, sep=';', index=False, encoding='utf-8')
+        # Grava em um .tmp e renomeia: quem lê o arquivo nunca vê um CSV pela metade
+        tmp_path = f"{CURSOS_CSV_PATH}.{os.getpid()}.tmp"
+        df_cursos_ufc.to_csv(tmp_path, sep=';', index=False, encoding='utf-8')
+        os.replace(tmp_path, CURSOS_CSV_PATH)
         print(f"\nSucesso! Arquivo '{CURSOS_CSV_PATH}' atualizado com a coluna 'CO_GRUPO'.")
     except Exception as e:
         print(f"ERRO ao salvar o arquivo atualizado: {e}")
+        return False
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if not main():
+        sys.exit(1)
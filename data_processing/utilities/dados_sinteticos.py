@@ -0,0 +1,190 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from config import CAMPUS_MAP, CURSO_MAP, UFC_IES_CODE, UF_CODE, REGIAO_CODE
+
+# Gera microdados sintéticos no mesmo layout dos arquivos do INEP (arq1, arq3 e arq4),
+# além de cursos_ufc.csv e das estruturas de competências, para medir o pipeline sem os downloads reais.
+
+BLOCO_LINHAS = 200000
+GRUPOS = [21, 72, 79, 702, 903, 904, 905, 906, 1401, 2001, 4003, 5710, 6306, 6410]
+COMPONENTES_CE = ['Fundamentos', 'Métodos', 'Aplicações', 'Gestão', 'Ética Profissional']
+COMPONENTES_FG = ['Ética', 'Sociedade', 'Meio Ambiente', 'Tecnologia']
+
+CE_OBJ, CE_DISC = 27, 3
+FG_OBJ, FG_DISC = 8, 2
+QE_CATEGORICAS = [f'QE_I{i:02d}' for i in range(1, 27)]
+QE_LIKERT = [f'QE_I{i:02d}' for i in range(27, 69)]
+
+# Proporção de alunos em cursos da UFC (bem maior que a real para que as etapas por curso tenham dados)
+FRACAO_UFC = 0.1
+
+def gerar_cursos(rng, n_cursos):
+    codigos_ufc = list(CURSO_MAP.keys())
+    n_outros = max(n_cursos - len(codigos_ufc), 1)
+
+    ufc = pd.DataFrame({
+        'CO_CURSO': codigos_ufc,
+        'CO_IES': UFC_IES_CODE,
+        'CO_GRUPO': rng.choice(GRUPOS, len(codigos_ufc)),
+        'CO_MUNIC_CURSO': rng.choice(list(CAMPUS_MAP.keys()), len(codigos_ufc)),
+        'CO_UF_CURSO': UF_CODE,
+        'CO_REGIAO_CURSO': REGIAO_CODE,
+    })
+    ies_outros = rng.integers(1, 3000, n_outros)
+    outros = pd.DataFrame({
+        'CO_CURSO': np.arange(n_outros) + 5000000,
+        'CO_IES': np.where(ies_outros == UFC_IES_CODE, UFC_IES_CODE + 1, ies_outros),
+        'CO_GRUPO': rng.choice(GRUPOS, n_outros),
+        'CO_MUNIC_CURSO': rng.integers(1100015, 5300108, n_outros),
+        'CO_UF_CURSO': rng.integers(11, 54, n_outros),
+        'CO_REGIAO_CURSO': rng.integers(1, 6, n_outros),
+    })
+    return pd.concat([ufc, outros], ignore_index=True)
+
+def gerar_estruturas(anos):
+    estrutura_ce = {}
+    for co_grupo in GRUPOS:
+        anos_grupo = {}
+        for year in anos:
+            anos_grupo[str(year)] = {
+                "questoes_CE": {
+                    "discursivas": {f"d{FG_DISC + i}": (i % len(COMPONENTES_CE)) + 1 for i in range(1, CE_DISC + 1)},
+                    "objetivas": {
+                        f"q{FG_OBJ + i}": [(i % len(COMPONENTES_CE)) + 1, ((i + 2) % len(COMPONENTES_CE)) + 1] if i % 5 == 0
+                        else (i % len(COMPONENTES_CE)) + 1
+                        for i in range(1, CE_OBJ + 1)
+                    }
+                }
+            }
+        estrutura_ce[str(co_grupo)] = {
+            "Nome_Area": f"Área CO_GRUPO {co_grupo}",
+            "Componente_especifico": COMPONENTES_CE,
+            "Cursos": [],
+            "Anos": anos_grupo
+        }
+
+    estrutura_fg = [
+        {
+            "ANO": str(year),
+            "Formacao_geral": COMPONENTES_FG,
+            "questoes": {
+                "objetivas": {f"q{i}": (i % len(COMPONENTES_FG)) + 1 for i in range(1, FG_OBJ + 1)},
+                "discursivas": {f"d{i}": i for i in range(1, FG_DISC + 1)}
+            }
+        }
+        for year in anos
+    ]
+    return estrutura_ce, estrutura_fg
+
+def vetor_respostas(rng, n, largura, presentes):
+    # Mesmos símbolos do DS_VT_ACE_*: 0 (erro), 1 (acerto), 8/9 (rasura/branco) e '.' (anulada)
+    simbolos = np.frombuffer(b'0189.', dtype=np.uint8)
+    matriz = simbolos[rng.choice(len(simbolos), size=(n, largura), p=[0.42, 0.5, 0.03, 0.03, 0.02])]
+    textos = matriz.copy().view(f'S{largura}').ravel().astype(str).astype(object)
+    textos[~presentes] = np.nan
+    return textos
+
+def notas(rng, n, presentes, media=50.0):
+    valores = np.clip(rng.normal(media, 18.0, n), 0, 100).round(1)
+    valores[~presentes] = np.nan
+    return valores
+
+def gerar_bloco(rng, year, cursos, n, pesos):
+    idx = rng.choice(len(cursos), n, p=pesos)
+    bloco_cursos = cursos.iloc[idx].reset_index(drop=True)
+    presentes = rng.random(n) < 0.92
+
+    arq1 = bloco_cursos[['CO_IES', 'CO_GRUPO', 'CO_CURSO', 'CO_MUNIC_CURSO', 'CO_UF_CURSO', 'CO_REGIAO_CURSO']].copy()
+    arq1.insert(0, 'NU_ANO', int(year))
+    arq1.insert(2, 'CO_CATEGAD', rng.choice([1, 2, 3, 4, 5], n))
+    arq1.insert(3, 'CO_ORGACAD', rng.choice([10019, 10020, 10022, 10026], n))
+    arq1.insert(6, 'CO_MODALIDADE', rng.choice([0, 1], n, p=[0.2, 0.8]))
+
+    arq3 = pd.DataFrame({
+        'NU_ANO': int(year),
+        'CO_CURSO': bloco_cursos['CO_CURSO'],
+        'DS_VT_ACE_OFG': vetor_respostas(rng, n, FG_OBJ, presentes),
+        'DS_VT_ACE_OCE': vetor_respostas(rng, n, CE_OBJ, presentes),
+        'TP_PRES': np.where(presentes, 555, 222),
+        'NT_GER': notas(rng, n, presentes),
+        'NT_FG': notas(rng, n, presentes, 55.0),
+        'NT_OBJ_FG': notas(rng, n, presentes, 60.0),
+        'NT_DIS_FG': notas(rng, n, presentes, 45.0),
+        **{f'NT_FG_D{i}': notas(rng, n, presentes & (rng.random(n) < 0.9)) for i in range(1, FG_DISC + 1)},
+        'NT_CE': notas(rng, n, presentes, 45.0),
+        'NT_OBJ_CE': notas(rng, n, presentes, 48.0),
+        'NT_DIS_CE': notas(rng, n, presentes, 40.0),
+        **{f'NT_CE_D{i}': notas(rng, n, presentes & (rng.random(n) < 0.85)) for i in range(1, CE_DISC + 1)},
+    })
+
+    arq4 = pd.DataFrame({'NU_ANO': int(year), 'CO_CURSO': bloco_cursos['CO_CURSO']})
+    for col in QE_CATEGORICAS:
+        arq4[col] = rng.choice(list('ABCDEF'), n)
+    for col in QE_LIKERT:
+        # 1 a 6 na escala, 7 e 8 para "não sei" / "não se aplica"
+        arq4[col] = pd.array(rng.choice([1, 2, 3, 4, 5, 6, 7, 8], n, p=[0.04, 0.05, 0.1, 0.2, 0.3, 0.25, 0.03, 0.03]), dtype='Int64')
+        arq4.loc[rng.random(n) < 0.05, col] = pd.NA
+    return {'arq1': arq1, 'arq3': arq3, 'arq4': arq4}
+
+def gerar_ano(base_path, year, cursos, n_alunos, rng):
+    dados_dir = os.path.join(base_path, 'raw', f'enade_{year}', f'microdados_Enade_{year}', '2.DADOS')
+    os.makedirs(dados_dir, exist_ok=True)
+
+    eh_ufc = (cursos['CO_IES'] == UFC_IES_CODE).to_numpy()
+    pesos = np.where(eh_ufc, FRACAO_UFC / eh_ufc.sum(), (1 - FRACAO_UFC) / (~eh_ufc).sum())
+
+    caminhos = {arq: os.path.join(dados_dir, f'microdados{year}_{arq}.txt') for arq in ('arq1', 'arq3', 'arq4')}
+    escritos = 0
+    while escritos < n_alunos:
+        n = min(BLOCO_LINHAS, n_alunos - escritos)
+        for arq, df in gerar_bloco(rng, year, cursos, n, pesos).items():
+            df.to_csv(caminhos[arq], sep=';', index=False, decimal=',', encoding='latin1',
+                      mode='w' if escritos == 0 else 'a', header=escritos == 0)
+        escritos += n
+    return caminhos
+
+def gerar_dados(base_path, anos, n_alunos, n_cursos=400, seed=0):
+    rng = np.random.default_rng(seed)
+    cursos = gerar_cursos(rng, n_cursos)
+
+    arquivos = {}
+    for year in anos:
+        print(f"   -> Gerando {n_alunos} alunos sintéticos para {year}...")
+        arquivos[str(year)] = gerar_ano(base_path, year, cursos, n_alunos, rng)
+
+    ufc = cursos[cursos['CO_IES'] == UFC_IES_CODE]
+    pd.DataFrame({
+        'Código': ufc['CO_CURSO'],
+        'CO_GRUPO': ufc['CO_GRUPO'],
+        'Município': ufc['CO_MUNIC_CURSO'].map(CAMPUS_MAP),
+        'Curso': ufc['CO_CURSO'].map(CURSO_MAP).str.rsplit(' - ', n=1).str[0],
+        'Grau': ufc['CO_CURSO'].map(CURSO_MAP).str.rsplit(' - ', n=1).str[-1],
+    }).to_csv(os.path.join(base_path, 'cursos_ufc.csv'), sep=';', index=False, encoding='utf-8')
+
+    estrutura_ce, estrutura_fg = gerar_estruturas(anos)
+    estruturas_dir = os.path.join(base_path, 'json', 'Estruturas_json')
+    os.makedirs(estruturas_dir, exist_ok=True)
+    with open(os.path.join(estruturas_dir, 'estrutura_competencias_final.json'), 'w', encoding='utf-8') as f:
+        json.dump(estrutura_ce, f, ensure_ascii=False, indent=4)
+    with open(os.path.join(estruturas_dir, 'estrutura_fg_final.json'), 'w', encoding='utf-8') as f:
+        json.dump(estrutura_fg, f, ensure_ascii=False, indent=4)
+
+    return arquivos
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera microdados sintéticos do ENADE para testes de desempenho")
+    parser.add_argument('destino', help="Pasta base dos dados (equivalente a 'data')")
+    parser.add_argument('--anos', nargs='+', default=['2023'])
+    parser.add_argument('--alunos', type=int, default=100000, help="Linhas por arquivo e por ano")
+    parser.add_argument('--cursos', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    gerar_dados(args.destino, args.anos, args.alunos, args.cursos, args.seed)
+    print(f"Dados sintéticos salvos em '{args.destino}'")
+
+if __name__ == '__main__':
+    main()
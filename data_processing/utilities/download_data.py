@@ -1,55 +1,326 @@
 import requests
 import zipfile
 import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 from tqdm import tqdm
 
-from ..config import URLS, RAW_DATA_PATH
+from config import URLS, RAW_DATA_PATH, DOWNLOAD_MANIFEST_PATH, EXTRACT_ARCHIVES
+import compactados
 
-def download_file(url, local_filename):
+# Uso (a partir de data_processing): python -m utilities.download_data --workers 3 [--anos 2022 2023] [--sem-extrair]
+# Para testar sem a rede do INEP: python -m utilities.servidor_local --verificar
+
+# Blocos grandes: com 1 KiB o download dos zips de centenas de MB ficava preso em chamadas de escrita
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+TIMEOUT = 60
+TENTATIVAS = 5
+
+
+def sha256_arquivo(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def carregar_manifesto(path=DOWNLOAD_MANIFEST_PATH):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"   -> Aviso: manifesto de downloads ilegível ({e}). Os arquivos serão verificados de novo.")
+    return {}
+
+def salvar_manifesto(manifesto, path=DOWNLOAD_MANIFEST_PATH):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=4)
+        os.replace(path + '.tmp', path)
+    except Exception as e:
+        print(f"   -> ERRO ao salvar manifesto de downloads: {e}")
+
+def nome_arquivo(year, url):
+    # Mantém a extensão da URL: o arquivo de 2022 é um .rar e era salvo como .zip
+    extensao = os.path.splitext(urlparse(url).path)[1].lower() or '.zip'
+    return os.path.join(RAW_DATA_PATH, f'microdados_enade_{year}{extensao}')
+
+def tamanho_total(resposta, inicio):
+    # "Content-Range: bytes 100-199/200" (206) ou "bytes */200" (416)
+    content_range = resposta.headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    content_length = resposta.headers.get('Content-Length')
+    return inicio + int(content_length) if content_length else None
+
+def _ler_validador(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _gravar_validador(path, url, resposta):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'url': url,
+            'etag': resposta.headers.get('ETag'),
+            'last_modified': resposta.headers.get('Last-Modified'),
+        }, f)
+
+def download_file(url, local_filename, tentativas=TENTATIVAS, desc=None, position=None):
+    # Baixa para "<arquivo>.part" e retoma com HTTP Range de onde parou, tanto após uma conexão
+    # derrubada (novas tentativas) quanto entre execuções. O ETag/Last-Modified da primeira resposta
+    # vai no If-Range: se o arquivo mudou no servidor, ele responde 200 e o download recomeça do zero.
+    parcial = local_filename + '.part'
+    validador_path = parcial + '.json'
+
+    if os.path.exists(parcial) and _ler_validador(validador_path).get('url') != url:
+        os.remove(parcial)
+
+    for tentativa in range(1, tentativas + 1):
+        inicio = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+        headers = {'Accept-Encoding': 'identity'}
+        if inicio:
+            headers['Range'] = f'bytes={inicio}-'
+            validador = _ler_validador(validador_path)
+            if validador.get('etag') or validador.get('last_modified'):
+                headers['If-Range'] = validador.get('etag') or validador.get('last_modified')
+
+        try:
+            with requests.get(url, stream=True, headers=headers, timeout=TIMEOUT) as r:
+                if r.status_code == 416:
+                    # O .part já contém o arquivo inteiro (ou é maior que ele, e então é descartado)
+                    if tamanho_total(r, 0) == inicio:
+                        break
+                    os.remove(parcial)
+                    continue
+                r.raise_for_status()
+
+                if r.status_code != 206:
+                    inicio = 0
+                    _gravar_validador(validador_path, url, r)
+                total = tamanho_total(r, inicio)
+
+                with open(parcial, 'ab' if inicio else 'wb') as f, tqdm(
+                    total=total, initial=inicio, unit='iB', unit_scale=True,
+                    desc=desc, position=position, leave=False
+                ) as progress_bar:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        progress_bar.update(len(chunk))
+
+            tamanho = os.path.getsize(parcial)
+            if total is not None and tamanho != total:
+                raise IOError(f"download incompleto ({tamanho} de {total} bytes)")
+            break
+        except (requests.exceptions.RequestException, IOError) as e:
+            print(f"Erro ao baixar o arquivo '{url}' (tentativa {tentativa}/{tentativas}): {e}")
+            if tentativa < tentativas:
+                time.sleep(min(2 ** tentativa, 30))
+    else:
+        return None
+
+    validador = _ler_validador(validador_path)
+    os.replace(parcial, local_filename)
+    if os.path.exists(validador_path):
+        os.remove(validador_path)
+
+    return registro_arquivo(url, local_filename, validador.get('etag'))
+
+def registro_arquivo(url, path, etag=None):
+    stat = os.stat(path)
+    return {
+        'url': url,
+        'arquivo': os.path.basename(path),
+        'tamanho': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': sha256_arquivo(path),
+        'etag': etag,
+    }
+
+def _destino_seguro(base, nome):
+    destino = os.path.realpath(os.path.join(base, nome))
+    if os.path.commonpath([destino, os.path.realpath(base)]) != os.path.realpath(base):
+        raise ValueError(f"caminho fora da pasta de extração: {nome}")
+    return destino
+
+def _extrair_membros(arquivo, extract_path):
+    # Copia membro a membro com buffer grande, sem carregar nenhum arquivo inteiro em memória
+    for info in arquivo.infolist():
+        destino = _destino_seguro(extract_path, info.filename)
+        if info.is_dir():
+            os.makedirs(destino, exist_ok=True)
+            continue
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with arquivo.open(info) as origem, open(destino, 'wb') as saida:
+            shutil.copyfileobj(origem, saida, COPY_BUFFER_SIZE)
+
+def _extrair_rar(rar_filename, extract_path):
     try:
-        # Streaming download para baixar arquivos grandes
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            total_size_in_bytes = int(r.headers.get('content-length', 0))
-            block_size = 1024
-
-            progress_bar = tqdm(total=total_size_in_bytes, unit='iB', unit_scale=True)
-
-            # Tentando baixar o arquivo
-            with open(local_filename, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=block_size):
-                    progress_bar.update(len(chunk))
-                    f.write(chunk)
-            progress_bar.close()
-
-            # "checksum" simples para garantir que o download foi completo
-            if total_size_in_bytes != 0 and progress_bar.n != total_size_in_bytes:
-                print("ERRO: Algo deu errado durante o download")
-                return False
+        import rarfile
+    except ImportError:
+        rarfile = None
+
+    if rarfile is not None:
+        with rarfile.RarFile(rar_filename) as rar_ref:
+            _extrair_membros(rar_ref, extract_path)
+        return
+
+    # Sem o pacote rarfile, usa o primeiro extrator de linha de comando disponível
+    comandos = {
+        'unrar': ['unrar', 'x', '-o+', '-idq', rar_filename, extract_path + os.sep],
+        '7z': ['7z', 'x', '-y', f'-o{extract_path}', rar_filename],
+        'bsdtar': ['bsdtar', '-xf', rar_filename, '-C', extract_path],
+    }
+    for programa, comando in comandos.items():
+        if shutil.which(programa):
+            subprocess.run(comando, check=True, stdout=subprocess.DEVNULL)
+            return
+    raise RuntimeError("nenhum extrator de RAR encontrado (instale o pacote 'rarfile' ou 'unrar', '7z' ou 'bsdtar')")
+
+def extract_file(archive_filename, extract_path):
+    # Extrai em uma pasta temporária e renomeia no fim, para que uma extração interrompida
+    # não deixe uma pasta enade_<ano> incompleta que pareça pronta
+    tmp_path = extract_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    try:
+        if archive_filename.lower().endswith('.rar'):
+            _extrair_rar(archive_filename, tmp_path)
+        else:
+            with zipfile.ZipFile(archive_filename, 'r') as zip_ref:
+                _extrair_membros(zip_ref, tmp_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    shutil.rmtree(extract_path, ignore_errors=True)
+    os.replace(tmp_path, extract_path)
+
+def arquivo_confere(archive_filename, registro):
+    # O arquivo local bate com o tamanho e o sha256 registrados no último download completo.
+    # Como em manifesto.hash_arquivo, o sha256 só é recalculado quando o tamanho ou o mtime mudam
+    if not os.path.exists(archive_filename):
+        return False
+    if not registro:
         return True
-    except requests.exceptions.RequestException as e:
-        print(f"Erro ao baixar o arquivo: {e}")
+    stat = os.stat(archive_filename)
+    if stat.st_size != registro.get('tamanho'):
         return False
+    if registro.get('mtime') == stat.st_mtime:
+        return True
+    return sha256_arquivo(archive_filename) == registro.get('sha256')
 
-def main():
-    os.makedirs(RAW_DATA_PATH, exist_ok=True)
+def indexar_arquivo(archive_filename, extract_path, registro):
+    # Sem extração, registra o índice de membros (arq1, arq3...) que os leitores vão abrir no arquivo.
+    # Uma pasta extraída de uma versão anterior do arquivo é removida para não ser lida no lugar dele.
+    extraido_de = registro.get('extraido_de')
+    if os.path.exists(extract_path) and extraido_de and extraido_de != registro['sha256']:
+        print(f"   -> Aviso: removendo '{extract_path}', extraída de uma versão anterior de '{archive_filename}'.")
+        shutil.rmtree(extract_path, ignore_errors=True)
+        extraido_de = None
+    try:
+        indice = compactados.indice_membros(archive_filename)
+    except (zipfile.BadZipFile, RuntimeError, subprocess.CalledProcessError) as e:
+        print(f"ERRO: O arquivo '{archive_filename}' está corrompido ou não pôde ser lido: {e}")
+        return {**registro, 'membros': None}
+    if not indice:
+        print(f"   -> Aviso: nenhum arquivo de dados (arq1, arq3...) encontrado em '{archive_filename}'.")
+    return {**registro, 'extraido_de': extraido_de, 'membros': indice}
 
-    # Baixando e extraindo os arquivos ZIP
-    for year, url in URLS.items():
-        zip_filename = os.path.join(RAW_DATA_PATH, f'microdados_enade_{year}.zip')
-        extract_path = os.path.join(RAW_DATA_PATH, f'enade_{year}')
+def process_year_download(year, url, registro, position=None, extrair=EXTRACT_ARCHIVES):
+    archive_filename = nome_arquivo(year, url)
+    extract_path = os.path.join(RAW_DATA_PATH, f'enade_{year}')
 
-        # Só baixa se não existir
-        if not os.path.exists(zip_filename):
-            if not download_file(url, zip_filename):
-                continue
-        
-        if not os.path.exists(extract_path):
+    if registro and registro.get('url') != url:
+        registro = None
+    if os.path.exists(archive_filename) and not arquivo_confere(archive_filename, registro):
+        print(f"   -> Aviso: '{archive_filename}' não confere com o manifesto (tamanho/sha256). Baixando de novo.")
+        os.remove(archive_filename)
+    elif registro and os.path.exists(archive_filename):
+        # Conferido pelo sha256: guarda o mtime atual para não refazer o hash na próxima execução
+        registro = {**registro, 'mtime': os.path.getmtime(archive_filename)}
+
+    # Só baixa se não existir
+    if not os.path.exists(archive_filename):
+        registro = download_file(url, archive_filename, desc=year, position=position)
+        if registro is None:
+            print(f"ERRO: Não foi possível baixar os microdados de {year}.")
+            return None
+    elif registro is None:
+        # Arquivo baixado antes do manifesto existir: registra o que está no disco
+        registro = registro_arquivo(url, archive_filename)
+
+    if not extrair:
+        return indexar_arquivo(archive_filename, extract_path, registro)
+
+    # Reextrai quando o arquivo baixado não é o mesmo da última extração
+    extraido_de = registro.get('extraido_de')
+    if not os.path.exists(extract_path) or (extraido_de and extraido_de != registro['sha256']):
+        try:
+            extract_file(archive_filename, extract_path)
+        except (zipfile.BadZipFile, RuntimeError, subprocess.CalledProcessError, ValueError) as e:
+            print(f"ERRO: O arquivo '{archive_filename}' está corrompido ou não pôde ser extraído: {e}")
+            return {**registro, 'extraido_de': None}
+    return {**registro, 'extraido_de': registro['sha256']}
+
+def urls_com_base(url_base, urls=URLS):
+    # Troca o servidor do INEP por outro que sirva os arquivos com o mesmo nome
+    return {year: f"{url_base.rstrip('/')}/{os.path.basename(urlparse(url).path)}" for year, url in urls.items()}
+
+def main(workers=3, anos=None, urls=URLS, extrair=EXTRACT_ARCHIVES):
+    os.makedirs(RAW_DATA_PATH, exist_ok=True)
+    manifesto = carregar_manifesto()
+    anos = [year for year in urls if not anos or year in anos]
+
+    # Baixando e extraindo os arquivos em paralelo (threads: o trabalho é quase todo de rede e disco)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futuros = {
+            executor.submit(process_year_download, year, urls[year], manifesto.get(year), i, extrair): year
+            for i, year in enumerate(anos)
+        }
+        falhas = []
+        for futuro in as_completed(futuros):
+            year = futuros[futuro]
             try:
-                with zipfile.ZipFile(zip_filename, 'r') as zip_ref:
-                    zip_ref.extractall(extract_path)
-            except zipfile.BadZipFile:
-                print(f"ERRO: O arquivo '{zip_filename}' está corrompido ou não é um ZIP válido.")
+                registro = futuro.result()
+            except Exception as e:
+                print(f"ERRO inesperado ao baixar/extrair {year}: {e}")
+                falhas.append(year)
+                continue
+            if not registro:
+                falhas.append(year)
+                continue
+            manifesto[year] = registro
+            salvar_manifesto(manifesto)
+            if extrair and not registro.get('extraido_de'):
+                falhas.append(year)
+                continue
+            print(f"   -> {year}: {registro['arquivo']} ({registro['tamanho']} bytes) pronto.")
+
+    if falhas:
+        print(f"ERRO: Microdados indisponíveis para {', '.join(sorted(falhas))}.")
+        return False
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Download dos microdados do ENADE")
+    parser.add_argument('--workers', type=int, default=3, help="Downloads simultâneos (padrão: 3)")
+    parser.add_argument('--anos', nargs='+', help="Baixa apenas estes anos (padrão: todos de URLS)")
+    parser.add_argument('--sem-extrair', action='store_true', help="Não extrai os arquivos; os microdados são lidos direto deles")
+    parser.add_argument('--url-base', help="Baixa os mesmos arquivos deste endereço (ex.: o servidor de utilities/servidor_local.py)")
+    args = parser.parse_args()
+    urls = urls_com_base(args.url_base) if args.url_base else URLS
+    if not main(workers=args.workers, anos=args.anos, urls=urls, extrair=EXTRACT_ARCHIVES and not args.sem_extrair):
+        sys.exit(1)
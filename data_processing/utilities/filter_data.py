@@ -1,9 +1,15 @@
 import pandas as pd
 import os
 import glob
-from tqdm import tqdm
-from utils import find_data_files 
-from config import YEARS_TO_PROCESS, RAW_DATA_PATH, PROCESSED_DATA_PATH, UFC_IES_CODE, CAMPUS_MAP
+import sys
+from utils import find_data_files, read_microdados, progress, run_parallel, workers_parser
+from manifesto import Manifesto, hash_valor
+from registros import construir_registros
+from instrumentacao import instrumentar, contar_linhas
+import catalogo
+from config import YEARS_TO_PROCESS, RAW_DATA_PATH, PROCESSED_DATA_PATH, UFC_IES_CODE, CAMPUS_MAP, USE_REGISTROS
+
+CHUNK_SIZE = 500000
 
 def get_ufc_courses_by_campus(year, year_path):
     # Busca recursiva com os múltiplos padrões de nomenclatura dos microdados
@@ -15,7 +21,7 @@ def get_ufc_courses_by_campus(year, year_path):
 
     try:
         # Leitura e padronização dos dados
-        df_info = pd.read_csv(course_info_file, sep=';', encoding='latin1', low_memory=False)
+        df_info = read_microdados(course_info_file)
         df_info.columns = [col.upper() for col in df_info.columns]
 
         # Convertendo para numérico e removendo nulos
@@ -43,54 +49,116 @@ def get_ufc_courses_by_campus(year, year_path):
         print(f"Erro ao ler o arquivo de informações de curso '{course_info_file}': {e}")
         return {}
 
+def split_file_by_campus(source_file_path, curso_to_campus, year):
+    # Lê o arquivo uma única vez, em chunks, e anexa as linhas de cada campus ao seu CSV.
+    # Cada campus escreve primeiro em um .tmp, renomeado só quando o arquivo termina sem erro.
+    csv_filename = os.path.splitext(os.path.basename(source_file_path))[0] + '.csv'
+    writers = {}
+    total_linhas = 0
+    try:
+        for chunk in read_microdados(source_file_path, chunksize=CHUNK_SIZE):
+            contar_linhas(len(chunk))
+            total_linhas += len(chunk)
+            chunk.columns = [col.upper() for col in chunk.columns]
+
+            if 'CO_CURSO' not in chunk.columns:
+                return []
+
+            campus_por_linha = pd.to_numeric(chunk['CO_CURSO'], errors='coerce').map(curso_to_campus)
+            for campus_name, df_campus in chunk.groupby(campus_por_linha, sort=False):
+                if campus_name not in writers:
+                    output_path = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year), csv_filename)
+                    writers[campus_name] = (output_path, open(output_path + '.tmp', 'w', encoding='utf-8', newline=''))
+                    header = True
+                else:
+                    header = False
+
+                # Salvando em UTF-8, com as notas no mesmo formato decimal dos microdados
+                df_campus.to_csv(writers[campus_name][1], sep=';', index=False, header=header, decimal=',')
+    except Exception:
+        for output_path, handle in writers.values():
+            handle.close()
+            os.remove(output_path + '.tmp')
+        raise
+
+    for output_path, handle in writers.values():
+        handle.close()
+        os.replace(output_path + '.tmp', output_path)
+    catalogo.registrar_linhas(source_file_path, total_linhas)
+    return [output_path for output_path, _ in writers.values()]
+
+@instrumentar('process_year', 'year')
 def process_year(year):
     year_extract_path = os.path.join(RAW_DATA_PATH, f'enade_{year}')
 
     campus_to_courses_map = get_ufc_courses_by_campus(year, year_extract_path)
     if not campus_to_courses_map:
-        return
+        return None
 
-    # Criando os diretórios de saída
-    for campus_code in campus_to_courses_map.keys():
+    # Criando os diretórios de saída e o mapa CO_CURSO -> campus
+    curso_to_campus = {}
+    for campus_code, course_list in campus_to_courses_map.items():
         campus_name = CAMPUS_MAP.get(campus_code, f'campus_desconhecido_{int(campus_code)}')
         year_output_dir = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year))
         os.makedirs(year_output_dir, exist_ok=True)
+        for co_curso in course_list:
+            curso_to_campus.setdefault(co_curso, campus_name)
     
     # Varrendo os arquivos de dados
     all_source_files = find_data_files(year_extract_path)
+    arquivos_gerados, houve_erro = [], False
 
-    for source_file_path in tqdm(all_source_files, desc=f"Filtrando arquivos de {year}"):
+    for source_file_path in progress(all_source_files, desc=f"Filtrando arquivos de {year}"):
         try:
-            df_source = pd.read_csv(source_file_path, sep=';', encoding='latin1', low_memory=False)
-            df_source.columns = [col.upper() for col in df_source.columns]
-
-            if 'CO_CURSO' not in df_source.columns:
-                continue
-
-            # Pegando apenas as linhas dos cursos da UFC por campus
-            for campus_code, course_list in campus_to_courses_map.items():
-                df_filtered = df_source[df_source['CO_CURSO'].isin(course_list)]
-
-                if not df_filtered.empty:
-                    base_filename = os.path.basename(source_file_path)
-                    
-                    csv_filename = os.path.splitext(base_filename)[0] + '.csv'
-                    
-                    campus_name = CAMPUS_MAP.get(campus_code, f'campus_desconhecido_{int(campus_code)}')
-                    output_dir = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year))
-                    output_path = os.path.join(output_dir, csv_filename)
-                    
-                    # Salvando em UTF-8
-                    df_filtered.to_csv(output_path, sep=';', index=False, encoding='utf-8')
-
+            arquivos_gerados.extend(split_file_by_campus(source_file_path, curso_to_campus, year))
         except Exception as e:
             print(f"\nErro ao processar o arquivo '{os.path.basename(source_file_path)}': {e}")
+            houve_erro = True
             continue
 
-def main():
+    # Com erro, o ano não entra no manifesto e é refeito na próxima execução
+    if houve_erro:
+        return None
+
+    # Store binário (registros.py) lido pelas análises no lugar dos CSVs recém-gerados
+    if USE_REGISTROS:
+        construir_registros(year)
+    return arquivos_gerados
+
+def main(workers=1):
     os.makedirs(PROCESSED_DATA_PATH, exist_ok=True)
+
+    # Anos cujos brutos e constantes não mudaram desde a última filtragem são pulados
+    manifesto = Manifesto()
+    entradas_por_ano = {}
     for year in YEARS_TO_PROCESS:
-        process_year(year)
+        entradas = {
+            'microdados': manifesto.hash_arquivos(find_data_files(os.path.join(RAW_DATA_PATH, f'enade_{year}'))),
+            'constantes': hash_valor([UFC_IES_CODE, CAMPUS_MAP]),
+        }
+        if manifesto.atualizado(f"filtro/{year}", entradas):
+            print(f"   -> Filtragem de {year} já atualizada. Pulando.")
+            continue
+        entradas_por_ano[year] = entradas
+
+    # Cada ano grava em pastas próprias (campus/ano), então podem rodar em paralelo
+    anos = list(entradas_por_ano)
+    resultados = run_parallel(process_year, [(f"Ano {year}", (year,)) for year in anos], workers, "Filtragem")
+
+    falhas = []
+    for year, arquivos_gerados in zip(anos, resultados):
+        if arquivos_gerados:
+            manifesto.registrar(f"filtro/{year}", entradas_por_ano[year], arquivos_gerados)
+        else:
+            falhas.append(year)
+    manifesto.salvar()
+
+    if falhas:
+        print(f"ERRO: Filtragem sem resultado para {', '.join(falhas)}.")
+        return False
+    return True
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    args = workers_parser("Filtragem dos microdados por campus da UFC").parse_args()
+    if not main(workers=args.workers):
+        sys.exit(1)
\ No newline at end of file
@@ -2,7 +2,8 @@ import pandas as pd
 import os
 import glob
 import json
-from ..config import PROCESSED_DATA_PATH, YEARS_TO_PROCESS, FINAL_MEDIA_JSON_PATH, CURSOS_CSV_PATH
+from config import PROCESSED_DATA_PATH, YEARS_TO_PROCESS, FINAL_MEDIA_JSON_PATH, CURSOS_CSV_PATH
+from tipos import ler_csv
 
 MEDIAS_UFC_BASE_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Medias_UFC')
 
@@ -36,8 +37,9 @@ def calculate_ufc_averages_for_year(year, relevant_grupos):
 
         if arq1_path and arq3_path:
             try:
-                df_info_campus = pd.read_csv(arq1_path[0], sep=';', encoding='utf-8', usecols=['CO_CURSO', 'CO_GRUPO'])
-                df_notas_campus = pd.read_csv(arq3_path[0], sep=';', encoding='utf-8', usecols=['CO_CURSO', 'NT_GER', 'NT_FG', 'NT_CE'])
+                # Tipos do registro central (tipos.py): as notas já chegam como float, com decimal=','
+                df_info_campus = ler_csv(arq1_path[0], 'utf-8', usecols=['CO_CURSO', 'CO_GRUPO'])
+                df_notas_campus = ler_csv(arq3_path[0], 'utf-8', usecols=['CO_CURSO', 'NT_GER', 'NT_FG', 'NT_CE'])
                 all_campus_dfs_info.append(df_info_campus)
                 all_campus_dfs_notas.append(df_notas_campus)
             except Exception as e:
@@ -62,10 +64,6 @@ def calculate_ufc_averages_for_year(year, relevant_grupos):
         df_notas_filtered = df_notas_ufc[df_notas_ufc['CO_CURSO'].isin(relevant_cursos_ufc)].copy()
 
         colunas_notas = ['NT_GER', 'NT_FG', 'NT_CE']
-        for col in colunas_notas:
-            if df_notas_filtered[col].dtype == 'object':
-                df_notas_filtered.loc[:, col] = df_notas_filtered[col].str.replace(',', '.', regex=False).astype(float)
-            df_notas_filtered.loc[:, col] = pd.to_numeric(df_notas_filtered[col], errors='coerce')
         df_notas_filtered.dropna(subset=colunas_notas, inplace=True)
 
         df_merged_ufc = pd.merge(df_notas_filtered, df_info_filtered, on='CO_CURSO')
@@ -1,6 +1,8 @@
 import os
+import sys
 import json
 from config import FINAL_VG_JSON_PATH, YEARS_TO_PROCESS, CAMPUS_MAP
+from utils import write_json
 
 def main():
     
@@ -15,6 +17,7 @@ def main():
         for campus_name in opcoes_filtro["campi"]:
             opcoes_filtro["cursosPorAnoECampus"][year][campus_name] = []
 
+    falhas = []
     for campus_name in opcoes_filtro["campi"]:
         json_path = os.path.join(FINAL_VG_JSON_PATH, campus_name, 'visao_geral_consolidado.json')
         
@@ -36,6 +39,7 @@ def main():
             
             except Exception as e:
                 print(f"  -> Erro ao processar {campus_name}: {e}")
+                falhas.append(campus_name)
         else:
             print(f"  -> Aviso: Arquivo não encontrado para {campus_name}: {json_path}")
 
@@ -47,8 +51,9 @@ def main():
     from config import JSON_DATA_PATH 
     output_path = os.path.join(JSON_DATA_PATH, 'opcoes_filtro.json')
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(opcoes_filtro, f, ensure_ascii=False, indent=2)
+    write_json(opcoes_filtro, output_path, indent=2)
+    return not falhas
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if not main():
+        sys.exit(1)
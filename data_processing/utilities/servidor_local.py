@@ -0,0 +1,220 @@
+import os
+import sys
+import shutil
+import zipfile
+import argparse
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+# Servidor HTTP local no lugar do INEP, para testar o utilities/download_data.py sem a rede:
+# serve os arquivos de uma pasta com Range, If-Range e ETag, e pode derrubar a conexão no meio da
+# primeira resposta de cada arquivo (--cortar-apos) para exercitar a retomada do download.
+# Uso (a partir de data_processing):
+#   python -m utilities.servidor_local --pasta <pasta com os zips> --porta 8000 [--cortar-apos 500000]
+#   python -m utilities.download_data --url-base http://127.0.0.1:8000
+# Ou, com zips gerados na hora e conferência automática: python -m utilities.servidor_local --verificar
+
+BUFFER = 64 * 1024
+
+
+class ArquivoHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.responder(corpo=False)
+
+    def do_GET(self):
+        self.responder(corpo=True)
+
+    def responder(self, corpo):
+        servidor = self.server
+        nome = os.path.basename(self.path.split('?', 1)[0])
+        path = os.path.join(servidor.pasta, nome)
+        if not nome or not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        stat = os.stat(path)
+        tamanho = stat.st_size
+        etag = f'"{tamanho:x}-{int(stat.st_mtime_ns):x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        inicio = 0
+        faixa = self.headers.get('Range', '')
+        if_range = self.headers.get('If-Range')
+        if faixa.startswith('bytes=') and (not if_range or if_range in (etag, last_modified)):
+            inicio = int(faixa[len('bytes='):].split('-', 1)[0] or 0)
+
+        with servidor.trava:
+            servidor.requisicoes.append((self.command, nome, inicio))
+            cortar = corpo and servidor.cortar_apos is not None and nome not in servidor.cortados
+            if cortar:
+                servidor.cortados.add(nome)
+
+        if inicio >= tamanho > 0:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{tamanho}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(206 if inicio else 200)
+        if inicio:
+            self.send_header('Content-Range', f'bytes {inicio}-{tamanho - 1}/{tamanho}')
+        self.send_header('Content-Length', str(tamanho - inicio))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        self.end_headers()
+        if not corpo:
+            return
+
+        restante = servidor.cortar_apos if cortar else tamanho - inicio
+        with open(path, 'rb') as f:
+            f.seek(inicio)
+            while restante > 0:
+                bloco = f.read(min(BUFFER, restante))
+                if not bloco:
+                    break
+                self.wfile.write(bloco)
+                restante -= len(bloco)
+        if cortar:
+            # Conexão derrubada no meio do corpo: o cliente recebe menos bytes que o Content-Length
+            self.close_connection = True
+            self.wfile.flush()
+            self.connection.shutdown(2)
+
+
+def iniciar_servidor(pasta, porta=0, cortar_apos=None):
+    # (servidor, url_base) com o servidor rodando em uma thread; pare com servidor.shutdown()
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), ArquivoHandler)
+    servidor.daemon_threads = True
+    servidor.pasta = os.path.abspath(pasta)
+    servidor.cortar_apos = cortar_apos
+    servidor.cortados = set()
+    servidor.requisicoes = []
+    servidor.trava = threading.Lock()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+def gerar_zip(path, year, tamanho, seed):
+    # Zip sem compressão com um arq1 de bytes aleatórios, no layout de pastas dos microdados
+    conteudo = np.random.default_rng(seed).integers(0, 256, tamanho, dtype=np.uint8).tobytes()
+    membro = f'microdados_Enade_{year}/2.DADOS/microdados{year}_arq1.txt'
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as zip_ref:
+        zip_ref.writestr(membro, conteudo)
+    return membro, conteudo
+
+
+def verificar(anos, tamanho, cortar_apos, manter=False):
+    from config import URLS, RAW_DATA_PATH, DOWNLOAD_MANIFEST_PATH
+    from utilities import download_data
+
+    workdir = tempfile.mkdtemp(prefix='enade_download_')
+    cwd_original = os.getcwd()
+    erros = []
+
+    def conferir(condicao, mensagem):
+        print(f"   -> {'OK' if condicao else 'ERRO'}: {mensagem}")
+        if not condicao:
+            erros.append(mensagem)
+
+    try:
+        # Os caminhos do config são relativos a 'data', então o download roda dentro da pasta temporária
+        os.chdir(workdir)
+        pasta_servida = os.path.join(workdir, 'servidor')
+        os.makedirs(pasta_servida)
+
+        servidor, url_base = iniciar_servidor(pasta_servida, cortar_apos=cortar_apos)
+        urls = download_data.urls_com_base(url_base, {year: URLS[year] for year in anos})
+        esperados = {}
+        for i, (year, url) in enumerate(urls.items()):
+            esperados[year] = gerar_zip(os.path.join(pasta_servida, os.path.basename(url)), year, tamanho, seed=i)
+        print(f"Servindo {len(urls)} arquivos de {tamanho} bytes em {url_base} (conexão cortada após {cortar_apos} bytes)")
+
+        print("\n>> Primeiro download (com a conexão derrubada no meio)...")
+        conferir(download_data.main(workers=len(urls), urls=urls, extrair=True), "download e extração concluídos")
+        retomados = [r for r in servidor.requisicoes if r[0] == 'GET' and r[2] > 0]
+        conferir(len(retomados) == len(urls), f"{len(retomados)} downloads retomados com Range")
+        manifesto = download_data.carregar_manifesto(DOWNLOAD_MANIFEST_PATH)
+        for year, (membro, conteudo) in esperados.items():
+            extraido = os.path.join(RAW_DATA_PATH, f'enade_{year}', membro)
+            with open(extraido, 'rb') as f:
+                conferir(f.read() == conteudo, f"{year}: conteúdo extraído igual ao servido")
+            registro = manifesto.get(year, {})
+            archive = download_data.nome_arquivo(year, urls[year])
+            conferir(registro.get('sha256') == download_data.sha256_arquivo(archive), f"{year}: sha256 no manifesto")
+
+        print("\n>> Segunda execução (nada a baixar nem a conferir pelo sha256)...")
+        servidor.requisicoes.clear()
+        calculos = []
+        sha256_original = download_data.sha256_arquivo
+        download_data.sha256_arquivo = lambda path: calculos.append(path) or sha256_original(path)
+        try:
+            conferir(download_data.main(workers=len(urls), urls=urls, extrair=True), "execução concluída")
+        finally:
+            download_data.sha256_arquivo = sha256_original
+        conferir(not servidor.requisicoes, f"{len(servidor.requisicoes)} requisições ao servidor")
+        conferir(not calculos, f"{len(calculos)} arquivos com o sha256 recalculado")
+
+        print("\n>> Arquivo local truncado...")
+        year = anos[0]
+        archive = download_data.nome_arquivo(year, urls[year])
+        with open(archive, 'r+b') as f:
+            f.truncate(tamanho // 2)
+        servidor.requisicoes.clear()
+        conferir(download_data.main(workers=1, anos=[year], urls=urls, extrair=True), "execução concluída")
+        conferir(any(r[0] == 'GET' for r in servidor.requisicoes), f"{year} baixado de novo")
+        conferir(download_data.sha256_arquivo(archive) == manifesto[year]['sha256'], f"{year}: arquivo restaurado")
+
+        servidor.shutdown()
+        servidor.server_close()
+    finally:
+        os.chdir(cwd_original)
+        if manter:
+            print(f"\nDados mantidos em '{workdir}'")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if erros:
+        print(f"\nERRO: {len(erros)} verificações falharam.")
+        return False
+    print("\nDownloader conferido contra o servidor local.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP local para testar o download dos microdados")
+    parser.add_argument('--pasta', help="Pasta com os arquivos servidos")
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--cortar-apos', type=int, help="Derruba a primeira resposta de cada arquivo após este número de bytes")
+    parser.add_argument('--verificar', action='store_true', help="Gera zips sintéticos e confere o download_data contra o servidor")
+    parser.add_argument('--anos', nargs='+', default=['2021', '2023'], help="Anos usados na verificação (URLs .zip)")
+    parser.add_argument('--tamanho', type=int, default=3 * 1024 * 1024, help="Bytes do arq1 de cada zip da verificação")
+    parser.add_argument('--manter', action='store_true', help="Não apaga a pasta temporária da verificação")
+    args = parser.parse_args()
+
+    if args.verificar:
+        cortar_apos = args.cortar_apos if args.cortar_apos is not None else args.tamanho // 3
+        if not verificar(args.anos, args.tamanho, cortar_apos, args.manter):
+            sys.exit(1)
+        return
+
+    if not args.pasta or not os.path.isdir(args.pasta):
+        parser.error("--pasta precisa ser uma pasta existente (ou use --verificar)")
+    servidor, url_base = iniciar_servidor(args.pasta, args.porta, args.cortar_apos)
+    print(f"Servindo '{args.pasta}' em {url_base} (Ctrl+C para encerrar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,30 @@ import pandas as pd
 import os
 import glob
 import json
+import gzip
 import math
-from collections import defaultdict
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 from tqdm import tqdm
-from config import CURSOS_CSV_PATH
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from config import (
+    CURSOS_CSV_PATH, RAW_DATA_PATH, CACHE_DATA_PATH, USE_PARQUET_CACHE,
+    JSON_SHARDS, JSON_SHARDS_DIRNAME, JSON_PRECOMPRESS, JSON_OUTPUT_MODE, JSON_USE_ORJSON
+)
+from manifesto import hash_valor
+import catalogo
+import compactados
+import tipos
+from instrumentacao import instrumentar, contar_linhas, registrar_leitura, anotar
+from pontuacao import (
+    AcumuladorCompetencias, acumular_chunk, empacotar_respostas, MapeamentoCompetencias
+)
 
 def safe_numeric_convert(series):
     if series.dtype == 'object':
@@ -14,6 +33,52 @@ def safe_numeric_convert(series):
     return pd.to_numeric(series, errors='coerce')
 
 
+# Desligadas nos processos de trabalho de run_parallel para não intercalar barras no terminal
+_PROGRESS_BARS = True
+
+
+def progress(iterable, **kwargs):
+    return tqdm(iterable, disable=not _PROGRESS_BARS, **kwargs)
+
+
+def _init_worker():
+    global _PROGRESS_BARS
+    _PROGRESS_BARS = False
+
+
+def _run_task(func, args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return resultado, os.getpid(), time.perf_counter() - inicio
+
+
+def run_parallel(func, tasks, workers, desc):
+    # tasks: lista de (rótulo, args). Executa func(*args) em um pool de processos e
+    # devolve os resultados na mesma ordem das tarefas; workers <= 1 roda no próprio processo.
+    if workers <= 1 or len(tasks) <= 1:
+        return [func(*args) for _, args in tasks]
+
+    resultados = [None] * len(tasks)
+    print(f"--- {desc}: {len(tasks)} tarefas em {min(workers, len(tasks))} processos")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futuros = {executor.submit(_run_task, func, args): i for i, (_, args) in enumerate(tasks)}
+        for n, futuro in enumerate(as_completed(futuros), start=1):
+            rotulo = tasks[futuros[futuro]][0]
+            try:
+                resultados[futuros[futuro]], pid, duracao = futuro.result()
+                print(f"   -> [{desc} {n}/{len(tasks)}] {rotulo} concluído (processo {pid}, {duracao:.1f}s)")
+            except Exception as e:
+                print(f"   -> [{desc} {n}/{len(tasks)}] ERRO em {rotulo}: {e}")
+    return resultados
+
+
+def workers_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Número de processos para executar os anos em paralelo (padrão: 1)")
+    return parser
+
+
 def safe_number(x):
     if x is None:
         return None
@@ -25,8 +90,18 @@ def safe_number(x):
 def find_data_files(year_path):
     print(f"--- Buscando arquivos em: {year_path}")
     if not os.path.exists(year_path):
-        print(f"   -> ERRO: O caminho base não existe: {year_path}")
-        return []
+        # Sem a pasta extraída, lê os membros direto do zip/rar baixado (compactados.py)
+        arquivo = compactados.arquivo_do_ano(year_path)
+        if arquivo is None:
+            print(f"   -> ERRO: O caminho base não existe: {year_path}")
+            return []
+        try:
+            membros = compactados.membros_dados(arquivo)
+        except Exception as e:
+            print(f"   -> ERRO ao listar os arquivos de {arquivo}: {e}")
+            return []
+        if not membros: print(f"   -> AVISO: Nenhum arquivo de dados encontrado em {arquivo}.")
+        return [compactados.caminho_membro(arquivo, membro) for membro in membros]
     search_patterns = [
         os.path.join(year_path, '**', '2.DADOS', '*.txt'),
         os.path.join(year_path, '**', '2.DADOS', '*.csv'),
@@ -40,7 +115,55 @@ def find_data_files(year_path):
         files = glob.glob(pattern, recursive=True)
         if files: found_files.extend(files)
     if not found_files: print(f"   -> AVISO: Nenhum arquivo de dados encontrado para {year_path}.")
-    return found_files
+    # Ordem estável (arq1, arq2, arq3...): quem usa o primeiro arquivo espera o de informações do curso
+    return sorted(found_files)
+
+
+def normalize_column_name(col):
+    return col.strip().strip('"').upper()
+
+
+def get_parquet_cache_path(file_path):
+    # Membros de um zip/rar usam o mesmo cache do arquivo extraído
+    relative_path = os.path.relpath(compactados.caminho_extraido(file_path), RAW_DATA_PATH)
+    return os.path.join(CACHE_DATA_PATH, os.path.splitext(relative_path)[0] + '.parquet')
+
+
+def get_fresh_parquet_cache(file_path):
+    if not USE_PARQUET_CACHE:
+        return None
+    cache_path = get_parquet_cache_path(file_path)
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= compactados.mtime(file_path):
+        return cache_path
+    return None
+
+
+def read_microdados(file_path, usecols=None, chunksize=None):
+    # Lê um arquivo bruto do INEP; usa o Parquet do cache quando disponível (colunas já tipadas,
+    # nomes normalizados e decimais com vírgula convertidos). Os nomes pedidos em usecols são mantidos.
+    cache_path = get_fresh_parquet_cache(file_path)
+    registrar_leitura(cache_path or file_path)
+    if cache_path:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            cache_path = None
+
+    if not cache_path:
+        return tipos.ler_csv(file_path, 'latin1', usecols=usecols, chunksize=chunksize)
+
+    nomes = {normalize_column_name(col): col for col in usecols} if usecols is not None else {}
+    colunas = list(nomes) if usecols is not None else None
+    parquet_file = pq.ParquetFile(cache_path)
+
+    def to_pandas(tabela):
+        df = tabela.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+        return df.rename(columns=nomes)
+
+    if chunksize:
+        return (to_pandas(pa.Table.from_batches([batch])) for batch in parquet_file.iter_batches(batch_size=chunksize, columns=colunas))
+    return to_pandas(parquet_file.read(columns=colunas))
 
 
 def load_json(file_path):
@@ -56,30 +179,112 @@ def load_json(file_path):
 
 
 def find_required_columns(file_path, required_cols_variants):
-    try:
-        df_header = pd.read_csv(file_path, sep=';', encoding='latin1', low_memory=False, nrows=5)
-        found_cols_map = {}
-        all_found = True
-        for standard_name, variants in required_cols_variants.items():
-            found_variant = next((col for col in df_header.columns if col.upper() in [v.upper() for v in variants]), None)
-            if found_variant:
-                found_cols_map[standard_name] = found_variant
-            else:
-                all_found = False
-                break
-        return found_cols_map if all_found else None
-    except Exception as e:
-        return None
+    # Colunas vêm do catálogo de esquemas (catalogo.py), sem reabrir o arquivo a cada chamada
+    return catalogo.encontrar_colunas(file_path, required_cols_variants)
+
+
+def dumps_json(data, compacto=None, indent=4):
+    if compacto is None:
+        compacto = JSON_OUTPUT_MODE == 'compact'
+    if not compacto:
+        return json.dumps(data, ensure_ascii=False, indent=indent).encode('utf-8')
+
+    if JSON_USE_ORJSON and orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # Tipos que o orjson não conhece (ex.: pd.NA) seguem pelo json da biblioteca padrão
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_json(data, output_path, compacto=None, indent=4):
+    # Grava em um .tmp e renomeia: quem lê o arquivo (ou o data_public_copy) nunca vê um JSON pela metade
+    pasta = os.path.dirname(output_path)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps_json(data, compacto, indent))
+    os.replace(tmp_path, output_path)
+    comprimir_json(output_path)
 
 
 def save_json_safe(data, output_path, description):
     try:
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        write_json(data, output_path)
         print(f"   -> {description} salvos em '{output_path}'")
+        return True
     except Exception as e:
         print(f"   -> ERRO ao salvar {description}: {e}")
+        return False
+
+
+_aviso_brotli = False
+FORMATOS_COMPRESSAO = ('gz', 'br')
+
+def comprimir_json(output_path, formatos=JSON_PRECOMPRESS):
+    # Cópias .gz/.br do arquivo para servidores que entregam o arquivo pré-comprimido. Cópias de formatos
+    # que não foram gerados agora (fora de JSON_PRECOMPRESS ou sem o brotli) são apagadas: ficariam com o
+    # conteúdo antigo e seriam publicadas ao lado do JSON novo
+    gerados = set()
+    conteudo = None
+    for formato in formatos:
+        if conteudo is None:
+            with open(output_path, 'rb') as f:
+                conteudo = f.read()
+        if formato == 'gz':
+            comprimido = gzip.compress(conteudo, compresslevel=9, mtime=0)
+        elif formato == 'br':
+            try:
+                import brotli
+            except ImportError:
+                global _aviso_brotli
+                if not _aviso_brotli:
+                    print("   -> Aviso: pacote brotli não instalado; cópias .br não geradas.")
+                    _aviso_brotli = True
+                continue
+            comprimido = brotli.compress(conteudo)
+        else:
+            continue
+        with open(f"{output_path}.{formato}.tmp", 'wb') as f:
+            f.write(comprimido)
+        os.replace(f"{output_path}.{formato}.tmp", f"{output_path}.{formato}")
+        gerados.add(formato)
+
+    for formato in FORMATOS_COMPRESSAO:
+        if formato not in gerados and os.path.exists(f"{output_path}.{formato}"):
+            os.remove(f"{output_path}.{formato}")
+
+
+def save_json_shards(data_por_curso, output_dir, description):
+    # Um JSON compacto por curso em <output_dir>/cursos/<CO_CURSO>.json e um index.json com os cursos
+    # e o tamanho de cada arquivo. Shards de cursos que saíram do consolidado são apagados.
+    if not JSON_SHARDS:
+        return None
+    shards_dir = os.path.join(output_dir, JSON_SHARDS_DIRNAME)
+    try:
+        os.makedirs(shards_dir, exist_ok=True)
+        indice = {}
+        for co_curso, dados in data_por_curso.items():
+            nome = f"{co_curso}.json"
+            path = os.path.join(shards_dir, nome)
+            write_json(dados, path, compacto=True)
+            indice[str(co_curso)] = {'arquivo': nome, 'bytes': os.path.getsize(path)}
+
+        validos = {info['arquivo'] for info in indice.values()}
+        for nome in os.listdir(shards_dir):
+            base = nome.split('.json')[0]
+            if base != 'index' and f"{base}.json" not in validos:
+                os.remove(os.path.join(shards_dir, nome))
+
+        index_path = os.path.join(shards_dir, 'index.json')
+        write_json({'cursos': indice}, index_path, compacto=True)
+        print(f"   -> {description}: {len(indice)} arquivos por curso em '{shards_dir}'")
+        return index_path
+    except Exception as e:
+        print(f"   -> ERRO ao salvar arquivos por curso de {description}: {e}")
+        return None
 
 
 def get_relevant_grupos():
@@ -97,7 +302,8 @@ def get_relevant_grupos():
         return None
 
 
-def get_filtered_student_map_from_microdados(all_raw_files, info_cols, filter_col, filter_val, relevant_grupos):
+def ler_info_microdados(all_raw_files, info_cols):
+    # (df_info, {nome padrão: nome real}) do primeiro arquivo com todas as colunas pedidas (o arq1)
     info_file_path, info_cols_map = None, None
     
     for file in all_raw_files:
@@ -111,25 +317,25 @@ def get_filtered_student_map_from_microdados(all_raw_files, info_cols, filter_co
         print(f"   -> ERRO CRÍTICO: Não foi possível encontrar arquivo de info.")
         return None, None
 
+    try:
+        df_info = read_microdados(info_file_path, usecols=list(dict.fromkeys(info_cols_map.values())))
+        for col in info_cols_map.values():
+            df_info[col] = pd.to_numeric(df_info[col], errors='coerce')
+        df_info.dropna(subset=[info_cols_map['CO_CURSO'], info_cols_map['CO_GRUPO']], inplace=True)
+        return df_info, info_cols_map
+
+    except Exception as e:
+        print(f"   -> ERRO ao ler arquivo de info: {e}")
+        return None, None
+
+
+def filtrar_mapa_info(df_info, info_cols_map, filter_col, filter_val, relevant_grupos):
     real_col = lambda key: info_cols_map.get(key)
     col_info_curso = real_col('CO_CURSO')
     col_info_grupo = real_col('CO_GRUPO')
     col_filter_real = real_col(filter_col)
-    
-    usecols_info = [col_info_curso, col_info_grupo]
-    if col_filter_real:
-        usecols_info.append(col_filter_real)
 
     try:
-        df_info = pd.read_csv(info_file_path, sep=';', encoding='latin1', low_memory=False, usecols=usecols_info)
-        
-        df_info[col_info_curso] = pd.to_numeric(df_info[col_info_curso], errors='coerce')
-        df_info[col_info_grupo] = pd.to_numeric(df_info[col_info_grupo], errors='coerce')
-        if col_filter_real:
-            df_info[col_filter_real] = pd.to_numeric(df_info[col_filter_real], errors='coerce')
-
-        df_info.dropna(subset=[col_info_curso, col_info_grupo], inplace=True)
-        
         if col_filter_real and filter_val is not None:
             df_info_filtered_geo = df_info[df_info[col_filter_real] == filter_val]
         else:
@@ -137,11 +343,11 @@ def get_filtered_student_map_from_microdados(all_raw_files, info_cols, filter_co
 
         df_info_filtered = df_info_filtered_geo[df_info_filtered_geo[col_info_grupo].isin(relevant_grupos)]
 
-        df_info_map = df_info_filtered.rename(columns={
+        df_info_map = df_info_filtered[[col_info_curso, col_info_grupo]].rename(columns={
             col_info_curso: 'CO_CURSO',
             col_info_grupo: 'CO_GRUPO'
         })
-        df_info_map = df_info_map.drop_duplicates(subset=['CO_CURSO'], keep='first')[['CO_CURSO', 'CO_GRUPO']]
+        df_info_map = df_info_map.drop_duplicates(subset=['CO_CURSO'], keep='first')
         
         relevant_cursos_list = df_info_map['CO_CURSO'].astype('Int64').unique().tolist()
         curso_para_grupo_map = pd.Series(df_info_map.CO_GRUPO.astype(int).astype(str).values, index=df_info_map.CO_CURSO).to_dict()
@@ -149,10 +355,17 @@ def get_filtered_student_map_from_microdados(all_raw_files, info_cols, filter_co
         return curso_para_grupo_map, relevant_cursos_list
 
     except Exception as e:
-        print(f"   -> ERRO ao ler e filtrar arquivo de info: {e}")
+        print(f"   -> ERRO ao filtrar arquivo de info: {e}")
         return None, None
 
 
+def get_filtered_student_map_from_microdados(all_raw_files, info_cols, filter_col, filter_val, relevant_grupos):
+    df_info, info_cols_map = ler_info_microdados(all_raw_files, info_cols)
+    if df_info is None:
+        return None, None
+    return filtrar_mapa_info(df_info, info_cols_map, filter_col, filter_val, relevant_grupos)
+
+
 def get_curso_info_map_from_csv():
     if not os.path.exists(CURSOS_CSV_PATH):
         print(f"ERRO: Arquivo '{CURSOS_CSV_PATH}' não encontrado.")
@@ -176,24 +389,61 @@ def get_curso_info_map_from_csv():
         return None, None
 
 
+def formatar_medias_competencia(comps, json_suffix):
+    medias = {}
+    for comp, data in comps.items():
+        perc_obj = (data['obj_acertos'] / data['obj_validas'] * 100) if data['obj_validas'] > 0 else None
+        media_disc = (data['disc_soma'] / data['disc_cont']) if data['disc_cont'] > 0 else None
+        medias[comp] = {
+            f"percentual_objetivas_{json_suffix}": round(perc_obj, 2) if perc_obj is not None else None,
+            f"media_discursivas_{json_suffix}": round(media_disc, 2) if media_disc is not None else None
+        }
+    return medias
+
+
+def hash_mapas_ano(maps, year):
+    # Só a fatia do ano entra no hash: corrigir o mapeamento de 2019 não invalida os outros anos
+    ano_str = str(year)
+    return hash_valor({
+        'ce': {
+            co_grupo: [map_grupo.get('Componente_especifico'), map_grupo.get('Anos', {}).get(ano_str)]
+            for co_grupo, map_grupo in maps['ce'].items()
+        },
+        'fg': [item for item in maps['fg'] if str(item.get("ANO")) == ano_str],
+    })
+
+
+def get_competencia_inputs(manifesto, config):
+    return {
+        'microdados': manifesto.hash_arquivos(find_data_files(config['year_path'])),
+        'cursos': manifesto.hash_arquivo(CURSOS_CSV_PATH),
+        'mapas': hash_mapas_ano(config['maps'], config['year']),
+        'escopo': hash_valor([config['filter_col'], config['filter_val'], config['group_by_curso']]),
+    }
+
+
 def calculate_averages_competencia(config):
-    year = config['year']
-    year_path = config['year_path']
-    maps = config['maps']
-    json_suffix = config['json_suffix']
+    resultados = calculate_averages_competencia_escopos([config])
+    if not resultados:
+        return None, None
+    return resultados.get(config['json_suffix'], (None, None))
+
+
+@instrumentar('calculate_averages_competencia')
+def calculate_averages_competencia_escopos(configs):
+    # Calcula as médias de vários escopos (BR, região, UF, UFC...) com uma única leitura do arq3.
+    # Todas as configs devem ser do mesmo ano e compartilhar year_path e maps.
+    year = configs[0]['year']
+    year_path = configs[0]['year_path']
+    maps = configs[0]['maps']
+    sufixos = ', '.join(config['json_suffix'].upper() for config in configs)
+    anotar(year=year, escopos=sufixos)
     
-    print(f"\nCalculando médias para [ {json_suffix.upper()} ] de {year}...")
+    print(f"\nCalculando médias para [ {sufixos} ] de {year}...")
     
     all_raw_files = find_data_files(year_path)
     if not all_raw_files: 
-        return None, None
-
-    info_cols = {
-        'CO_CURSO': ['CO_CURSO', '"CO_CURSO"'],
-        'CO_GRUPO': ['CO_GRUPO', '"CO_GRUPO"'],
-    }
-    if config.get('filter_col'):
-        info_cols[config['filter_col']] = config['info_col_variants']
+        return None
 
     notas_cols = {
         'CO_CURSO': ['CO_CURSO', '"CO_CURSO"'],
@@ -203,28 +453,58 @@ def calculate_averages_competencia(config):
     disc_note_cols_std_ce = [f'NT_CE_D{i}' for i in range(1, 6)]
     disc_note_cols_std_fg = [f'NT_FG_D{i}' for i in range(1, 3)]
 
-    if config['group_by_curso']:
-        curso_para_grupo_map = config['curso_info_map']
-        relevant_cursos_list = config['relevant_cursos_list']
-    else:
-        curso_para_grupo_map, relevant_cursos_list = get_filtered_student_map_from_microdados(
-            all_raw_files, info_cols, 
-            config['filter_col'], config['filter_val'], 
-            config['relevant_grupos']
-        )
-    
-    if not relevant_cursos_list or not curso_para_grupo_map:
-        print(f"   -> Aviso: Nenhum curso relevante encontrado para [ {json_suffix.upper()} ] em {year}.")
-        return None, None
+    # O arq1 é lido uma vez, com as colunas de filtro de todos os escopos, e filtrado por escopo
+    info_cols = {
+        'CO_CURSO': ['CO_CURSO', '"CO_CURSO"'],
+        'CO_GRUPO': ['CO_GRUPO', '"CO_GRUPO"'],
+    }
+    for config in configs:
+        if not config['group_by_curso'] and config.get('filter_col'):
+            info_cols[config['filter_col']] = config['info_col_variants']
+    df_info, info_cols_map = None, None
+    if not all(config['group_by_curso'] for config in configs):
+        df_info, info_cols_map = ler_info_microdados(all_raw_files, info_cols)
+
+    resultados = {}
+    escopos = []
+    for config in configs:
+        json_suffix = config['json_suffix']
+        if config['group_by_curso']:
+            curso_para_grupo_map = config['curso_info_map']
+            relevant_cursos_list = config['relevant_cursos_list']
+        elif df_info is None:
+            curso_para_grupo_map, relevant_cursos_list = None, None
+        else:
+            curso_para_grupo_map, relevant_cursos_list = filtrar_mapa_info(
+                df_info, info_cols_map,
+                config['filter_col'], config['filter_val'], 
+                config['relevant_grupos']
+            )
+        
+        if not relevant_cursos_list or not curso_para_grupo_map:
+            print(f"   -> Aviso: Nenhum curso relevante encontrado para [ {json_suffix.upper()} ] em {year}.")
+            resultados[json_suffix] = (None, None)
+            continue
+
+        escopos.append({
+            'config': config,
+            'curso_para_grupo_map': curso_para_grupo_map,
+            'relevant_cursos_list': relevant_cursos_list,
+            'acumulador_ce': AcumuladorCompetencias(),
+            'acumulador_fg': AcumuladorCompetencias(),
+        })
+
+    if not escopos:
+        return resultados
 
     notas_file_path, notas_cols_map = None, None
     for file in all_raw_files:
         if 'arq3' in os.path.basename(file).lower():
             found_map = find_required_columns(file, notas_cols)
             if found_map:
-                df_header_notas = pd.read_csv(file, sep=';', encoding='latin1', nrows=5)
+                colunas_notas = catalogo.colunas(file)
                 for std_col in disc_note_cols_std_ce + disc_note_cols_std_fg:
-                    match = next((col for col in df_header_notas.columns if col.upper() == std_col), None)
+                    match = next((col for col in colunas_notas if col.upper() == std_col), None)
                     if match: found_map[std_col] = match
                 notas_file_path, notas_cols_map = file, found_map
                 print(f"     -> Arquivo de Notas encontrado: {os.path.basename(notas_file_path)}")
@@ -232,15 +512,25 @@ def calculate_averages_competencia(config):
                 
     if not notas_file_path:
         print(f"   -> ERRO CRÍTICO: Não foi possível encontrar arquivo/colunas de Notas para {year}.")
-        return None, None
+        return None
+
+    # Questões -> competências compiladas uma única vez por grupo
+    mapeamento = MapeamentoCompetencias(maps['ce'], maps['fg'])
+    eventos_fg = mapeamento.fg(year)
+    eventos_ce = lambda co_grupo_str: mapeamento.ce(co_grupo_str, year)
+
+    for escopo in escopos:
+        if escopo['config']['group_by_curso']:
+            mapa = escopo['curso_para_grupo_map']
+            escopo['eventos_ce_por_chave'] = lambda curso, mapa=mapa: eventos_ce(mapa.get(curso))
+        else:
+            escopo['eventos_ce_por_chave'] = eventos_ce
+
+    todos_cursos = set()
+    for escopo in escopos:
+        todos_cursos.update(escopo['relevant_cursos_list'])
+    todos_cursos = list(todos_cursos)
 
-    if config['group_by_curso']:
-        results_agg_ce = defaultdict(lambda: defaultdict(lambda: {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0}))
-        results_agg_fg = defaultdict(lambda: defaultdict(lambda: {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0}))
-    else:
-        results_agg_ce = defaultdict(lambda: defaultdict(lambda: {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0}))
-        results_agg_fg = defaultdict(lambda: {'obj_acertos': 0, 'obj_validas': 0, 'disc_soma': 0.0, 'disc_cont': 0})
-        
     try:
         col_notas_curso = notas_cols_map.get('CO_CURSO')
         col_notas_res_ce = notas_cols_map.get('DS_VT_ACE_OCE')
@@ -250,13 +540,12 @@ def calculate_averages_competencia(config):
                              [notas_cols_map[std] for std in disc_note_cols_std_ce if std in notas_cols_map] + \
                              [notas_cols_map[std] for std in disc_note_cols_std_fg if std in notas_cols_map]
         
-        print(f"   -> Lendo {os.path.basename(notas_file_path)} em chunks (filtrando para {len(relevant_cursos_list)} cursos)...")
-        reader = pd.read_csv(
-            notas_file_path, sep=';', encoding='latin1', low_memory=False, 
-            usecols=cols_to_read_notas, iterator=True, chunksize=500000
-        )
+        print(f"   -> Lendo {os.path.basename(notas_file_path)} em chunks (filtrando para {len(todos_cursos)} cursos)...")
+        reader = read_microdados(notas_file_path, usecols=cols_to_read_notas, chunksize=500000)
 
-        for chunk in tqdm(reader, desc=f"Processando Chunks {year} [{json_suffix.upper()}]"):
+        linhas_processadas = 0
+        for chunk in progress(reader, desc=f"Processando Chunks {year} [{sufixos}]"):
+            contar_linhas(len(chunk))
             chunk_rename_map = {
                 col_notas_curso: 'CO_CURSO',
                 col_notas_res_ce: 'DS_VT_ACE_OCE',
@@ -268,145 +557,63 @@ def calculate_averages_competencia(config):
             chunk['CO_CURSO'] = pd.to_numeric(chunk['CO_CURSO'], errors='coerce').astype('Int64')
             chunk.dropna(subset=['CO_CURSO'], inplace=True)
             
-            chunk_filtered = chunk[chunk['CO_CURSO'].isin(relevant_cursos_list)].copy()
+            chunk_filtered = chunk[chunk['CO_CURSO'].isin(todos_cursos)]
             if chunk_filtered.empty: continue
             
-            chunk_filtered['CO_GRUPO_str'] = chunk_filtered['CO_CURSO'].map(curso_para_grupo_map)
-            chunk_filtered.dropna(subset=['CO_GRUPO_str'], inplace=True)
-            
-            for col in disc_note_cols_std_ce + disc_note_cols_std_fg:
-                if col in chunk_filtered.columns:
-                    if chunk_filtered[col].dtype == 'object':
-                        chunk_filtered.loc[:, col] = chunk_filtered[col].str.replace(',', '.', regex=False)
-                    chunk_filtered.loc[:, col] = pd.to_numeric(chunk_filtered[col], errors='coerce')
-
-            map_fg_ano_obj, map_fg_ano_disc, lista_componentes_fg = {}, {}, []
-            map_ano_fg_data = next((item for item in maps['fg'] if str(item.get("ANO")) == str(year)), None)
-            if map_ano_fg_data:
-                lista_componentes_fg = map_ano_fg_data.get("Formacao_geral", [])
-                map_fg_ano_obj = map_ano_fg_data.get("questoes", {}).get("objetivas", {})
-                map_fg_ano_disc = map_ano_fg_data.get("questoes", {}).get("discursivas", {})
-
-            for index, row in chunk_filtered.iterrows():
-                co_grupo_str = row['CO_GRUPO_str']
-                map_grupo_ce = maps['ce'].get(co_grupo_str, {})
-                lista_componentes_ce = map_grupo_ce.get('Componente_especifico', [])
-                map_ano_ce = map_grupo_ce.get('Anos', {}).get(str(year), {})
-                questoes_ce = map_ano_ce.get('questoes_CE', {})
-                map_obj_ce = questoes_ce.get('objetivas', {})
-                map_disc_ce = questoes_ce.get('discursivas', {})
-                
-                if config['group_by_curso']:
-                    agg_key = row['CO_CURSO']
+            disc_cols_chunk = [col for col in disc_note_cols_std_ce + disc_note_cols_std_fg if col in chunk_filtered.columns]
+            notas_disc = chunk_filtered[disc_cols_chunk].apply(safe_numeric_convert)
+
+            # Respostas empacotadas em bits uma vez por chunk, compartilhadas por todos os escopos
+            respostas_ce = empacotar_respostas(chunk_filtered['DS_VT_ACE_OCE'])
+            if eventos_fg:
+                respostas_fg = empacotar_respostas(chunk_filtered['DS_VT_ACE_OFG'])
+
+            for escopo in escopos:
+                grupos = chunk_filtered['CO_CURSO'].map(escopo['curso_para_grupo_map'])
+                no_escopo = (chunk_filtered['CO_CURSO'].isin(escopo['relevant_cursos_list']) & grupos.notna()).to_numpy(dtype=bool)
+                if not no_escopo.any(): continue
+                posicoes = np.flatnonzero(no_escopo)
+
+                if escopo['config']['group_by_curso']:
+                    chaves = chunk_filtered['CO_CURSO'].to_numpy(dtype=object)[posicoes]
                 else:
-                    agg_key = co_grupo_str
-                
-                respostas_obj_ce = str(row['DS_VT_ACE_OCE']) if pd.notna(row['DS_VT_ACE_OCE']) else ''
-                if len(respostas_obj_ce) >= 27:
-                    for q_key, mapeamento in map_obj_ce.items():
-                        try:
-                            q_index = int(q_key[1:]) - 9
-                            indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                            for idx_1 in indices:
-                                idx_0 = int(idx_1) - 1
-                                if 0 <= idx_0 < len(lista_componentes_ce) and 0 <= q_index < len(respostas_obj_ce):
-                                    comp = lista_componentes_ce[idx_0]
-                                    resp = respostas_obj_ce[q_index]
-                                    if resp in ['0', '1']:
-                                        results_agg_ce[agg_key][comp]['obj_validas'] += 1
-                                        if resp == '1':
-                                            results_agg_ce[agg_key][comp]['obj_acertos'] += 1
-                        except: continue
-                for d_key, mapeamento in map_disc_ce.items():
-                    try:
-                        suffix = int(d_key[1:]) - 2
-                        col_name = f"NT_CE_D{suffix}"
-                        if col_name in row:
-                            indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                            for idx_1 in indices:
-                                idx_0 = int(idx_1) - 1
-                                if 0 <= idx_0 < len(lista_componentes_ce):
-                                    comp = lista_componentes_ce[idx_0]
-                                    nota = row[col_name]
-                                    if pd.notna(nota):
-                                        results_agg_ce[agg_key][comp]['disc_soma'] += nota
-                                        results_agg_ce[agg_key][comp]['disc_cont'] += 1
-                    except: continue
-                
-                if map_ano_fg_data:
-                    respostas_obj_fg = str(row['DS_VT_ACE_OFG']) if pd.notna(row['DS_VT_ACE_OFG']) else ''
-                    if len(respostas_obj_fg) >= 8:
-                        for q_key, mapeamento in map_fg_ano_obj.items():
-                            try:
-                                q_index = int(q_key[1:]) - 1
-                                indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                                for idx_1 in indices:
-                                    idx_0 = int(idx_1) - 1
-                                    if 0 <= idx_0 < len(lista_componentes_fg) and 0 <= q_index < len(respostas_obj_fg):
-                                        comp = lista_componentes_fg[idx_0]
-                                        resp = respostas_obj_fg[q_index]
-                                        if resp in ['0', '1']:
-                                            if config['group_by_curso']:
-                                                results_agg_fg[agg_key][comp]['obj_validas'] += 1
-                                                if resp == '1': results_agg_fg[agg_key][comp]['obj_acertos'] += 1
-                                            else:
-                                                results_agg_fg[comp]['obj_validas'] += 1
-                                                if resp == '1': results_agg_fg[comp]['obj_acertos'] += 1
-                            except: continue
-                    for d_key, mapeamento in map_fg_ano_disc.items():
-                        try:
-                            suffix = int(d_key[1:])
-                            col_name = f"NT_FG_D{suffix}"
-                            if col_name in row:
-                                indices = mapeamento if isinstance(mapeamento, list) else [mapeamento]
-                                for idx_1 in indices:
-                                    idx_0 = int(idx_1) - 1
-                                    if 0 <= idx_0 < len(lista_componentes_fg):
-                                        comp = lista_componentes_fg[idx_0]
-                                        nota = row[col_name]
-                                        if pd.notna(nota):
-                                            if config['group_by_curso']:
-                                                results_agg_fg[agg_key][comp]['disc_soma'] += nota
-                                                results_agg_fg[agg_key][comp]['disc_cont'] += 1
-                                            else:
-                                                results_agg_fg[comp]['disc_soma'] += nota
-                                                results_agg_fg[comp]['disc_cont'] += 1
-                        except: continue
-
-        final_means_ce = {}
-        for key, comps in results_agg_ce.items():
-            final_means_ce[str(key)] = {}
-            for comp, data in comps.items():
-                perc_obj = (data['obj_acertos'] / data['obj_validas'] * 100) if data['obj_validas'] > 0 else None
-                media_disc = (data['disc_soma'] / data['disc_cont']) if data['disc_cont'] > 0 else None
-                final_means_ce[str(key)][comp] = {
-                    f"percentual_objetivas_{json_suffix}": round(perc_obj, 2) if perc_obj is not None else None,
-                    f"media_discursivas_{json_suffix}": round(media_disc, 2) if media_disc is not None else None
-                }
-        
-        final_means_fg = {}
-        if config['group_by_curso']:
-             for key, comps in results_agg_fg.items():
-                final_means_fg[str(key)] = {}
-                for comp, data in comps.items():
-                    perc_obj = (data['obj_acertos'] / data['obj_validas'] * 100) if data['obj_validas'] > 0 else None
-                    media_disc = (data['disc_soma'] / data['disc_cont']) if data['disc_cont'] > 0 else None
-                    final_means_fg[str(key)][comp] = {
-                        f"percentual_objetivas_{json_suffix}": round(perc_obj, 2) if perc_obj is not None else None,
-                        f"media_discursivas_{json_suffix}": round(media_disc, 2) if media_disc is not None else None
-                    }
-        else:
-            for comp, data in results_agg_fg.items():
-                perc_obj = (data['obj_acertos'] / data['obj_validas'] * 100) if data['obj_validas'] > 0 else None
-                media_disc = (data['disc_soma'] / data['disc_cont']) if data['disc_cont'] > 0 else None
-                final_means_fg[comp] = {
-                    f"percentual_objetivas_{json_suffix}": round(perc_obj, 2) if perc_obj is not None else None,
-                    f"media_discursivas_{json_suffix}": round(media_disc, 2) if media_disc is not None else None
+                    chaves = grupos.to_numpy(dtype=object)[posicoes]
+
+                notas_escopo = notas_disc.iloc[posicoes]
+                acumular_chunk(
+                    escopo['acumulador_ce'], chaves, escopo['eventos_ce_por_chave'],
+                    respostas_ce[posicoes], notas_escopo, linhas_processadas + posicoes
+                )
+
+                if eventos_fg:
+                    chaves_fg = chaves if escopo['config']['group_by_curso'] else np.full(len(chaves), 'FG', dtype=object)
+                    acumular_chunk(
+                        escopo['acumulador_fg'], chaves_fg, lambda chave: eventos_fg,
+                        respostas_fg[posicoes], notas_escopo, linhas_processadas + posicoes
+                    )
+
+            linhas_processadas += len(chunk_filtered)
+
+        for escopo in escopos:
+            json_suffix = escopo['config']['json_suffix']
+            final_means_ce = {
+                str(key): formatar_medias_competencia(comps, json_suffix)
+                for key, comps in escopo['acumulador_ce'].resultados().items()
+            }
+
+            resultados_fg = escopo['acumulador_fg'].resultados()
+            if escopo['config']['group_by_curso']:
+                final_means_fg = {
+                    str(key): formatar_medias_competencia(comps, json_suffix)
+                    for key, comps in resultados_fg.items()
                 }
-        
-        print(f"   -> Médias [ {json_suffix.upper()} ] (chunks) calculadas para {year}.")
-        return final_means_ce, final_means_fg
+            else:
+                final_means_fg = formatar_medias_competencia(resultados_fg.get('FG', {}), json_suffix)
+            
+            print(f"   -> Médias [ {json_suffix.upper()} ] (chunks) calculadas para {year}.")
+            resultados[json_suffix] = (final_means_ce, final_means_fg)
+        return resultados
 
     except Exception as e:
-        print(f"   -> ERRO GERAL ao processar médias [ {json_suffix.upper()} ] de {year}: {e}")
-        return None, None
\ No newline at end of file
+        print(f"   -> ERRO GERAL ao processar médias [ {sufixos} ] de {year}: {e}")
+        return None
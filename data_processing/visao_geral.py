@@ -1,14 +1,19 @@
 import pandas as pd
 import os
+import sys
 import glob
 import json
 from collections import defaultdict
-from utils import safe_numeric_convert
+from utils import run_parallel, workers_parser, save_json_shards, write_json
+from manifesto import Manifesto, hash_valor
+from registros import ler_notas
+from tipos import ler_csv
+from instrumentacao import instrumentar, contar_linhas, registrar_leitura
 
-from config import PROCESSED_DATA_PATH, YEARS_TO_PROCESS, FINAL_VG_JSON_PATH, CURSO_MAP, FINAL_MEDIA_JSON_PATH
+from config import PROCESSED_DATA_PATH, YEARS_TO_PROCESS, FINAL_VG_JSON_PATH, CURSO_MAP, JSON_SHARDS
 
 # Importando a saída de get_media_VG_agregadas.py
-MEDIAS_AGREGADAS_PATH = os.path.join(FINAL_MEDIA_JSON_PATH, 'Visao_Geral', 'medias_agregadas_geral.json')
+MEDIAS_AGREGADAS_PATH = os.path.join(FINAL_VG_JSON_PATH, 'medias_agregadas_geral.json')
 CURSOS_CSV_PATH = os.path.join('data', 'cursos_ufc.csv')
 
 BASE_OUTPUT_PATH = os.path.join(FINAL_VG_JSON_PATH)
@@ -37,22 +42,24 @@ def load_course_metadata():
          print(f"Erro ao ler metadados dos cursos: {e}")
          return {}
 
+@instrumentar('visao_geral', 'campus_name', 'year')
 def process_year_data(campus_path, campus_name, year, medias_agregadas_map, curso_grupo_map):
     print(f"  -> Processando ano {year}...")
     
-    # Carrega o arq3 referente as notas
-    notas_file_path = glob.glob(os.path.join(campus_path, '*arq3.csv'))
-    if not notas_file_path:
-        print(f"     Aviso: arq3.csv não encontrado em {campus_path}.")
-        return None
-
     try:
-        df_notas = pd.read_csv(notas_file_path[0], sep=';', encoding='utf-8', low_memory=False)
-        df_notas.columns = [col.upper() for col in df_notas.columns]
+        # Notas do store de registros (já numéricas) ou, sem ele, do arq3 processado
+        df_notas = ler_notas(campus_name, year)
+        if df_notas is None:
+            notas_file_path = glob.glob(os.path.join(campus_path, '*arq3.csv'))
+            if not notas_file_path:
+                print(f"     Aviso: arq3.csv não encontrado em {campus_path}.")
+                return None
 
-        colunas_notas = ['NT_GER', 'NT_FG', 'NT_CE']
-        for col in colunas_notas:
-             df_notas[col] = safe_numeric_convert(df_notas[col])
+            registrar_leitura(notas_file_path[0])
+            df_notas = ler_csv(notas_file_path[0], 'utf-8')
+            df_notas.columns = [col.upper() for col in df_notas.columns]
+
+        contar_linhas(len(df_notas))
 
         # Agregação das notas por CO_CURSO
         analise = df_notas.groupby('CO_CURSO').agg(
@@ -105,7 +112,7 @@ def process_year_data(campus_path, campus_name, year, medias_agregadas_map, curs
         print(f"     ERRO ao processar DataFrame {campus_name}/{year}: {e}")
         return None
 
-def main():
+def main(workers=1):
     print("--- INICIANDO CONSOLIDAÇÃO DE VISÃO GERAL ---")
     
     # Carrega metadados globais
@@ -114,13 +121,49 @@ def main():
 
     if not medias_agregadas_map or not curso_grupo_map:
         print("Encerrando: Faltando arquivos de médias agregadas ou metadados de cursos.")
-        return
+        return False
 
     # Garante que a pasta de saída existe
     os.makedirs(BASE_OUTPUT_PATH, exist_ok=True)
     
     campus_folders = [d for d in os.listdir(PROCESSED_DATA_PATH) if os.path.isdir(os.path.join(PROCESSED_DATA_PATH, d))]
 
+    # Campi cujas notas, médias agregadas e metadados não mudaram mantêm o consolidado atual
+    manifesto = Manifesto()
+    entradas_por_campus = {}
+    for campus_name in campus_folders:
+        entradas = {
+            'notas': manifesto.hash_arquivos([
+                path for year in YEARS_TO_PROCESS
+                for path in glob.glob(os.path.join(PROCESSED_DATA_PATH, campus_name, str(year), '*arq3.csv'))
+            ]),
+            'medias_agregadas': manifesto.hash_arquivo(MEDIAS_AGREGADAS_PATH),
+            'cursos': manifesto.hash_arquivo(CURSOS_CSV_PATH),
+            'constantes': hash_valor([YEARS_TO_PROCESS, CURSO_MAP]),
+            'shards': JSON_SHARDS,
+        }
+        if manifesto.atualizado(f"visao_geral/{campus_name}", entradas):
+            print(f"Visão Geral de {campus_name} já atualizada. Pulando.")
+            continue
+        entradas_por_campus[campus_name] = entradas
+    campus_folders = list(entradas_por_campus)
+
+    # Cada par campus x ano é independente
+    unidades = []
+    for campus_name in campus_folders:
+        for year in YEARS_TO_PROCESS:
+            campus_year_path = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year))
+            if os.path.exists(campus_year_path):
+                unidades.append((campus_name, str(year), campus_year_path))
+
+    tasks = [
+        (f"{campus_name}/{year}", (campus_year_path, campus_name, year, medias_agregadas_map, curso_grupo_map))
+        for campus_name, year, campus_year_path in unidades
+    ]
+    resultados = run_parallel(process_year_data, tasks, workers, "Visão Geral")
+    df_por_unidade = {(campus_name, year): df for (campus_name, year, _), df in zip(unidades, resultados)}
+
+    falhas = []
     for campus_name in campus_folders:
         print(f"\nIniciando Campus: {campus_name}")
         
@@ -128,20 +171,16 @@ def main():
         campus_consolidated = defaultdict(dict)
         
         for year in YEARS_TO_PROCESS:
-            campus_year_path = os.path.join(PROCESSED_DATA_PATH, campus_name, str(year))
-            
-            if os.path.exists(campus_year_path):
-                # Processa os dados deste ano
-                df_year = process_year_data(campus_year_path, campus_name, str(year), medias_agregadas_map, curso_grupo_map)
+            df_year = df_por_unidade.get((campus_name, str(year)))
+                
+            if df_year is not None and not df_year.empty:
+                # Converte para lista de dicionários
+                records = df_year.to_dict(orient='records')
                 
-                if df_year is not None and not df_year.empty:
-                    # Converte para lista de dicionários
-                    records = df_year.to_dict(orient='records')
-                    
-                    # Acumula na estrutura consolidada
-                    for row in records:
-                        co_curso = str(row['CO_CURSO'])
-                        campus_consolidated[co_curso][str(year)] = row
+                # Acumula na estrutura consolidada
+                for row in records:
+                    co_curso = str(row['CO_CURSO'])
+                    campus_consolidated[co_curso][str(year)] = row
 
         # Salva o arquivo consolidado do Campus se houver dados
         if campus_consolidated:
@@ -150,12 +189,20 @@ def main():
             
             output_path = os.path.join(output_dir, 'visao_geral_consolidado.json')
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(campus_consolidated, f, indent=4, ensure_ascii=False)
+            write_json(campus_consolidated, output_path)
             
             print(f"Sucesso! Arquivo consolidado salvo em: {output_path}")
+            index_path = save_json_shards(campus_consolidated, output_dir, f"Visão Geral {campus_name}")
+            saidas = [output_path] + ([index_path] if index_path else [])
+            manifesto.registrar(f"visao_geral/{campus_name}", entradas_por_campus[campus_name], saidas)
         else:
-            print(f"Aviso: Nenhum dado processado para {campus_name}.")
+            print(f"ERRO: Nenhum dado processado para {campus_name}.")
+            falhas.append(campus_name)
+
+    manifesto.salvar()
+    return not falhas
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    args = workers_parser("Consolidação da Visão Geral por campus").parse_args()
+    if not main(workers=args.workers):
+        sys.exit(1)
\ No newline at end of file
@@ -1,28 +1,123 @@
 import os
+import sys
+import json
 import shutil
+import hashlib
 
 origem = os.path.join('data_processing', 'data', 'json')
 destino = os.path.join('frontend', 'public', 'data')
 
-pastas_desejadas = ['Desempenho_Topico', 'Visao_Geral', 'Evolucao_Historica', 'Analise_Perfil']
+pastas_desejadas = ['Desempenho_Topico', 'Visao_Geral', 'Evolucao_Historica', 'Analise_Perfil', 'Desempenho_Perfil']
+arquivos_avulsos = ['opcoes_filtro.json']
+
+# Publicação incremental: cada arquivo vai para o destino com o hash do conteúdo no nome
+# (visao_geral_consolidado.<hash>.json), então arquivos que não mudaram não são copiados de novo e
+# podem ser servidos com cache longo. O manifest.json (caminho lógico -> arquivo publicado) é trocado
+# de uma vez com os.replace; o frontend o lê para montar as URLs. Os arquivos da publicação anterior
+# ficam até a próxima, para quem ainda estiver com o manifesto antigo aberto.
+MANIFESTO = 'manifest.json'
+COMPRIMIDOS = ('.gz', '.br')
+TAMANHO_HASH = 12
+
+
+def sha256_arquivo(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def nome_publicado(relativo, digest):
+    base, extensao = os.path.splitext(relativo)
+    return f"{base}.{digest[:TAMANHO_HASH]}{extensao}"
+
+def arquivos_origem():
+    # Caminhos relativos (com '/') dos JSON a publicar; as cópias .gz/.br acompanham o JSON
+    for pasta in pastas_desejadas:
+        for raiz, pastas, arquivos in os.walk(os.path.join(origem, pasta)):
+            pastas.sort()
+            for arquivo in sorted(arquivos):
+                if arquivo.endswith('.json'):
+                    yield os.path.relpath(os.path.join(raiz, arquivo), origem).replace(os.sep, '/')
+    for arquivo in arquivos_avulsos:
+        if os.path.exists(os.path.join(origem, arquivo)):
+            yield arquivo
+
+def carregar_manifesto():
+    try:
+        with open(os.path.join(destino, MANIFESTO), 'r', encoding='utf-8') as f:
+            return json.load(f).get('arquivos', {})
+    except Exception:
+        return {}
+
+def copiar(src, dst):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    shutil.copy2(src, dst + '.tmp')
+    os.replace(dst + '.tmp', dst)
+
+def remover_antigos(manter):
+    # Só mexe no que o script publica (as pastas desejadas e os arquivos avulsos), nunca no resto do destino
+    removidos = 0
+    candidatos = []
+    for pasta in pastas_desejadas:
+        for raiz, _, arquivos in os.walk(os.path.join(destino, pasta)):
+            candidatos.extend(os.path.join(raiz, arquivo) for arquivo in arquivos)
+    for arquivo in arquivos_avulsos:
+        base = os.path.splitext(arquivo)[0]
+        candidatos.extend(
+            os.path.join(destino, nome) for nome in os.listdir(destino)
+            if nome == arquivo or nome.startswith(base + '.')
+        )
+
+    for path in candidatos:
+        relativo = os.path.relpath(path, destino).replace(os.sep, '/')
+        if relativo.endswith(COMPRIMIDOS):
+            relativo = os.path.splitext(relativo)[0]
+        if relativo not in manter:
+            os.remove(path)
+            removidos += 1
+
+    for pasta in pastas_desejadas:
+        for raiz, _, _ in sorted(os.walk(os.path.join(destino, pasta)), reverse=True):
+            if not os.listdir(raiz):
+                os.rmdir(raiz)
+    return removidos
 
 def main():
     print(f"Origem: {origem}")
     print(f"Destino: {destino}")
 
-    if os.path.exists(destino):
-        shutil.rmtree(destino)
+    # Sem uma das pastas na origem, a publicação apagaria os arquivos dela no destino
+    ausentes = [pasta for pasta in pastas_desejadas if not os.path.isdir(os.path.join(origem, pasta))]
+    if ausentes:
+        print(f"ERRO: Pastas não encontradas na origem: {', '.join(ausentes)}. Nada publicado.")
+        return False
 
     os.makedirs(destino, exist_ok=True)
+    anterior = carregar_manifesto()
 
-    for pasta in pastas_desejadas:
-        origem_pasta = os.path.join(origem, pasta)
-        destino_pasta = os.path.join(destino, pasta)
+    arquivos, copiados = {}, 0
+    for relativo in arquivos_origem():
+        src = os.path.join(origem, relativo)
+        publicado = nome_publicado(relativo, sha256_arquivo(src))
+        arquivos[relativo] = publicado
+
+        sufixos = [''] + [sufixo for sufixo in COMPRIMIDOS if os.path.exists(src + sufixo)]
+        for sufixo in sufixos:
+            dst = os.path.join(destino, publicado + sufixo)
+            if not os.path.exists(dst):
+                copiar(src + sufixo, dst)
+                copiados += 1
+
+    manifesto_path = os.path.join(destino, MANIFESTO)
+    with open(manifesto_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'arquivos': arquivos}, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(manifesto_path + '.tmp', manifesto_path)
 
-        if os.path.exists(origem_pasta):
-            shutil.copytree(origem_pasta, destino_pasta)
-    
-    shutil.copy2(os.path.join(origem, 'opcoes_filtro.json'), os.path.join(destino, 'opcoes_filtro.json'))
+    removidos = remover_antigos(set(arquivos.values()) | set(anterior.values()))
+    print(f"{len(arquivos)} arquivos publicados: {copiados} copiados, {removidos} removidos.")
+    return True
 
 if __name__ == '__main__':
-    main()
+    if not main():
+        sys.exit(1)
@@ -29,6 +29,66 @@ export const ehClient = axios.create({
   baseURL: EH_BASE_URL,
 });
 
+// O data_public_copy.py publica cada arquivo com o hash do conteúdo no nome e um manifest.json
+// (caminho lógico -> arquivo publicado). Sem manifesto, os caminhos lógicos são usados direto.
+let publishManifest = null;
+
+const getPublishManifest = () => {
+  if (!publishManifest) {
+    publishManifest = axios
+      .get(`${API_DATA_URL}/manifest.json`, { headers: { 'Cache-Control': 'no-cache' } })
+      .then((response) => (response.data && typeof response.data === 'object' ? response.data.arquivos : null))
+      .catch(() => null);
+  }
+  return publishManifest;
+};
+
+const resolvePublishedUrl = async (config) => {
+  const arquivos = await getPublishManifest();
+  if (!arquivos) return config;
+
+  const prefix = config.baseURL.slice(API_DATA_URL.length).replace(/^\//, '');
+  const logicalPath = prefix ? `${prefix}/${config.url}` : config.url;
+  const publishedPath = arquivos[logicalPath];
+
+  return publishedPath ? { ...config, baseURL: API_DATA_URL, url: publishedPath } : config;
+};
+
+[apiClient, vgClient, dtClient, questoesClient, ehClient].forEach((client) => {
+  client.interceptors.request.use(resolvePublishedUrl);
+});
+
+// Um JSON por curso em <campus>/cursos/<courseId>.json, listados em <campus>/cursos/index.json.
+// Sem o índice (dados gerados antes dos arquivos por curso), usa o consolidado do campus.
+const SHARDS_DIR = 'cursos';
+const shardIndexCache = new Map();
+
+const getShardIndex = (client, campusName) => {
+  const key = `${client.defaults.baseURL}/${campusName}`;
+  if (!shardIndexCache.has(key)) {
+    const request = client
+      .get(`${campusName}/${SHARDS_DIR}/index.json`)
+      .then((response) => (response.data && typeof response.data === 'object' ? response.data.cursos : null))
+      .catch(() => null);
+    shardIndexCache.set(key, request);
+  }
+  return shardIndexCache.get(key);
+};
+
+const getCourseData = async (client, campusName, consolidatedFile, courseId) => {
+  const index = await getShardIndex(client, campusName);
+
+  if (index) {
+    const shard = index[courseId];
+    if (!shard) return undefined;
+    const response = await client.get(`${campusName}/${SHARDS_DIR}/${shard.arquivo}`);
+    return response.data;
+  }
+
+  const response = await client.get(`${campusName}/${consolidatedFile}`);
+  return response.data[courseId];
+};
+
 export const getFilterOptions = async () => {
   try {
     const response = await apiClient.get('opcoes_filtro.json');
@@ -53,10 +113,9 @@ export const getCoursesLinks = async (campusName) => {
 
 export const getVisaoGeralData = async (campusName, courseId) => {
   try {
-    const response = await vgClient.get(`${campusName}/visao_geral_consolidado.json`);
-    const todosCursosHistorico = response.data;
-    
-    return todosCursosHistorico[courseId] || {};
+    const dadosCurso = await getCourseData(vgClient, campusName, 'visao_geral_consolidado.json', courseId);
+
+    return dadosCurso || {};
   } catch (error) {
     console.error(`Erro ao buscar Visão Geral consolidada para ${campusName}:`, error);
     return {};
@@ -65,10 +124,9 @@ export const getVisaoGeralData = async (campusName, courseId) => {
 
 export const getDesempenhoTopicoData = async (campusName, courseId) => {
   try {
-    const response = await dtClient.get(`${campusName}/competencias_consolidado.json`);
-    const todosCursosTodosAnos = response.data;
-    
-    return todosCursosTodosAnos[courseId] || {};
+    const dadosCurso = await getCourseData(dtClient, campusName, 'competencias_consolidado.json', courseId);
+
+    return dadosCurso || {};
   } catch (error) {
     console.error(`Erro ao buscar dados consolidados para ${campusName}:`, error);
     return {}; 
@@ -77,10 +135,9 @@ export const getDesempenhoTopicoData = async (campusName, courseId) => {
 
 export const getEvolucaoHistorica = async (campusName, courseId) => {
   try {
-    const response = await ehClient.get(`${campusName}/evolucao_historica.json`);
-    const todosCursos = response.data;
-    
-    return todosCursos[courseId] || [];
+    const historicoCurso = await getCourseData(ehClient, campusName, 'evolucao_historica.json', courseId);
+
+    return historicoCurso || [];
   } catch (error) {
     console.error(`Erro ao buscar histórico para ${campusName}/${courseId}:`, error);
     return [];
@@ -89,10 +146,9 @@ export const getEvolucaoHistorica = async (campusName, courseId) => {
 
 export const getPerfilConsolidado = async (campusName, courseId) => {
    try {
-     const response = await questoesClient.get(`${campusName}/perfil_consolidado.json`);
-     const todosCursos = response.data;
+     const perfilCurso = await getCourseData(questoesClient, campusName, 'perfil_consolidado.json', courseId);
 
-     return todosCursos[courseId] || {};
+     return perfilCurso || {};
    } catch (error) {
      console.warn(`Dados de perfil não encontrados para ${campusName}`);
      return {};